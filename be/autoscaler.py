@@ -0,0 +1,180 @@
+import math
+import os
+import threading
+import time
+
+import redis
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge
+from redis.exceptions import RedisError
+
+import models
+from models import EventType, StatusType
+from queue_worker import PROCESSING_SUFFIX, QUEUE_CONSUMER_GROUP
+
+AUTOSCALER_ENABLED = os.getenv("AUTOSCALER_ENABLED", "true").lower() == "true"
+AUTOSCALER_INTERVAL_SECONDS = float(os.getenv("AUTOSCALER_INTERVAL_SECONDS", "15"))
+# Backlog one replica is expected to keep up with, unless the function sets target_concurrency
+AUTOSCALER_MESSAGES_PER_REPLICA = int(os.getenv("AUTOSCALER_MESSAGES_PER_REPLICA", "10"))
+# Load has to move this far (as a fraction of the current capacity) before replicas change
+AUTOSCALER_TOLERANCE = float(os.getenv("AUTOSCALER_TOLERANCE", "0.1"))
+AUTOSCALER_SCALE_UP_COOLDOWN_SECONDS = float(os.getenv("AUTOSCALER_SCALE_UP_COOLDOWN_SECONDS", "30"))
+AUTOSCALER_SCALE_DOWN_COOLDOWN_SECONDS = float(os.getenv("AUTOSCALER_SCALE_DOWN_COOLDOWN_SECONDS", "300"))
+
+AUTOSCALER_BACKLOG = Gauge(
+    "autoscaler_queue_backlog_messages",
+    "Backlog (waiting plus unacknowledged messages) seen for a QUEUE_EVENT function.",
+    ["function"],
+)
+AUTOSCALER_DESIRED_REPLICAS = Gauge(
+    "autoscaler_desired_replicas",
+    "Replicas the queue autoscaler wants for a function.",
+    ["function"],
+)
+AUTOSCALER_SCALE_EVENTS = Counter(
+    "autoscaler_scale_events_total",
+    "Replica changes made by the queue autoscaler.",
+    ["function", "direction"],
+)
+
+
+def queue_backlog(client, queue_name: str) -> int:
+    """
+    Messages waiting plus messages taken but not acknowledged. For a stream
+    that is the consumer group's lag and pending count; for a list, its
+    length plus the consumers' processing lists.
+    """
+    key_type = client.type(queue_name).decode()
+    if key_type == "stream":
+        groups = client.xinfo_groups(queue_name)
+        group = next((g for g in groups if g["name"] in (QUEUE_CONSUMER_GROUP, QUEUE_CONSUMER_GROUP.encode())), None)
+        if group is None:
+            return client.xlen(queue_name)
+        lag = group.get("lag")
+        return (lag if lag is not None else client.xlen(queue_name)) + group["pending"]
+    if key_type == "list":
+        backlog = client.llen(queue_name)
+        for key in client.scan_iter(match=f"{queue_name}{PROCESSING_SUFFIX}*"):
+            backlog += client.llen(key)
+        return backlog
+    return 0
+
+
+def desired_replicas(backlog: int, current: int, policy, per_replica: int) -> int:
+    """
+    Replicas for a backlog, within the function's bounds. Inside the tolerance
+    band around the current capacity the current count is kept, so small
+    swings in the backlog don't make replicas flap.
+    """
+    if backlog == 0:
+        return 0 if policy.scale_to_zero else policy.scale_min
+    if current > 0:
+        load = backlog / (current * per_replica)
+        if abs(load - 1) <= AUTOSCALER_TOLERANCE:
+            return min(max(current, policy.scale_min), policy.scale_max)
+    return min(max(math.ceil(backlog / per_replica), policy.scale_min), policy.scale_max)
+
+
+class QueueAutoscaler:
+    """
+    Scales QUEUE_EVENT functions on their queue backlog, which the gateway's
+    request-rate autoscaling can't see.
+
+    Every AUTOSCALER_INTERVAL_SECONDS it samples each deployed function's
+    Redis list or stream, works out the replicas for that backlog within the
+    function's scale_min/scale_max, and sets them on func-<id> through the
+    deployment backend. Scaling up waits for its (short) cooldown, scaling down
+    for a longer one, both counted from the function's last change.
+
+    `redis_factory`, `backend` and `clock` can be fakes (fakeredis, LocalBackend).
+    """
+
+    def __init__(self, session_factory, backend, redis_factory=None, clock=time.monotonic,
+                 interval: float = AUTOSCALER_INTERVAL_SECONDS):
+        self._session_factory = session_factory
+        self._backend = backend
+        self._redis_factory = redis_factory or (lambda host: redis.from_url(host if "://" in host else f"redis://{host}"))
+        self._clock = clock
+        self._interval = interval
+        self._clients = {}
+        self._last_scaled = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="queue-autoscaler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        for client in self._clients.values():
+            client.close()
+        self._clients = {}
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Queue autoscaler pass failed: {e}")
+
+    def _functions(self):
+        with self._session_factory() as db:
+            functions = (
+                db.query(models.Function)
+                .filter(
+                    models.Function.event_type == EventType.QUEUE_EVENT,
+                    models.Function.status == StatusType.DEPLOYED,
+                    models.Function.redis_host.isnot(None),
+                    models.Function.redis_queue_name.isnot(None),
+                )
+                .all()
+            )
+            db.expunge_all()
+            return functions
+
+    def tick(self):
+        """One sampling pass over every queue-triggered function. Returns {name: replicas} for the changes made."""
+        changes = {}
+        for db_function in self._functions():
+            name = f"func-{db_function.id}"
+            try:
+                replicas = self._scale(db_function, name)
+            except (RedisError, HTTPException) as e:
+                print(f"Autoscaling {name} failed: {getattr(e, 'detail', e)}")
+                continue
+            if replicas is not None:
+                changes[name] = replicas
+        return changes
+
+    def _scale(self, db_function: models.Function, name: str):
+        client = self._clients.get(db_function.redis_host)
+        if client is None:
+            client = self._clients[db_function.redis_host] = self._redis_factory(db_function.redis_host)
+        backlog = queue_backlog(client, db_function.redis_queue_name)
+        current = self._backend.replicas(name)
+        if current is None:
+            return None
+
+        per_replica = db_function.target_concurrency or AUTOSCALER_MESSAGES_PER_REPLICA
+        desired = desired_replicas(backlog, current, db_function, per_replica)
+        AUTOSCALER_BACKLOG.labels(name).set(backlog)
+        AUTOSCALER_DESIRED_REPLICAS.labels(name).set(desired)
+        if desired == current:
+            return None
+
+        cooldown = AUTOSCALER_SCALE_UP_COOLDOWN_SECONDS if desired > current else AUTOSCALER_SCALE_DOWN_COOLDOWN_SECONDS
+        last_scaled = self._last_scaled.get(name)
+        now = self._clock()
+        if last_scaled is not None and now - last_scaled < cooldown:
+            return None
+
+        self._backend.set_replicas(name, desired)
+        self._last_scaled[name] = now
+        direction = "up" if desired > current else "down"
+        AUTOSCALER_SCALE_EVENTS.labels(name, direction).inc()
+        print(f"Scaled {name} {direction} from {current} to {desired} replicas (backlog {backlog})")
+        return desired
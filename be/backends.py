@@ -0,0 +1,649 @@
+import hashlib
+import json
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+import yaml
+from fastapi import HTTPException
+from kubernetes import client, watch
+
+from metrics import StageTimer
+from status_cache import FUNCTION_LABEL, FUNCTION_NAMESPACE, load_apps_api, load_core_api
+from templates import get_template_store
+
+# faas-cli substitutes environment variables in stack files; the build cache
+# sets IMAGE_TAG to the content hash so every distinct source gets its own tag.
+IMAGE_TAG_VARIABLE = "IMAGE_TAG"
+DEPLOYMENT_BACKEND = os.getenv("DEPLOYMENT_BACKEND", "faas-cli")
+
+
+def image_repository(image: str) -> str:
+    """The image reference without its tag ('rash27/func-x:abc' -> 'rash27/func-x')."""
+    last = image.rsplit("/", 1)[-1]
+    return image.rsplit(":", 1)[0] if ":" in last else image
+
+
+SCALE_LABEL_PREFIX = "com.openfaas.scale."
+
+
+def scale_label_patch(current: Optional[dict], labels: dict) -> dict:
+    """
+    `labels` as a merge patch over `current`: scale labels it no longer has
+    (e.g. the capacity ones once target_concurrency is cleared) are set to
+    None, which deletes them; a plain merge would leave them in place.
+    """
+    removed = {key: None for key in (current or {}) if key.startswith(SCALE_LABEL_PREFIX) and key not in labels}
+    return {**removed, **labels}
+
+
+def scaled_replicas(current: int, labels: dict, min_replicas: int, max_replicas: int) -> int:
+    """The replica count after a scaling change: within bounds, unless scaled to zero and allowed to stay there."""
+    if current == 0 and labels.get("com.openfaas.scale.zero") == "true":
+        return 0
+    return min(max(current, min_replicas), max_replicas)
+
+
+class DeploymentBackend:
+    """
+    Where functions get built and run. The deploy pipeline, undeploy and the
+    status cache only talk to the cluster through this interface.
+    Failures are raised as HTTPException, like the rest of the pipeline, and
+    each step runs inside a `timer.stage(...)` so its duration is recorded.
+    """
+
+    def start(self):
+        """Starts any background work the backend needs (called at application startup)."""
+
+    def stop(self):
+        """Stops what start() started."""
+
+    def build_and_deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None, parallel: int = 1):
+        """
+        Builds and pushes the image(s) in config_path/stack.yml, then deploys them.
+        With a multi-function stack, up to `parallel` images are built and pushed at once.
+        """
+        raise NotImplementedError
+
+    def deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None):
+        """Deploys the already pushed image(s) in config_path/stack.yml."""
+        raise NotImplementedError
+
+    def remove(self, config_path: str, timer: StageTimer):
+        """Removes the function(s) in config_path/stack.yml from the cluster."""
+        raise NotImplementedError
+
+    def patch_scaling(self, name: str, labels: dict, min_replicas: int, max_replicas: int):
+        """
+        Applies new scaling labels to a running function and brings its replica
+        count within [min_replicas, max_replicas], without rebuilding or redeploying.
+        """
+        raise NotImplementedError
+
+    def image_digest(self, image: str) -> Optional[str]:
+        """The registry digest (sha256:...) of a pushed image, or None when it can't be found out."""
+        raise NotImplementedError
+
+    def replicas(self, name: str) -> Optional[int]:
+        """The function's desired replica count, or None if it isn't deployed."""
+        raise NotImplementedError
+
+    def set_replicas(self, name: str, replicas: int):
+        """Scales the running function to `replicas`."""
+        raise NotImplementedError
+
+    def apps_api(self):
+        """An AppsV1Api(-compatible) client for reading function deployments."""
+        raise NotImplementedError
+
+    def watch_factory(self):
+        """A new kubernetes Watch(-compatible) object for streaming deployment events."""
+        raise NotImplementedError
+
+    def core_api(self):
+        """A CoreV1Api(-compatible) client for listing function pods and reading their logs."""
+        raise NotImplementedError
+
+
+class FaasCliBackend(DeploymentBackend):
+    """Deploys to a real OpenFaaS gateway with faas-cli and reads status from Kubernetes."""
+
+    def __init__(self):
+        self.templates = get_template_store()
+        # Created on first use and shared, so every call reuses one connection pool
+        self._apps_api = None
+        self._core_api = None
+
+    def start(self):
+        self.templates.start()
+
+    def stop(self):
+        self.templates.stop()
+
+    def _run(self, args, config_path: str, image_tag: Optional[str] = None, capture_output: bool = False):
+        env = os.environ.copy()
+        if image_tag:
+            env[IMAGE_TAG_VARIABLE] = image_tag
+        return subprocess.run(
+            ["faas-cli", *args],
+            cwd=config_path, env=env, check=True, capture_output=capture_output, text=True
+        )
+
+    def build_and_deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None, parallel: int = 1):
+        # 'faas-cli up' is build + push + deploy; running them separately lets each be timed
+        try:
+            with timer.stage("template"):
+                self.templates.link(config_path)
+            with timer.stage("build"):
+                self._run(["build", "-f", "stack.yml", "--parallel", str(parallel)], config_path, image_tag=image_tag)
+            with timer.stage("push"):
+                self._run(["push", "-f", "stack.yml", "--parallel", str(parallel)], config_path, image_tag=image_tag)
+            with timer.stage("deploy"):
+                self._run(["deploy", "-f", "stack.yml"], config_path, image_tag=image_tag, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Deployment failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Deployment failed: {e.stderr}")
+
+    def deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None):
+        try:
+            with timer.stage("deploy"):
+                self._run(["deploy", "-f", "stack.yml"], config_path, image_tag=image_tag, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Deployment failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Deployment failed: {e.stderr}")
+
+    def remove(self, config_path: str, timer: StageTimer):
+        try:
+            # Run 'faas-cli remove -f stack.yml' from the directory containing the file
+            with timer.stage("remove"):
+                undeploy_process = self._run(["remove", "-f", "stack.yml"], config_path, capture_output=True)
+            print("Undeployment successful:", undeploy_process.stdout)
+        except subprocess.CalledProcessError as e:
+            # Raise an exception with the actual error from the faas-cli
+            raise HTTPException(status_code=500, detail=f"Undeployment failed: {e.stderr}")
+
+    def patch_scaling(self, name: str, labels: dict, min_replicas: int, max_replicas: int):
+        # faas-netes reads a function's labels from the pod template, so they are
+        # patched there too; that rolls the pods over on the same image.
+        api = self.apps_api()
+        try:
+            deployment = api.read_namespaced_deployment(name, FUNCTION_NAMESPACE)
+            replicas = scaled_replicas(deployment.spec.replicas or 0, labels, min_replicas, max_replicas)
+            template_labels = deployment.spec.template.metadata.labels
+            api.patch_namespaced_deployment(name, FUNCTION_NAMESPACE, {
+                "metadata": {"labels": scale_label_patch(deployment.metadata.labels, labels)},
+                "spec": {
+                    "replicas": replicas,
+                    "template": {"metadata": {"labels": scale_label_patch(template_labels, labels)}},
+                },
+            })
+        except client.ApiException as e:
+            raise HTTPException(status_code=404 if e.status == 404 else 500, detail=f"Scaling patch failed: {e.reason}")
+
+    def image_digest(self, image: str) -> Optional[str]:
+        # 'docker push' (run by faas-cli push) records the digest locally
+        repository = image_repository(image)
+        try:
+            inspect = subprocess.run(
+                ["docker", "image", "inspect", "--format", "{{json .RepoDigests}}", image],
+                check=True, capture_output=True, text=True
+            )
+            for repo_digest in json.loads(inspect.stdout) or []:
+                name, _, digest = repo_digest.partition("@")
+                if name == repository:
+                    return digest
+        except (OSError, subprocess.CalledProcessError, ValueError) as e:
+            print(f"Could not read the digest of {image}: {e}")
+        return None
+
+    def replicas(self, name: str) -> Optional[int]:
+        try:
+            return self.apps_api().read_namespaced_deployment(name, FUNCTION_NAMESPACE).spec.replicas or 0
+        except client.ApiException as e:
+            if e.status == 404:
+                return None
+            raise HTTPException(status_code=500, detail=f"Reading replicas failed: {e.reason}")
+
+    def set_replicas(self, name: str, replicas: int):
+        try:
+            self.apps_api().patch_namespaced_deployment_scale(name, FUNCTION_NAMESPACE, {"spec": {"replicas": replicas}})
+        except client.ApiException as e:
+            raise HTTPException(status_code=404 if e.status == 404 else 500, detail=f"Scaling failed: {e.reason}")
+
+    def apps_api(self):
+        if self._apps_api is None:
+            self._apps_api = load_apps_api()
+        return self._apps_api
+
+    def watch_factory(self):
+        return watch.Watch()
+
+    def core_api(self):
+        if self._core_api is None:
+            self._core_api = load_core_api()
+        return self._core_api
+
+
+class LocalCluster:
+    """
+    In-process stand-in for the function namespace: deployments with replica
+    counts that become available after a delay, plus a resourceVersion-ordered
+    event log so watches behave like the real API server.
+
+    Every replica is a named pod with its own log. Applying a new image
+    replaces a deployment's pods, scaling adds or removes them.
+    """
+
+    EVENT_LOG_SIZE = 10000
+    POD_LOG_SIZE = 5000
+
+    def __init__(self, ready_seconds: float):
+        self.ready_seconds = ready_seconds
+        self._lock = threading.Lock()
+        self._logs_changed = threading.Condition(self._lock)
+        self._deployments = {}
+        self._resource_version = 0
+        self._events = []
+        self._subscribers = []
+        self._pod_logs = {}
+        self._log_sequence = 0
+
+    def _deployment_object(self, name: str):
+        d = self._deployments[name]
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name=name, resource_version=str(d["resource_version"]), labels=d["labels"]),
+            spec=SimpleNamespace(replicas=d["replicas"]),
+            status=SimpleNamespace(available_replicas=d["available"]),
+        )
+
+    def _emit(self, event_type: str, obj):
+        self._events.append((self._resource_version, {"type": event_type, "object": obj}))
+        del self._events[:-self.EVENT_LOG_SIZE]
+        for subscriber in self._subscribers:
+            subscriber.put({"type": event_type, "object": obj})
+
+    def apply(self, name: str, image: str, labels: dict):
+        with self._lock:
+            self._resource_version += 1
+            existing = self._deployments.get(name)
+            generation = (existing["generation"] + 1) if existing else 1
+            replicas = int(labels.get("com.openfaas.scale.min", 1))
+            self._deployments[name] = {
+                "image": image,
+                "labels": {FUNCTION_LABEL: name, **labels},
+                "replicas": replicas,
+                # A rolling update keeps the old pods serving until the new ones are ready
+                "available": existing["available"] if existing else 0,
+                "generation": generation,
+                "resource_version": self._resource_version,
+                "pods": existing["pods"] if existing else [],
+            }
+            self._set_pods(name, replicas, replace=True)
+            self._emit("MODIFIED" if existing else "ADDED", self._deployment_object(name))
+
+        ready_timer = threading.Timer(self.ready_seconds, self._mark_ready, args=(name, generation))
+        ready_timer.daemon = True
+        ready_timer.start()
+
+    def _mark_ready(self, name: str, generation: int):
+        with self._lock:
+            d = self._deployments.get(name)
+            if not d or d["generation"] != generation:
+                return
+            self._resource_version += 1
+            d["available"] = d["replicas"]
+            d["resource_version"] = self._resource_version
+            self._emit("MODIFIED", self._deployment_object(name))
+
+    def patch(self, name: str, labels: dict, min_replicas: int, max_replicas: int) -> bool:
+        return self.scale(name, lambda current: scaled_replicas(current, labels, min_replicas, max_replicas), labels)
+
+    def scale(self, name: str, replicas, labels: Optional[dict] = None) -> bool:
+        """
+        Sets the replica count, or applies `replicas(current)` when it is callable,
+        and optionally the labels. New pods become available after the delay.
+        """
+        with self._lock:
+            d = self._deployments.get(name)
+            if not d:
+                return False
+            self._resource_version += 1
+            if labels is not None:
+                d["labels"] = {FUNCTION_LABEL: name, **labels}
+            d["replicas"] = replicas(d["replicas"]) if callable(replicas) else replicas
+            d["available"] = min(d["available"], d["replicas"])
+            d["generation"] += 1
+            d["resource_version"] = self._resource_version
+            generation = d["generation"]
+            self._set_pods(name, d["replicas"])
+            self._emit("MODIFIED", self._deployment_object(name))
+
+        ready_timer = threading.Timer(self.ready_seconds, self._mark_ready, args=(name, generation))
+        ready_timer.daemon = True
+        ready_timer.start()
+        return True
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._deployments:
+                return False
+            self._resource_version += 1
+            obj = self._deployment_object(name)
+            obj.metadata.resource_version = str(self._resource_version)
+            self._set_pods(name, 0)
+            del self._deployments[name]
+            self._emit("DELETED", obj)
+            return True
+
+    def get(self, name: str):
+        with self._lock:
+            return self._deployment_object(name) if name in self._deployments else None
+
+    def list(self, names=None):
+        with self._lock:
+            selected = [n for n in self._deployments if names is None or n in names]
+            return [self._deployment_object(n) for n in selected], str(self._resource_version)
+
+    def subscribe(self, resource_version: Optional[str]) -> queue.Queue:
+        """Returns a queue with every event after resource_version, followed by live events."""
+        subscriber = queue.Queue()
+        with self._lock:
+            since = int(resource_version or self._resource_version)
+            if self._events and self._events[0][0] > since + 1:
+                raise client.ApiException(status=410, reason="Expired: too old resource version")
+            for event_version, event in self._events:
+                if event_version > since:
+                    subscriber.put(event)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _set_pods(self, name: str, replicas: int, replace: bool = False):
+        # Caller holds the lock. `replace` starts a fresh set of pods (a new image).
+        d = self._deployments[name]
+        keep = [] if replace else d["pods"][:replicas]
+        for pod in d["pods"]:
+            if pod not in keep:
+                del self._pod_logs[pod]
+        while len(keep) < replicas:
+            pod = f"{name}-{d['generation']}-{len(keep)}"
+            self._pod_logs[pod] = deque(maxlen=self.POD_LOG_SIZE)
+            self._append_log(pod, f"Started {d['image']}")
+            keep.append(pod)
+        d["pods"] = keep
+        self._logs_changed.notify_all()
+
+    def _append_log(self, pod: str, message: str):
+        self._log_sequence += 1
+        now = time.time()
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        self._pod_logs[pod].append((self._log_sequence, now, f"{stamp} {message}\n".encode()))
+
+    def pods(self, name: Optional[str] = None):
+        """Pod names of one deployment, or of all of them."""
+        with self._lock:
+            if name is None:
+                return list(self._pod_logs)
+            d = self._deployments.get(name)
+            return list(d["pods"]) if d else []
+
+    def write_log(self, pod: str, message: str):
+        with self._lock:
+            if pod in self._pod_logs:
+                self._append_log(pod, message)
+                self._logs_changed.notify_all()
+
+    def read_log(self, pod: str, tail_lines: Optional[int] = None, since_seconds: Optional[int] = None):
+        """Returns (entries, last sequence number) of a pod's log; entries are (sequence, epoch, line)."""
+        with self._lock:
+            if pod not in self._pod_logs:
+                raise client.ApiException(status=404, reason="Not Found")
+            entries = list(self._pod_logs[pod])
+            last = self._log_sequence
+        if since_seconds is not None:
+            cutoff = time.time() - since_seconds
+            entries = [entry for entry in entries if entry[1] >= cutoff]
+        if tail_lines is not None:
+            entries = entries[-tail_lines:] if tail_lines > 0 else []
+        return entries, last
+
+    def wait_log(self, pod: str, after: int, timeout: float):
+        """Entries of a pod's log newer than sequence `after`, waiting up to timeout; None once the pod is gone."""
+        with self._logs_changed:
+            self._logs_changed.wait_for(
+                lambda: pod not in self._pod_logs or (self._pod_logs[pod] and self._pod_logs[pod][-1][0] > after),
+                timeout,
+            )
+            if pod not in self._pod_logs:
+                return None
+            return [entry for entry in self._pod_logs[pod] if entry[0] > after]
+
+
+class LocalAppsApi:
+    """The parts of AppsV1Api the backend uses, served from a LocalCluster."""
+
+    def __init__(self, cluster: LocalCluster):
+        self.cluster = cluster
+
+    @staticmethod
+    def _selected_names(label_selector: Optional[str]):
+        # Supports the selectors we issue: "faas_function" and "faas_function in (a,b)"
+        if label_selector and " in (" in label_selector:
+            return set(label_selector.split("(", 1)[1].rstrip(")").split(","))
+        return None
+
+    def list_namespaced_deployment(self, namespace: str, label_selector: Optional[str] = None, **kwargs):
+        items, resource_version = self.cluster.list(self._selected_names(label_selector))
+        return SimpleNamespace(items=items, metadata=SimpleNamespace(resource_version=resource_version))
+
+    def read_namespaced_deployment(self, name: str, namespace: str, **kwargs):
+        deployment = self.cluster.get(name)
+        if deployment is None:
+            raise client.ApiException(status=404, reason="Not Found")
+        return deployment
+
+
+class LocalLogStream:
+    """Iterates one pod's log lines like a read_namespaced_pod_log response with _preload_content=False."""
+
+    def __init__(self, cluster: LocalCluster, pod: str, follow: bool, timestamps: bool,
+                 tail_lines: Optional[int], since_seconds: Optional[int]):
+        self.cluster = cluster
+        self.pod = pod
+        self.follow = follow
+        self.timestamps = timestamps
+        self._entries, self._last = cluster.read_log(pod, tail_lines, since_seconds)
+        self._closed = False
+
+    def _line(self, entry) -> bytes:
+        return entry[2] if self.timestamps else entry[2].split(b" ", 1)[1]
+
+    def __iter__(self):
+        for entry in self._entries:
+            yield self._line(entry)
+        while self.follow and not self._closed:
+            entries = self.cluster.wait_log(self.pod, self._last, timeout=0.5)
+            if entries is None:
+                return
+            for entry in entries:
+                self._last = entry[0]
+                yield self._line(entry)
+
+    def close(self):
+        self._closed = True
+
+    def release_conn(self):
+        self.close()
+
+
+class LocalCoreApi:
+    """The parts of CoreV1Api the log streams use, served from a LocalCluster."""
+
+    def __init__(self, cluster: LocalCluster):
+        self.cluster = cluster
+
+    def list_namespaced_pod(self, namespace: str, label_selector: Optional[str] = None, **kwargs):
+        # Supports the selector we issue: "faas_function=<name>"
+        name = label_selector.split("=", 1)[1] if label_selector else None
+        items = [
+            SimpleNamespace(
+                metadata=SimpleNamespace(name=pod, labels={FUNCTION_LABEL: pod.rsplit("-", 2)[0]}),
+                status=SimpleNamespace(phase="Running"),
+            )
+            for pod in self.cluster.pods(name)
+        ]
+        return SimpleNamespace(items=items)
+
+    def read_namespaced_pod_log(self, name: str, namespace: str, follow: bool = False, timestamps: bool = False,
+                                tail_lines: Optional[int] = None, since_seconds: Optional[int] = None, **kwargs):
+        return LocalLogStream(self.cluster, name, follow, timestamps, tail_lines, since_seconds)
+
+
+class LocalWatch:
+    """Watch-compatible stream over a LocalCluster's events."""
+
+    def __init__(self, cluster: LocalCluster):
+        self.cluster = cluster
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def stream(self, func, namespace: str = None, resource_version: Optional[str] = None, timeout_seconds: Optional[int] = None, **kwargs):
+        subscriber = self.cluster.subscribe(resource_version)
+        deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        try:
+            while not self._stop and (deadline is None or time.monotonic() < deadline):
+                try:
+                    yield subscriber.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+        finally:
+            self.cluster.unsubscribe(subscriber)
+
+
+class LocalBackend(DeploymentBackend):
+    """
+    Simulates an OpenFaaS cluster in-process so the whole pipeline can be run
+    and benchmarked on one machine. Build, push, deploy and readiness each take
+    a configurable amount of time; nothing is actually built. With a log
+    interval set, every pod writes a request-like log line that often.
+    """
+
+    def __init__(
+        self,
+        build_seconds: float = float(os.getenv("LOCAL_BACKEND_BUILD_SECONDS", "2")),
+        push_seconds: float = float(os.getenv("LOCAL_BACKEND_PUSH_SECONDS", "1")),
+        deploy_seconds: float = float(os.getenv("LOCAL_BACKEND_DEPLOY_SECONDS", "0.2")),
+        ready_seconds: float = float(os.getenv("LOCAL_BACKEND_READY_SECONDS", "1")),
+        log_interval_seconds: float = float(os.getenv("LOCAL_BACKEND_LOG_INTERVAL_SECONDS", "0")),
+    ):
+        self.build_seconds = build_seconds
+        self.push_seconds = push_seconds
+        self.deploy_seconds = deploy_seconds
+        self.log_interval_seconds = log_interval_seconds
+        self.cluster = LocalCluster(ready_seconds)
+        self._api = LocalAppsApi(self.cluster)
+        self._core_api = LocalCoreApi(self.cluster)
+        self._stop_logging = threading.Event()
+
+    def start(self):
+        if self.log_interval_seconds > 0:
+            threading.Thread(target=self._write_logs, name="local-pod-logs", daemon=True).start()
+
+    def stop(self):
+        self._stop_logging.set()
+
+    def _write_logs(self):
+        count = 0
+        while not self._stop_logging.wait(self.log_interval_seconds):
+            count += 1
+            for pod in self.cluster.pods():
+                self.cluster.write_log(pod, f"GET / - 200 OK - ContentLength: 13B (request {count})")
+
+    @staticmethod
+    def _read_stack(config_path: str, image_tag: Optional[str]):
+        stack_file = os.path.join(config_path, "stack.yml")
+        if not os.path.exists(stack_file):
+            raise HTTPException(status_code=404, detail=f"stack.yml not found in {config_path}")
+        with open(stack_file) as f:
+            stack = yaml.safe_load(f)
+        for name, function in stack["functions"].items():
+            image = function.get("image", "")
+            image = image.replace(f"${{{IMAGE_TAG_VARIABLE}:-latest}}", image_tag or "latest")
+            yield name, image, function.get("labels") or {}
+
+    def build_and_deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None, parallel: int = 1):
+        functions = list(self._read_stack(config_path, image_tag))
+        rounds = math.ceil(len(functions) / max(parallel, 1))
+        with timer.stage("build"):
+            time.sleep(self.build_seconds * rounds)
+        with timer.stage("push"):
+            time.sleep(self.push_seconds * rounds)
+        self._apply(functions, timer)
+
+    def deploy(self, config_path: str, timer: StageTimer, image_tag: Optional[str] = None):
+        self._apply(list(self._read_stack(config_path, image_tag)), timer)
+
+    def _apply(self, functions, timer: StageTimer):
+        with timer.stage("deploy"):
+            time.sleep(self.deploy_seconds)
+            for name, image, labels in functions:
+                self.cluster.apply(name, image, labels)
+
+    def remove(self, config_path: str, timer: StageTimer):
+        with timer.stage("remove"):
+            for name, _, _ in self._read_stack(config_path, None):
+                if not self.cluster.delete(name):
+                    raise HTTPException(status_code=500, detail=f"Undeployment failed: function {name} not found")
+
+    def patch_scaling(self, name: str, labels: dict, min_replicas: int, max_replicas: int):
+        if not self.cluster.patch(name, labels, min_replicas, max_replicas):
+            raise HTTPException(status_code=404, detail=f"Scaling patch failed: function {name} not found")
+
+    def image_digest(self, image: str) -> Optional[str]:
+        return "sha256:" + hashlib.sha256(image.encode()).hexdigest()
+
+    def replicas(self, name: str) -> Optional[int]:
+        deployment = self.cluster.get(name)
+        return deployment.spec.replicas if deployment else None
+
+    def set_replicas(self, name: str, replicas: int):
+        if not self.cluster.scale(name, replicas):
+            raise HTTPException(status_code=404, detail=f"Scaling failed: function {name} not found")
+
+    def apps_api(self):
+        return self._api
+
+    def watch_factory(self):
+        return LocalWatch(self.cluster)
+
+    def core_api(self):
+        return self._core_api
+
+
+_backend = None
+
+
+def get_backend() -> DeploymentBackend:
+    """The process-wide backend, chosen by DEPLOYMENT_BACKEND ('faas-cli' or 'local')."""
+    global _backend
+    if _backend is None:
+        if DEPLOYMENT_BACKEND == "local":
+            _backend = LocalBackend()
+        elif DEPLOYMENT_BACKEND == "faas-cli":
+            _backend = FaasCliBackend()
+        else:
+            raise ValueError(f"Unknown DEPLOYMENT_BACKEND: {DEPLOYMENT_BACKEND}")
+    return _backend
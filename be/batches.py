@@ -0,0 +1,217 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+import yaml
+from fastapi import HTTPException
+
+import models
+import build_cache
+import revisions
+from backends import IMAGE_TAG_VARIABLE, get_backend
+from deployer import (
+    FILE_STORE_PATH, GATEWAY_URL, IMAGE_REPOSITORY,
+    function_src_path, function_config_path, refetch_from_github, format_go_code, record_deployed_state,
+)
+from metrics import StageTimer
+from storage import get_artifact_store
+from models import FunctionType, SourceType, StatusType, JobStatus
+
+BATCHES_PATH = os.path.join(FILE_STORE_PATH, "batches")
+# Defaults for POST /deploy_batch; both can be set per batch
+BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "4"))
+BATCH_SHARD_SIZE = int(os.getenv("BATCH_SHARD_SIZE", "50"))
+MAX_BATCH_SIZE = 1000
+# What preparing a function reads from its row (paths, scaling labels, GitHub handler)
+SPEC_FIELDS = (
+    "id", "type", "source", "location_url", "handler_path",
+    "scale_min", "scale_max", "scale_factor", "scale_to_zero", "target_concurrency",
+)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class BatchMember:
+    """
+    One function of a batch and what preparing it produced.
+
+    `spec` is a plain copy of the function's row for the preparing threads,
+    which must not touch the (thread-unsafe) Session; what they find out is
+    applied to `function` afterwards, on the batch's own thread.
+    """
+
+    def __init__(self, job: models.DeployJob, db_function: Optional[models.Function]):
+        self.job = job
+        self.function = db_function
+        self.spec = SimpleNamespace(**{field: getattr(db_function, field) for field in SPEC_FIELDS}) if db_function else None
+        self.timer = StageTimer(job.kind.value.lower())
+        self.name = f"func-{job.function_id}"
+        self.entry = None
+        self.content_hash = None
+        self.commit_sha = None
+        self.handler_path = None
+        self.cached = False
+        self.error = None
+        self.shard_timer = None
+
+
+def _stack_entry(config_path: str, name: str, image_tag: Optional[str]) -> dict:
+    """
+    The function's own stack.yml entry, made usable from another directory:
+    the handler path becomes absolute and the image tag literal.
+    """
+    with open(os.path.join(config_path, "stack.yml")) as f:
+        entry = yaml.safe_load(f)["functions"][name]
+    if entry.get("handler"):
+        entry["handler"] = os.path.abspath(os.path.join(config_path, entry["handler"]))
+    entry["image"] = entry["image"].replace(f"${{{IMAGE_TAG_VARIABLE}:-latest}}", image_tag or "latest")
+    return entry
+
+
+def _prepare(member: BatchMember):
+    """fetch, format and hash one function; runs on the batch's thread pool, from member.spec only."""
+    db_function = member.spec
+    try:
+        if db_function is None:
+            raise HTTPException(status_code=404, detail="Function not found")
+
+        if db_function.source == SourceType.GITHUB:
+            with member.timer.stage("fetch"):
+                member.handler_path, member.commit_sha = refetch_from_github(db_function)
+
+        if db_function.type == FunctionType.FUNCTION:
+            with member.timer.stage("format"):
+                format_go_code(db_function)
+
+        config_path = function_config_path(db_function)
+        image_tag = None
+        if db_function.type == FunctionType.FUNCTION or db_function.source == SourceType.GITHUB:
+            with member.timer.stage("hash"):
+                get_artifact_store().ensure_local(function_src_path(db_function))
+                member.content_hash = build_cache.compute_build_hash(
+                    function_src_path(db_function), os.path.join(config_path, "stack.yml")
+                )
+                image_tag = build_cache.image_tag_for(member.content_hash)
+        member.entry = _stack_entry(config_path, member.name, image_tag)
+    except HTTPException as e:
+        member.error = str(e.detail)
+    except Exception as e:
+        member.error = f"An unexpected error occurred: {e}"
+
+
+def _write_shard(shard_dir: str, members) -> str:
+    os.makedirs(shard_dir, exist_ok=True)
+    stack = {
+        "version": 1.0,
+        "provider": {"name": "openfaas", "gateway": GATEWAY_URL},
+        "functions": {member.name: member.entry for member in members},
+    }
+    with open(os.path.join(shard_dir, "stack.yml"), "w") as f:
+        yaml.safe_dump(stack, f, sort_keys=False)
+    return shard_dir
+
+
+def run_deploy_batch(db, batch: models.DeployBatch, jobs, progress):
+    """
+    Deploys many functions with a handful of faas-cli runs instead of one per function.
+    - Every function is fetched, formatted and hashed, `parallelism` at a time.
+    - Build cache misses are written into multi-function stack files of up to
+      `shard_size` functions, each built and pushed with `parallelism` parallel
+      builds and then deployed. Cache hits and IMAGE functions go into
+      deploy-only stack files.
+    - A failing shard fails only the functions in it. Each function's job gets
+      its own result and its stages are stored as deployment events.
+    """
+    function_ids = [job.function_id for job in jobs]
+    functions = {f.id: f for f in db.query(models.Function).filter(models.Function.id.in_(function_ids))}
+    members = [BatchMember(job, functions.get(job.function_id)) for job in jobs]
+    for member in members:
+        member.job.status = JobStatus.RUNNING
+        member.job.stage = "prepare"
+        member.job.started_at = _now()
+    progress(f"prepare ({len(members)} functions)")
+
+    with ThreadPoolExecutor(max_workers=batch.parallelism) as pool:
+        list(pool.map(_prepare, members))
+
+    prepared = [member for member in members if not member.error]
+    for member in prepared:
+        if member.content_hash:
+            member.cached = build_cache.lookup(db, member.function.id, member.content_hash) is not None
+    to_build = [member for member in prepared if member.content_hash and not member.cached]
+    deploy_only = [member for member in prepared if not member.content_hash or member.cached]
+
+    size = batch.shard_size
+    shards = [("build", to_build[i:i + size]) for i in range(0, len(to_build), size)]
+    shards += [("deploy", deploy_only[i:i + size]) for i in range(0, len(deploy_only), size)]
+
+    backend = get_backend()
+    batch_dir = os.path.join(BATCHES_PATH, str(batch.id))
+    try:
+        for number, (mode, shard) in enumerate(shards, 1):
+            label = f"shard {number}/{len(shards)}"
+            for member in shard:
+                member.job.stage = mode
+            timer = StageTimer("batch", lambda stage: progress(f"{label}: {stage}"))
+            try:
+                with timer:
+                    shard_dir = _write_shard(os.path.join(batch_dir, str(number)), shard)
+                    if mode == "build":
+                        backend.build_and_deploy(shard_dir, timer, parallel=batch.parallelism)
+                    else:
+                        backend.deploy(shard_dir, timer)
+            except HTTPException as e:
+                for member in shard:
+                    member.error = str(e.detail)
+            except Exception as e:
+                for member in shard:
+                    member.error = f"An unexpected error occurred: {e}"
+            for member in shard:
+                member.shard_timer = timer
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    for member in members:
+        if not member.error and member.content_hash and not member.cached:
+            tag = build_cache.image_tag_for(member.content_hash)
+            build_cache.record(db, member.function.id, member.content_hash, f"{IMAGE_REPOSITORY}/{member.name}:{tag}")
+
+    # Record outcomes over the latest rows, locked until the commit (see lock_function)
+    (
+        db.query(models.Function)
+        .filter(models.Function.id.in_(function_ids))
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    for member in members:
+        member.job.finished_at = _now()
+        if member.handler_path:
+            member.function.handler_path = member.handler_path
+        if member.error:
+            member.job.status = JobStatus.FAILED
+            member.job.error = member.error
+        else:
+            member.job.status = JobStatus.SUCCEEDED
+            member.job.stage = "done"
+            record_deployed_state(member.function, member.commit_sha)
+            revisions.record(
+                db, member.function, os.path.join(function_config_path(member.function), "stack.yml"),
+                member.entry["image"], member.content_hash, member.job.id,
+            )
+            member.function.status = StatusType.DEPLOYED
+        if member.function is not None:
+            member.timer.persist(db, member.function.id, member.job.id)
+            if member.shard_timer:
+                member.shard_timer.persist(db, member.function.id, member.job.id)
+    db.commit()
+
+    failed = sum(1 for member in members if member.error)
+    print(f"Deploy batch {batch.id}: {len(members) - failed} deployed, {failed} failed")
+    if failed:
+        raise HTTPException(status_code=500, detail=f"{failed} of {len(members)} functions failed to deploy")
@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from script import LatencyHistogram
+
+STAGES = ("create", "deploy", "status", "update", "undeploy")
+
+HANDLER_TEMPLATE = """package function
+
+import (
+	"net/http"
+)
+
+// revision: {revision}
+func Handle(w http.ResponseWriter, r *http.Request) {{
+	w.WriteHeader(http.StatusOK)
+	w.Write([]byte("ok"))
+}}
+"""
+
+
+class StageStats:
+    """Latency, failures and the wall-clock span of one pipeline stage."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.failures = defaultdict(int)
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, started: float, ended: float, error: str = None):
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+        if error:
+            self.failures[error] += 1
+        else:
+            self.latency.record(ended - started)
+
+    def summary(self) -> dict:
+        span = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        return {
+            "completed": self.latency.count,
+            "failed": sum(self.failures.values()),
+            "failures": dict(self.failures),
+            "throughput_per_s": self.latency.count / span if span > 0 else 0.0,
+            "latency": self.latency.summary(),
+        }
+
+
+class StageFailed(Exception):
+    pass
+
+
+async def _wait_for_job(client, job: dict, poll_interval: float, timeout: float):
+    deadline = time.monotonic() + timeout
+    while job["status"] not in ("SUCCEEDED", "FAILED"):
+        if time.monotonic() > deadline:
+            raise StageFailed("job_timeout")
+        await asyncio.sleep(poll_interval)
+        response = await client.get(f"/jobs/{job['id']}")
+        response.raise_for_status()
+        job = response.json()
+    if job["status"] == "FAILED":
+        raise StageFailed("job_failed")
+
+
+async def _wait_until_ready(client, function_id: str, poll_interval: float, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = await client.get(f"/logs/{function_id}")
+        body = response.json()
+        if body.get("status") == "Ready":
+            return
+        if time.monotonic() > deadline:
+            raise StageFailed("not_ready")
+        await asyncio.sleep(poll_interval)
+
+
+def _check(response: httpx.Response, expected: int):
+    if response.status_code != expected:
+        raise StageFailed(f"http_{response.status_code}")
+    return response.json()
+
+
+async def run_function_pipeline(client, args, index: int, stats: dict):
+    """create -> deploy -> status -> update_deployment -> undeploy for one function."""
+    function_id = None
+    revision = uuid.uuid4().hex if args.unique_sources else "bench"
+
+    async def stage(name, coro):
+        started = time.monotonic()
+        try:
+            result = await coro
+        except (StageFailed, httpx.HTTPError) as e:
+            error = str(e) if isinstance(e, StageFailed) else type(e).__name__
+            stats[name].record(started, time.monotonic(), error)
+            raise StageFailed(error)
+        stats[name].record(started, time.monotonic())
+        return result
+
+    async def create():
+        files = {"file": ("handler.go", HANDLER_TEMPLATE.format(revision=revision).encode())}
+        data = {"name": f"bench-{index}", "type": "FUNCTION", "source": "STORAGE", "event_type": "HTTP"}
+        return _check(await client.post("/upload_function/", data=data, files=files), 201)["id"]
+
+    async def deploy():
+        job = _check(await client.post(f"/deploy_function/{function_id}"), 202)
+        await _wait_for_job(client, job, args.poll_interval, args.stage_timeout)
+
+    async def update():
+        files = {"file": ("handler.go", HANDLER_TEMPLATE.format(revision=revision + "-2").encode())}
+        result = _check(await client.post(f"/update_deployment/{function_id}", files=files), 202)
+        await _wait_for_job(client, result["job"], args.poll_interval, args.stage_timeout)
+
+    async def undeploy():
+        _check(await client.post(f"/undeploy_function/{function_id}"), 200)
+
+    try:
+        function_id = await stage("create", create())
+        await stage("deploy", deploy())
+        await stage("status", _wait_until_ready(client, function_id, args.poll_interval, args.stage_timeout))
+        await stage("update", update())
+        await stage("undeploy", undeploy())
+    except StageFailed:
+        pass
+
+
+async def run_benchmark(args) -> dict:
+    stats = {name: StageStats() for name in STAGES}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.request_timeout) as client:
+        async def bounded(index):
+            async with semaphore:
+                await run_function_pipeline(client, args, index, stats)
+
+        started = time.monotonic()
+        await asyncio.gather(*(bounded(i) for i in range(args.functions)))
+        elapsed = time.monotonic() - started
+
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "functions": args.functions,
+            "concurrency": args.concurrency,
+            "unique_sources": args.unique_sources,
+        },
+        "duration_s": elapsed,
+        "pipelines_per_s": stats["undeploy"].latency.count / elapsed if elapsed > 0 else 0.0,
+        "stages": {name: stats[name].summary() for name in STAGES},
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['config']['functions']} pipelines in {report['duration_s']:.1f}s "
+          f"({report['pipelines_per_s']:.2f} complete pipelines/s)")
+    print(f"{'stage':<10}{'ok':>6}{'fail':>6}{'per s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for name, stage in report["stages"].items():
+        latency = stage["latency"]
+        print(f"{name:<10}{stage['completed']:>6}{stage['failed']:>6}{stage['throughput_per_s']:>9.2f}"
+              f"{latency['p50_ms']:>10.1f}{latency['p90_ms']:>10.1f}{latency['p99_ms']:>10.1f}")
+        for error, count in stage["failures"].items():
+            print(f"    {error}: {count}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive create -> deploy -> status -> update -> undeploy through the API and report per-stage latency. "
+                    "Run the backend with DEPLOYMENT_BACKEND=local to benchmark without a cluster."
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Backend API base URL")
+    parser.add_argument("-n", "--functions", type=int, default=20, help="Number of functions to push through the pipeline")
+    parser.add_argument("-c", "--concurrency", type=int, default=5, help="Pipelines running at once")
+    parser.add_argument("--same-source", dest="unique_sources", action="store_false",
+                        help="Give every function identical source instead of a unique handler")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between job/status polls")
+    parser.add_argument("--stage-timeout", type=float, default=600, help="Seconds before a stage counts as failed")
+    parser.add_argument("--request-timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the full report as JSON to this file ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
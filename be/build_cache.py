@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+
+import yaml
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+# Length of the content hash prefix used as the image tag
+IMAGE_TAG_LENGTH = 12
+
+
+def _hash_files(digest, src_dir: str):
+    """Feeds every file under src_dir (path and bytes, in a stable order) into digest."""
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            digest.update(os.path.relpath(file_path, src_dir).encode())
+            digest.update(b"\0")
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+
+
+def _load_stack(stack_file: str) -> dict:
+    with open(stack_file) as f:
+        return yaml.safe_load(f) or {}
+
+
+def compute_build_hash(src_dir: str, stack_file: str) -> str:
+    """
+    Hashes everything that goes into an image build: every file under the
+    handler directory plus the stack.yml.
+    Labels (the scaling policy) are left out: they are applied at deploy time
+    and changing them must not cost a rebuild.
+    """
+    digest = hashlib.sha256()
+    _hash_files(digest, src_dir)
+    digest.update(b"stack.yml\0")
+    stack = _load_stack(stack_file)
+    for function in (stack.get("functions") or {}).values():
+        function.pop("labels", None)
+    digest.update(json.dumps(stack, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def compute_source_hash(src_dir: str) -> str:
+    """Hashes the handler directory alone."""
+    digest = hashlib.sha256()
+    _hash_files(digest, src_dir)
+    return digest.hexdigest()
+
+
+def compute_config_hash(stack_file: str) -> str:
+    """
+    Hashes the stack.yml as parsed, labels included, so rewriting the same
+    config with different formatting doesn't count as a change.
+    """
+    return hashlib.sha256(json.dumps(_load_stack(stack_file), sort_keys=True).encode()).hexdigest()
+
+
+def image_tag_for(content_hash: str) -> str:
+    return content_hash[:IMAGE_TAG_LENGTH]
+
+
+def lookup(db: Session, function_id, content_hash: str):
+    """Returns the cached build for this exact source, if it was pushed before."""
+    return (
+        db.query(models.BuildCacheEntry)
+        .filter(models.BuildCacheEntry.function_id == function_id, models.BuildCacheEntry.content_hash == content_hash)
+        .first()
+    )
+
+
+def record(db: Session, function_id, content_hash: str, image: str):
+    """Remembers the image pushed for this source so later deploys can skip the build."""
+    db.add(models.BuildCacheEntry(function_id=function_id, content_hash=content_hash, image=image))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker recorded the same build first
+        db.rollback()
@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -12,13 +13,31 @@ db_server = os.getenv("POSTGRES_SERVER", "localhost") # Fallback to localhost if
 db_port = os.getenv("POSTGRES_PORT", "5432")
 db_name = os.getenv("POSTGRES_DB", "postgres")
 DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_server}:{db_port}/{db_name}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{db_user}:{db_password}@{db_server}:{db_port}/{db_name}"
 
 SQLALCHEMY_DATABASE_URL = DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool settings, shared by the sync and async engines
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+pool_options = dict(
+    pool_size=db_pool_size,
+    max_overflow=db_max_overflow,
+    pool_timeout=db_pool_timeout,
+    pool_pre_ping=db_pool_pre_ping,
+)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) for the request handlers that only talk to the database
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options)
+
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -31,4 +50,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Async counterpart of get_db: yields an AsyncSession so the route can
+    await the database instead of holding a threadpool thread.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
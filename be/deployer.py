@@ -0,0 +1,426 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Optional
+
+import git
+import yaml
+from fastapi import HTTPException, UploadFile
+
+import models
+import build_cache
+import revisions
+from backends import IMAGE_TAG_VARIABLE, get_backend
+from metrics import StageTimer
+from gateway import GATEWAY_URL
+from git_cache import GitMirrorCache
+from templates import TEMPLATE_LANG
+from storage import FILE_STORE_PATH, get_artifact_store
+from models import ChangeType, FunctionType, JobKind, SourceType, StatusType
+
+SRC_STORE_PATH_NAME = "src"
+CONFIG_STORE_PATH_NAME = "config"
+FUNCTIONS_PATH = os.path.join(FILE_STORE_PATH, "functions")
+IMAGES_PATH = os.path.join(FILE_STORE_PATH, "images")
+TEMP_PATH = os.path.join(FILE_STORE_PATH, "temp")
+GIT_MIRRORS_PATH = os.path.join(FILE_STORE_PATH, "git_mirrors")
+os.makedirs(FUNCTIONS_PATH, exist_ok=True)
+os.makedirs(IMAGES_PATH, exist_ok=True)
+os.makedirs(TEMP_PATH, exist_ok=True)
+
+git_mirrors = GitMirrorCache(GIT_MIRRORS_PATH)
+
+IMAGE_REPOSITORY = "rash27"
+
+
+def scaling_labels(policy) -> dict:
+    """
+    OpenFaaS labels for a scaling policy (a Function row or schemas.ScalingPolicy).
+    A target concurrency switches the autoscaler to capacity-based scaling.
+    """
+    labels = {
+        "com.openfaas.scale.min": str(policy.scale_min),
+        "com.openfaas.scale.max": str(policy.scale_max),
+        "com.openfaas.scale.factor": str(policy.scale_factor),
+        "com.openfaas.scale.zero": "true" if policy.scale_to_zero else "false",
+    }
+    if policy.target_concurrency:
+        labels["com.openfaas.scale.type"] = "capacity"
+        labels["com.openfaas.scale.target"] = str(policy.target_concurrency)
+    return labels
+
+
+def render_stack_yaml(function_id: str, labels: dict, image_name: Optional[str] = None) -> str:
+    """
+    Renders the OpenFaaS stack.yml for a function.
+    Buildable functions point at the ../src handler; IMAGE functions reuse `image_name`.
+    """
+    if image_name:
+        build_config = f"""    image: {image_name}
+    skip_build: true
+"""
+    else:
+        build_config = f"""    lang: {TEMPLATE_LANG}
+    handler: ../{SRC_STORE_PATH_NAME}
+    image: {IMAGE_REPOSITORY}/func-{function_id}:${{{IMAGE_TAG_VARIABLE}:-latest}}
+"""
+    label_lines = "".join(f'      {key}: "{value}"\n' for key, value in labels.items())
+    return f"""version: 1.0
+provider:
+  name: openfaas
+  gateway: {GATEWAY_URL}
+functions:
+  func-{function_id}:
+{build_config}    labels:
+{label_lines}"""
+
+
+def write_stack_labels(db_function: models.Function):
+    """Rewrites the labels in the function's stack.yml from its scaling policy."""
+    stack_file = os.path.join(function_config_path(db_function), "stack.yml")
+    if not os.path.exists(stack_file):
+        raise HTTPException(status_code=404, detail=f"stack.yml not found at {stack_file}")
+    with open(stack_file) as f:
+        stack = yaml.safe_load(f)
+    stack["functions"][f"func-{db_function.id}"]["labels"] = scaling_labels(db_function)
+    with open(stack_file, "w") as f:
+        yaml.safe_dump(stack, f, sort_keys=False)
+
+
+def function_src_path(db_function: models.Function) -> str:
+    """Directory holding the function's handler source."""
+    if db_function.source == SourceType.GITHUB:
+        return os.path.join(FUNCTIONS_PATH, str(db_function.id), SRC_STORE_PATH_NAME)
+    return os.path.join(db_function.location_url, SRC_STORE_PATH_NAME)
+
+
+def function_config_path(db_function: models.Function) -> str:
+    """Directory holding the function's stack.yml."""
+    if db_function.source == SourceType.GITHUB:
+        return os.path.join(FUNCTIONS_PATH, str(db_function.id), CONFIG_STORE_PATH_NAME)
+    if db_function.type == FunctionType.FUNCTION:
+        return os.path.join(db_function.location_url, CONFIG_STORE_PATH_NAME)
+    return db_function.location_url
+
+
+def fetch_github_handler(github_url: str, handler_path: Optional[str] = None):
+    """
+    Reads handler.go from the repository's mirror.
+    Returns (source, handler path in the repo, commit sha).
+    """
+    source, handler_path, commit_sha = git_mirrors.fetch_handler(github_url, handler_path)
+    if source is None:
+        raise HTTPException(status_code=404, detail="'handler.go' not found in the repository.")
+    return source, handler_path, commit_sha
+
+def refetch_from_github(db_function: models.Function):
+    """
+    Cleans old source and re-reads the handler from the repo's mirror.
+    Returns (handler path in the repo, commit sha); the caller stores the
+    path once it holds the row's lock (see lock_function).
+    """
+    print(f"Re-fetching source for GitHub function: {db_function.id}")
+    function_dir = os.path.join(FUNCTIONS_PATH, str(db_function.id))
+
+    source, handler_path, commit_sha = fetch_github_handler(db_function.location_url, db_function.handler_path)
+    print(f"Using {handler_path} at {commit_sha}")
+
+    if os.path.exists(function_dir):
+        shutil.rmtree(function_dir)
+
+    src_dir = os.path.join(function_dir, SRC_STORE_PATH_NAME)
+    config_dir = os.path.join(function_dir, CONFIG_STORE_PATH_NAME)
+    os.makedirs(src_dir, exist_ok=True)
+    os.makedirs(config_dir, exist_ok=True)
+
+    store = get_artifact_store()
+    store.link(store.put_bytes(source), os.path.join(src_dir, "handler.go"))
+
+    yaml_template = render_stack_yaml(str(db_function.id), scaling_labels(db_function))
+    with open(os.path.join(config_dir, "stack.yml"), "w") as f:
+        f.write(yaml_template)
+
+    return handler_path, commit_sha
+
+def update_source_file(db_function: models.Function, file: UploadFile):
+    """Replaces the handler.go file with (a link to the stored blob of) the uploaded one."""
+    print(f"Updating source file for function: {db_function.id}")
+    src_dir = function_src_path(db_function)
+    
+    if db_function.type != FunctionType.FUNCTION and db_function.source != SourceType.GITHUB:
+        return  # No file update needed for non-buildable functions
+
+    if not os.path.isdir(src_dir):
+        raise HTTPException(status_code=404, detail=f"Source directory not found at: {src_dir}")
+    
+    # Remove old .go file(s)
+    for filename in os.listdir(src_dir):
+        if filename.endswith(".go"):
+            os.remove(os.path.join(src_dir, filename))
+    
+    store = get_artifact_store()
+    try:
+        store.link(store.put(file.file), os.path.join(src_dir, "handler.go"))
+    finally:
+        file.file.close()
+
+def stage_source_upload(file: UploadFile) -> str:
+    """
+    Writes an uploaded handler.go to a temporary directory and formats it there,
+    so it can be compared with the deployed source before anything is replaced.
+    Returns the directory; the caller removes it.
+    """
+    staged_dir = tempfile.mkdtemp(dir=TEMP_PATH)
+    store = get_artifact_store()
+    try:
+        store.link(store.put(file.file), os.path.join(staged_dir, "handler.go"))
+    except Exception:
+        shutil.rmtree(staged_dir, ignore_errors=True)
+        raise
+    finally:
+        file.file.close()
+    try:
+        _gofmt(staged_dir)
+    except HTTPException as e:
+        # Left as uploaded; the deploy job reports the formatting error
+        print(f"Staged upload could not be formatted: {e.detail}")
+    return staged_dir
+
+def apply_staged_source(db_function: models.Function, staged_dir: str):
+    """Replaces the function's .go files with the staged upload."""
+    src_dir = function_src_path(db_function)
+    if not os.path.isdir(src_dir):
+        raise HTTPException(status_code=404, detail=f"Source directory not found at: {src_dir}")
+    for filename in os.listdir(src_dir):
+        if filename.endswith(".go"):
+            os.remove(os.path.join(src_dir, filename))
+    store = get_artifact_store()
+    for filename in os.listdir(staged_dir):
+        staged_path = os.path.join(staged_dir, filename)
+        digest = store.digest_of(staged_path)
+        if digest:
+            store.link(digest, os.path.join(src_dir, filename))
+        else:
+            shutil.move(staged_path, os.path.join(src_dir, filename))
+
+def format_go_code(db_function: models.Function):
+    """Runs gofmt on the function's source directory."""
+    src_path = function_src_path(db_function)
+    if db_function.type != FunctionType.FUNCTION and db_function.source != SourceType.GITHUB:
+        return  # No formatting needed for non-buildable functions
+    _gofmt(src_path)
+
+def _gofmt(src_path: str):
+    """
+    Formats the .go files under src_path. Sources are links to shared, read-only
+    blobs, so instead of rewriting in place ('gofmt -w') each file that needs
+    formatting is stored as a new blob and relinked.
+    """
+    print(f"Formatting Go code in: {src_path}")
+    store = get_artifact_store()
+    try:
+        unformatted = subprocess.run(
+            ["gofmt", "-s", "-l", "."],
+            cwd=src_path, check=True, capture_output=True, text=True
+        ).stdout.splitlines()
+        for relative_path in unformatted:
+            formatted = subprocess.run(
+                ["gofmt", "-s", relative_path],
+                cwd=src_path, check=True, capture_output=True
+            ).stdout
+            store.link(store.put_bytes(formatted), os.path.join(src_path, relative_path))
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors="replace") if isinstance(e.stderr, bytes) else e.stderr
+        raise HTTPException(status_code=500, detail=f"Failed to format Go code: {stderr}")
+
+def deploy_stack(db, db_function: models.Function, timer: StageTimer):
+    """
+    Deploys the function using its stack.yml through the deployment backend.
+    Buildable functions are looked up in the build cache first: if the handler
+    source and stack.yml hash to an image that was already pushed, it is only
+    deployed. Otherwise the image is built, pushed and deployed, tagged with
+    the hash, and the result is recorded for next time.
+    Returns (image, content hash) of what was deployed; the hash is None for IMAGE functions.
+    """
+    config_path = function_config_path(db_function)
+    backend = get_backend()
+    print(f"Deploying function from: {config_path}")
+
+    if db_function.type != FunctionType.FUNCTION and db_function.source != SourceType.GITHUB:
+        backend.deploy(config_path, timer)
+        with open(os.path.join(config_path, "stack.yml")) as f:
+            return yaml.safe_load(f)["functions"][f"func-{db_function.id}"]["image"], None
+
+    with timer.stage("hash"):
+        get_artifact_store().ensure_local(function_src_path(db_function))
+        content_hash = build_cache.compute_build_hash(
+            function_src_path(db_function), os.path.join(config_path, "stack.yml")
+        )
+        image_tag = build_cache.image_tag_for(content_hash)
+        cached = build_cache.lookup(db, db_function.id, content_hash)
+
+    image = f"{IMAGE_REPOSITORY}/func-{db_function.id}:{image_tag}"
+    if cached:
+        print(f"Build cache hit for {db_function.id}: {cached.image}")
+        backend.deploy(config_path, timer, image_tag=image_tag)
+        return image, content_hash
+
+    backend.build_and_deploy(config_path, timer, image_tag=image_tag)
+    build_cache.record(db, db_function.id, content_hash, image)
+    return image, content_hash
+
+
+def rollback_stack(db_function: models.Function, revision: models.FunctionRevision, timer: StageTimer):
+    """
+    Redeploys a stored revision: its stack.yml, with the image pinned to the
+    revision's digest and the function's current scaling labels. Nothing is
+    fetched or built. The function's stack.yml becomes the revision's, while
+    its stored source is left alone (a later update deploys it again).
+    The caller records the result (see run_deploy_job).
+    """
+    name = f"func-{db_function.id}"
+    stack = yaml.safe_load(revision.stack_config)
+    stack["functions"][name]["labels"] = scaling_labels(db_function)
+
+    config_path = function_config_path(db_function)
+    os.makedirs(config_path, exist_ok=True)
+    with open(os.path.join(config_path, "stack.yml"), "w") as f:
+        yaml.safe_dump(stack, f, sort_keys=False)
+
+    # Deploy from a copy holding the literal image, so the stored stack.yml keeps its tag variable
+    stack["functions"][name]["image"] = revisions.pinned_image(revision)
+    # Nothing is built, so the build settings aren't needed (and the handler path wouldn't resolve)
+    for key in ("lang", "handler"):
+        stack["functions"][name].pop(key, None)
+    rollback_dir = tempfile.mkdtemp(dir=TEMP_PATH)
+    try:
+        with open(os.path.join(rollback_dir, "stack.yml"), "w") as f:
+            yaml.safe_dump(stack, f, sort_keys=False)
+        print(f"Rolling {name} back to revision {revision.number}: {revisions.pinned_image(revision)}")
+        get_backend().deploy(rollback_dir, timer)
+    finally:
+        shutil.rmtree(rollback_dir, ignore_errors=True)
+
+
+def detect_change(db_function: models.Function, staged_dir: Optional[str] = None) -> ChangeType:
+    """
+    Compares what an update would deploy with what is live.
+    - NONE: same source (or GitHub commit) and same stack.yml.
+    - CONFIG: same source but a different stack.yml; IMAGE functions always
+      land here, since the image behind their tag may have moved.
+    - SOURCE: a new upload, commit or anything that can't be compared.
+    `staged_dir` holds a new upload (see stage_source_upload), if there is one.
+    """
+    if db_function.status != StatusType.DEPLOYED or not db_function.deployed_config_hash:
+        return ChangeType.SOURCE
+
+    if db_function.source == SourceType.GITHUB:
+        try:
+            source_changed = git_mirrors.head_commit(db_function.location_url) != db_function.deployed_commit_sha
+        except git.GitCommandError as e:
+            # Let the deploy job's fetch report it
+            print(f"Could not check {db_function.location_url} for new commits: {e}")
+            return ChangeType.SOURCE
+    elif db_function.type == FunctionType.FUNCTION:
+        src_dir = staged_dir or function_src_path(db_function)
+        source_changed = build_cache.compute_source_hash(src_dir) != db_function.deployed_source_hash
+    else:
+        return ChangeType.CONFIG
+    if source_changed:
+        return ChangeType.SOURCE
+
+    stack_file = os.path.join(function_config_path(db_function), "stack.yml")
+    if not os.path.exists(stack_file) or build_cache.compute_config_hash(stack_file) != db_function.deployed_config_hash:
+        return ChangeType.CONFIG
+    return ChangeType.NONE
+
+def lock_function(db, db_function: models.Function):
+    """
+    Re-reads the function with SELECT ... FOR UPDATE before a deploy records
+    its outcome. The deploy may have taken minutes, during which another
+    request or instance can have changed the row (its version_id moved on);
+    the outcome is written over the latest version, and nobody else can
+    change the row until the commit. update_deployment uses it the same way
+    after its (slow, unlocked) change detection.
+    """
+    db.refresh(db_function, with_for_update=True)
+
+def record_deployed_state(db_function: models.Function, commit_sha: Optional[str] = None):
+    """Remembers the source, commit and stack.yml that were just deployed (see detect_change)."""
+    if db_function.type == FunctionType.FUNCTION or db_function.source == SourceType.GITHUB:
+        db_function.deployed_source_hash = build_cache.compute_source_hash(function_src_path(db_function))
+    if commit_sha:
+        db_function.deployed_commit_sha = commit_sha
+    db_function.deployed_config_hash = build_cache.compute_config_hash(
+        os.path.join(function_config_path(db_function), "stack.yml")
+    )
+
+def run_deploy_job(db, job: models.DeployJob, db_function: models.Function, progress):
+    """
+    Runs the deploy pipeline for a queued job on a build worker thread.
+    - For GitHub-sourced functions, it re-fetches the latest code.
+    - For all buildable functions, it formats the code before deploying.
+    - RECONFIGURE jobs (the source is unchanged) skip both and only redeploy,
+      which finds the image in the build cache.
+    - ROLLBACK jobs redeploy the job's revision (see rollback_stack).
+    - Every successful deploy is recorded as a revision.
+    - Updates the function's status to 'deployed' upon success. On failure the
+      status is left as 'pending' (update jobs set it before being queued).
+    Every stage is timed and stored as deployment events, whatever the outcome.
+    """
+    timer = StageTimer(job.kind.value.lower(), progress)
+    commit_sha = None
+    handler_path = None
+    try:
+        with timer:
+            if job.kind == JobKind.ROLLBACK:
+                revision = db.get(models.FunctionRevision, job.revision_id) if job.revision_id else None
+                if revision is None or revision.function_id != db_function.id:
+                    raise HTTPException(status_code=404, detail="Revision not found")
+                rollback_stack(db_function, revision, timer)
+                lock_function(db, db_function)
+                db_function.deployed_source_hash = revision.source_hash
+                db_function.deployed_commit_sha = revision.commit_sha
+                db_function.deployed_config_hash = build_cache.compute_config_hash(
+                    os.path.join(function_config_path(db_function), "stack.yml")
+                )
+                db_function.deployed_revision = revision.number
+                db_function.status = StatusType.DEPLOYED
+                db.commit()
+                return
+
+            if job.kind != JobKind.RECONFIGURE:
+                if db_function.source == SourceType.GITHUB:
+                    with timer.stage("fetch"):
+                        handler_path, commit_sha = refetch_from_github(db_function)
+
+                if db_function.type == FunctionType.FUNCTION:
+                    with timer.stage("format"):
+                        format_go_code(db_function)
+
+            image, content_hash = deploy_stack(db, db_function, timer)
+
+            lock_function(db, db_function)
+            if handler_path:
+                db_function.handler_path = handler_path
+            record_deployed_state(db_function, commit_sha)
+            revisions.record(
+                db, db_function, os.path.join(function_config_path(db_function), "stack.yml"), image, content_hash, job.id
+            )
+            db_function.status = StatusType.DEPLOYED
+            db.commit()
+    finally:
+        record_deployment_events(db, timer, db_function.id, job.id)
+
+
+def record_deployment_events(db, timer: StageTimer, function_id, job_id=None):
+    """Stores the timer's stages; a failure here never masks the deploy's own outcome."""
+    try:
+        if timer.failed:
+            db.rollback()
+        timer.persist(db, function_id, job_id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to record deployment events for {function_id}: {e}")
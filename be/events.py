@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Optional
+
+from prometheus_client import Counter, Gauge
+
+# Events kept for subscribers that fall behind or reconnect with Last-Event-ID
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+# An idle stream gets a comment this often, so proxies keep it open and dead clients are noticed
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+EVENTS_PUBLISHED = Counter(
+    "events_published_total",
+    "Events published on the status event bus, by type.",
+    ["type"],
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers",
+    "Clients connected to the /events stream.",
+)
+
+
+class EventBus:
+    """
+    In-process feed of state changes (functions, deploy jobs, replicas).
+
+    Events are numbered and kept in a ring of EVENT_BUFFER_SIZE, each already
+    rendered as a Server-Sent Event. Subscribers don't get their own queues:
+    each one keeps the number of the last event it sent and reads what came
+    after it from the ring. A publish wakes every waiting subscriber by
+    resolving one shared future on the event loop, so its cost doesn't depend
+    on how many clients are connected.
+
+    publish() is safe to call from any thread; subscribers run on the loop
+    passed to bind(). A subscriber more than EVENT_BUFFER_SIZE events behind
+    is told to reload instead (see stream()).
+    """
+
+    def __init__(self, size: int = EVENT_BUFFER_SIZE):
+        self.size = size
+        self._ring = [None] * size
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._waiter = None
+        self._wake_scheduled = False
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Sets the event loop subscribers run on (called at application startup)."""
+        self._loop = loop
+
+    def publish(self, event_type: str, data: dict):
+        data = json.dumps(data, default=str)
+        with self._lock:
+            self._sequence += 1
+            self._ring[self._sequence % self.size] = f"id: {self._sequence}\nevent: {event_type}\ndata: {data}\n\n"
+            wake = self._loop is not None and not self._wake_scheduled
+            self._wake_scheduled = self._wake_scheduled or wake
+        EVENTS_PUBLISHED.labels(event_type).inc()
+        if wake:
+            try:
+                self._loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                # The loop is closed (shutting down); nobody is listening any more
+                pass
+
+    def _wake(self):
+        with self._lock:
+            self._wake_scheduled = False
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def since(self, last_id: int):
+        """Returns (rendered events after last_id, new last_id), or (None, latest id) if they are no longer buffered."""
+        with self._lock:
+            latest = self._sequence
+            if latest - last_id > self.size or last_id > latest:
+                return None, latest
+            return [self._ring[i % self.size] for i in range(last_id + 1, latest + 1)], latest
+
+    async def wait(self, timeout: float) -> bool:
+        """Waits for the next publish; False on timeout. Must not be preceded by an await after since()."""
+        if self._waiter is None:
+            self._waiter = self._loop.create_future()
+        done, _ = await asyncio.wait([self._waiter], timeout=timeout)
+        return bool(done)
+
+    async def stream(self, last_id: Optional[int] = None):
+        """
+        Yields SSE text for every event after last_id (from now on when None).
+        An unknown (e.g. from before a restart) or too old last_id yields a
+        `resync` event first: the client should reload full state, then keep
+        applying deltas.
+        """
+        EVENT_SUBSCRIBERS.inc()
+        try:
+            cursor = self._sequence if last_id is None else last_id
+            yield "retry: 3000\n\n"
+            while True:
+                events, cursor = self.since(cursor)
+                if events is None:
+                    yield f"id: {cursor}\nevent: resync\ndata: {{}}\n\n"
+                elif events:
+                    yield "".join(events)
+                elif not await self.wait(EVENT_KEEPALIVE_SECONDS):
+                    yield ": keepalive\n\n"
+        finally:
+            EVENT_SUBSCRIBERS.dec()
+
+
+def function_event(db_function) -> dict:
+    return {
+        "id": db_function.id,
+        "name": db_function.name,
+        "status": db_function.status.value if db_function.status else None,
+        "deployed_revision": db_function.deployed_revision,
+    }
+
+
+def job_event(db_job) -> dict:
+    return {
+        "id": db_job.id,
+        "function_id": db_job.function_id,
+        "batch_id": db_job.batch_id,
+        "kind": db_job.kind.value if db_job.kind else None,
+        "status": db_job.status.value if db_job.status else None,
+        "stage": db_job.stage,
+        "error": db_job.error,
+    }
+
+
+def batch_event(db_batch) -> dict:
+    return {
+        "id": db_batch.id,
+        "status": db_batch.status.value if db_batch.status else None,
+        "stage": db_batch.stage,
+        "error": db_batch.error,
+    }
+
+
+_bus = None
+
+
+def get_event_bus() -> EventBus:
+    """The process-wide event bus."""
+    global _bus
+    if _bus is None:
+        _bus = EventBus()
+    return _bus
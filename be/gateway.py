@@ -0,0 +1,104 @@
+import os
+from typing import Optional
+
+import httpx
+
+GATEWAY_URL = os.getenv("OPENFAAS_GATEWAY_URL", "http://127.0.0.1:31112")
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "200"))
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", "100"))
+GATEWAY_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY_SECONDS", "30"))
+GATEWAY_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_CONNECT_TIMEOUT_SECONDS", "5"))
+# Used for functions that don't set invoke_timeout_seconds
+DEFAULT_INVOKE_TIMEOUT_SECONDS = float(os.getenv("DEFAULT_INVOKE_TIMEOUT_SECONDS", "30"))
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2]) and is
+# negotiated over TLS, so it only kicks in for an https:// gateway.
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection-level headers that must not be forwarded by a proxy
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def forwardable_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+class GatewayClient:
+    """
+    The process-wide connection pool to the OpenFaaS gateway.
+
+    Every invocation (the /invoke proxy, the queue worker) goes through one
+    httpx.AsyncClient, so connections are kept alive and reused instead of
+    being set up per call. `transport` can be an httpx.MockTransport.
+    """
+
+    def __init__(self, base_url: str = GATEWAY_URL, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self._transport = transport
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_AVAILABLE,
+                transport=self._transport,
+                limits=httpx.Limits(
+                    max_connections=GATEWAY_MAX_CONNECTIONS,
+                    max_keepalive_connections=GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(DEFAULT_INVOKE_TIMEOUT_SECONDS, connect=GATEWAY_CONNECT_TIMEOUT_SECONDS),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def invoke(
+        self,
+        function_id,
+        method: str = "POST",
+        path: str = "",
+        headers: Optional[dict] = None,
+        params=None,
+        content=None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """
+        Calls func-<function_id> (plus an optional sub-path) through the gateway.
+        With stream=True the response body is not read: iterate it and aclose() it.
+        `timeout` is the read/write timeout in seconds; None means the default.
+        """
+        timeout = timeout or DEFAULT_INVOKE_TIMEOUT_SECONDS
+        request = self.client.build_request(
+            method,
+            f"/function/func-{function_id}/{path.lstrip('/')}" if path else f"/function/func-{function_id}",
+            headers=headers,
+            params=params,
+            content=content,
+            timeout=httpx.Timeout(timeout, connect=min(GATEWAY_CONNECT_TIMEOUT_SECONDS, timeout)),
+        )
+        return await self.client.send(request, stream=stream)
+
+
+_gateway = None
+
+
+def get_gateway() -> GatewayClient:
+    """The process-wide gateway client."""
+    global _gateway
+    if _gateway is None:
+        _gateway = GatewayClient()
+    return _gateway
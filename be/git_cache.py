@@ -0,0 +1,92 @@
+import hashlib
+import os
+import shutil
+import threading
+from typing import Optional, Tuple
+
+import git
+
+HANDLER_FILENAME = "handler.go"
+
+
+class GitMirrorCache:
+    """
+    Keeps one bare, blob-less mirror per repository URL under `root`.
+
+    The first request for a repository clones it with '--filter=blob:none', so only
+    commits and trees are transferred; later requests run an incremental fetch.
+    The handler is read straight out of the object store with 'git cat-file',
+    which lazily downloads that single blob, so nothing is ever checked out.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _mirror_path(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(url.encode()).hexdigest() + ".git")
+
+    def _lock(self, url: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def _sync(self, url: str) -> git.Repo:
+        """Clones the mirror on first use, otherwise fetches new commits into it."""
+        mirror_path = self._mirror_path(url)
+        if os.path.isdir(mirror_path):
+            repo = git.Repo(mirror_path)
+            print(f"Fetching {url} into mirror {mirror_path}...")
+            repo.git.fetch("--prune", "origin", "+refs/heads/*:refs/heads/*")
+            return repo
+
+        print(f"Creating mirror of {url} at {mirror_path}...")
+        tmp_path = mirror_path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        repo = git.Repo.clone_from(url, tmp_path, bare=True, multi_options=["--filter=blob:none"])
+        os.rename(tmp_path, mirror_path)
+        return git.Repo(mirror_path)
+
+    @staticmethod
+    def _find_handler(repo: git.Repo, commit_sha: str) -> Optional[str]:
+        """Lists the tree (no checkout) and returns the shallowest handler.go."""
+        paths = repo.git.ls_tree("-r", "--name-only", commit_sha).splitlines()
+        candidates = [p for p in paths if p == HANDLER_FILENAME or p.endswith("/" + HANDLER_FILENAME)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda p: (p.count("/"), p))
+
+    @staticmethod
+    def _has_path(repo: git.Repo, commit_sha: str, path: str) -> bool:
+        try:
+            repo.git.cat_file("-e", f"{commit_sha}:{path}")
+            return True
+        except git.GitCommandError:
+            return False
+
+    def head_commit(self, url: str) -> str:
+        """Fetches the mirror and returns the default branch's commit sha."""
+        with self._lock(url):
+            return self._sync(url).git.rev_parse("HEAD")
+
+    def fetch_handler(self, url: str, handler_path: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str], str]:
+        """
+        Returns (handler source, handler path in the repo, commit sha) for the
+        repository's default branch. `handler_path` is the location remembered
+        from the previous fetch; the tree is only searched when it's gone.
+        The source and path are None when no handler.go exists.
+        Raises git.GitCommandError when the repository can't be reached.
+        """
+        with self._lock(url):
+            repo = self._sync(url)
+            commit_sha = repo.git.rev_parse("HEAD")
+
+            if not handler_path or not self._has_path(repo, commit_sha, handler_path):
+                handler_path = self._find_handler(repo, commit_sha)
+                if not handler_path:
+                    return None, None, commit_sha
+
+            source = repo.git.cat_file("blob", f"{commit_sha}:{handler_path}", stdout_as_string=False, strip_newline_in_stdout=False)
+            return source, handler_path, commit_sha
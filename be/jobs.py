@@ -0,0 +1,377 @@
+import os
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from events import batch_event, function_event, get_event_bus, job_event
+from leader import INSTANCE_ID
+from models import JobKind, JobStatus, StatusType
+
+DEPLOY_WORKERS = int(os.getenv("DEPLOY_WORKERS", "4"))
+# Workers also poll the table so jobs queued before a restart are picked up
+JOB_POLL_SECONDS = float(os.getenv("DEPLOY_JOB_POLL_SECONDS", "2"))
+# Running jobs are marked alive this often; one not marked for JOB_STALE_SECONDS
+# was abandoned by a crashed instance and is queued again
+JOB_HEARTBEAT_SECONDS = float(os.getenv("DEPLOY_JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = float(os.getenv("DEPLOY_JOB_STALE_SECONDS", "60"))
+
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Persisted deploy queue backed by the 'deploy_jobs' table.
+
+    Request handlers call submit() and return the job straight away; a bounded
+    pool of worker threads claims QUEUED rows (oldest first) and runs `handler`
+    for each one. Progress is written back to the row so clients can poll it,
+    and published on the event bus (`job`, `batch` and `function` events).
+
+    Batches (submit_batch()) are claimed the same way from 'deploy_batches';
+    their member jobs are run together by `batch_handler`, never on their own.
+
+    Several API instances can share the tables: claims use SKIP LOCKED, a
+    partial unique index allows one active job per function, and running
+    jobs carry the claiming instance and a heartbeat so that only abandoned
+    ones are requeued (requeue_abandoned(), run by the leader).
+    """
+
+    def __init__(self, session_factory, handler, batch_handler=None, workers: int = DEPLOY_WORKERS):
+        self._session_factory = session_factory
+        self._handler = handler
+        self._batch_handler = batch_handler
+        self._workers = workers
+        self._wakeup = queue.Queue()
+        self._stop = threading.Event()
+        self._events = get_event_bus()
+        self._threads = []
+        self._reaper_stop = threading.Event()
+        self._reaper = None
+
+    def start(self):
+        self._requeue_interrupted()
+        self._stop.clear()
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"deploy-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="deploy-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        print(f"Started {self._workers} deploy workers as {INSTANCE_ID}")
+
+    def stop(self):
+        self._stop.set()
+        for _ in self._threads:
+            self._wakeup.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, db: Session, function_id, kind: JobKind, revision_id=None, before_commit=None) -> models.DeployJob:
+        """
+        Queues a job for the function. Only one active job per function is allowed.
+        `revision_id` is the revision a ROLLBACK job redeploys. `before_commit`
+        runs once the job row is inserted (so the function is known to have no
+        other active job) but before any worker can see it.
+        """
+        active_job = (
+            db.query(models.DeployJob)
+            .filter(models.DeployJob.function_id == function_id, models.DeployJob.status.in_(ACTIVE_STATUSES))
+            .first()
+        )
+        if active_job:
+            raise HTTPException(
+                status_code=409,
+                detail=f"A deployment job is already in progress for this function: {active_job.id}"
+            )
+
+        db_job = models.DeployJob(function_id=function_id, kind=kind, status=JobStatus.QUEUED, stage="queued", revision_id=revision_id)
+        db.add(db_job)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another instance queued one between our check and insert
+            db.rollback()
+            raise HTTPException(status_code=409, detail="A deployment job is already in progress for this function")
+        if before_commit:
+            try:
+                before_commit()
+            except Exception:
+                db.rollback()
+                raise
+        db.commit()
+        db.refresh(db_job)
+
+        self._events.publish("job", job_event(db_job))
+        self._wakeup.put(db_job.id)
+        return db_job
+
+    def submit_batch(self, db: Session, db_functions, parallelism: int, shard_size: int):
+        """
+        Queues one batch over the given functions. Functions that already have an
+        active job are left out and returned as (function_id, reason) pairs.
+        Returns (batch, skipped).
+        """
+        function_ids = [db_function.id for db_function in db_functions]
+        busy = {
+            function_id for (function_id,) in
+            db.query(models.DeployJob.function_id)
+            .filter(models.DeployJob.function_id.in_(function_ids), models.DeployJob.status.in_(ACTIVE_STATUSES))
+        }
+        skipped = [(function_id, "A deployment job is already in progress for this function") for function_id in function_ids if function_id in busy]
+        if len(skipped) == len(function_ids):
+            raise HTTPException(status_code=409, detail="Every function in the batch already has a deployment job in progress")
+
+        db_batch = models.DeployBatch(status=JobStatus.QUEUED, stage="queued", parallelism=parallelism, shard_size=shard_size)
+        db.add(db_batch)
+        db.flush()
+        for db_function in db_functions:
+            if db_function.id in busy:
+                continue
+            kind = JobKind.UPDATE if db_function.status == StatusType.DEPLOYED else JobKind.DEPLOY
+            db.add(models.DeployJob(function_id=db_function.id, kind=kind, status=JobStatus.QUEUED, stage="queued", batch_id=db_batch.id))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="A function in the batch got a deployment job meanwhile; try again")
+        db.refresh(db_batch)
+
+        self._events.publish("batch", batch_event(db_batch))
+        self._wakeup.put(db_batch.id)
+        return db_batch, skipped
+
+    def _requeue(self, condition_for):
+        """Queues again the RUNNING jobs and batches matching condition_for(model); returns the counts."""
+        with self._session_factory() as db:
+            jobs = (
+                db.query(models.DeployJob)
+                # Batch members follow their batch
+                .filter(models.DeployJob.status == JobStatus.RUNNING, models.DeployJob.batch_id.is_(None),
+                        condition_for(models.DeployJob))
+                .update({"status": JobStatus.QUEUED, "stage": "queued", "worker": None}, synchronize_session=False)
+            )
+            batches = (
+                db.query(models.DeployBatch)
+                .filter(models.DeployBatch.status == JobStatus.RUNNING, condition_for(models.DeployBatch))
+                .update({"status": JobStatus.QUEUED, "stage": "queued", "worker": None}, synchronize_session=False)
+            )
+            db.commit()
+        if jobs or batches:
+            self._wakeup.put(None)
+        return jobs, batches
+
+    def _requeue_interrupted(self):
+        """
+        Jobs this instance (same INSTANCE_ID) left RUNNING before a restart will
+        never finish, so queue them again; so are jobs from before heartbeats.
+        """
+        jobs, batches = self._requeue(
+            lambda model: or_(model.worker == INSTANCE_ID, model.heartbeat_at.is_(None))
+        )
+        if jobs or batches:
+            print(f"Re-queued {jobs} interrupted deploy job(s) and {batches} batch(es)")
+
+    def requeue_abandoned(self):
+        """Queues again the jobs whose instance stopped sending heartbeats (run by the leader)."""
+        cutoff = _now() - timedelta(seconds=JOB_STALE_SECONDS)
+        jobs, batches = self._requeue(lambda model: model.heartbeat_at < cutoff)
+        if jobs or batches:
+            print(f"Re-queued {jobs} abandoned deploy job(s) and {batches} batch(es)")
+
+    def start_reaper(self):
+        """Runs requeue_abandoned() periodically until stop_reaper() (on the leader only)."""
+        self._reaper_stop.clear()
+        self._reaper = threading.Thread(target=self._reaper_loop, name="deploy-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self):
+        self._reaper_stop.set()
+        if self._reaper:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+    def _reaper_loop(self):
+        while not self._reaper_stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                self.requeue_abandoned()
+            except Exception as e:
+                print(f"Requeueing abandoned deploy jobs failed: {e}")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with self._session_factory() as db:
+                    for model in (models.DeployJob, models.DeployBatch):
+                        (
+                            db.query(model)
+                            .filter(model.status == JobStatus.RUNNING, model.worker == INSTANCE_ID)
+                            .update({"heartbeat_at": _now()}, synchronize_session=False)
+                        )
+                    db.commit()
+            except Exception as e:
+                print(f"Deploy job heartbeat failed: {e}")
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim_next()
+                batch_id = None if job_id or not self._batch_handler else self._claim_next_batch()
+            except Exception as e:
+                print(f"Failed to claim deploy job: {e}")
+                job_id = batch_id = None
+
+            if job_id is not None:
+                self._run(job_id)
+            elif batch_id is not None:
+                self._run_batch(batch_id)
+            else:
+                try:
+                    self._wakeup.get(timeout=JOB_POLL_SECONDS)
+                except queue.Empty:
+                    pass
+
+    def _claim_next(self):
+        """Marks the oldest QUEUED job as RUNNING and returns its id (or None)."""
+        with self._session_factory() as db:
+            db_job = (
+                db.query(models.DeployJob)
+                .filter(models.DeployJob.status == JobStatus.QUEUED, models.DeployJob.batch_id.is_(None))
+                .order_by(models.DeployJob.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if not db_job:
+                return None
+            db_job.status = JobStatus.RUNNING
+            db_job.stage = "starting"
+            db_job.started_at = db_job.heartbeat_at = _now()
+            db_job.worker = INSTANCE_ID
+            db.commit()
+            self._events.publish("job", job_event(db_job))
+            return db_job.id
+
+    def _claim_next_batch(self):
+        """Marks the oldest QUEUED batch as RUNNING and returns its id (or None)."""
+        with self._session_factory() as db:
+            db_batch = (
+                db.query(models.DeployBatch)
+                .filter(models.DeployBatch.status == JobStatus.QUEUED)
+                .order_by(models.DeployBatch.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if not db_batch:
+                return None
+            db_batch.status = JobStatus.RUNNING
+            db_batch.stage = "starting"
+            db_batch.started_at = db_batch.heartbeat_at = _now()
+            db_batch.worker = INSTANCE_ID
+            db.commit()
+            self._events.publish("batch", batch_event(db_batch))
+            return db_batch.id
+
+    def _run(self, job_id):
+        db = self._session_factory()
+        try:
+            db_job = db.query(models.DeployJob).filter(models.DeployJob.id == job_id).first()
+            db_function = db.query(models.Function).filter(models.Function.id == db_job.function_id).first()
+
+            def progress(stage: str):
+                db_job.stage = stage
+                db.commit()
+                self._events.publish("job", job_event(db_job))
+
+            try:
+                if not db_function:
+                    raise HTTPException(status_code=404, detail="Function not found")
+                self._handler(db, db_job, db_function, progress)
+                db_job.status = JobStatus.SUCCEEDED
+                db_job.stage = "done"
+            except HTTPException as e:
+                db.rollback()
+                db_job.status = JobStatus.FAILED
+                db_job.error = str(e.detail)
+            except Exception as e:
+                db.rollback()
+                db_job.status = JobStatus.FAILED
+                db_job.error = f"An unexpected error occurred: {e}"
+
+            db_job.finished_at = _now()
+            db.commit()
+            print(f"Deploy job {job_id} finished: {db_job.status.value}")
+            self._events.publish("job", job_event(db_job))
+            if db_function:
+                self._events.publish("function", function_event(db_function))
+        except Exception as e:
+            print(f"Deploy job {job_id} could not be recorded: {e}")
+        finally:
+            db.close()
+
+    def _publish_batch(self, db, db_batch):
+        """Publishes a finished batch with the outcome of each of its jobs and functions."""
+        self._events.publish("batch", batch_event(db_batch))
+        db_jobs = db.query(models.DeployJob).filter(models.DeployJob.batch_id == db_batch.id).all()
+        function_ids = [db_job.function_id for db_job in db_jobs]
+        for db_job in db_jobs:
+            self._events.publish("job", job_event(db_job))
+        for db_function in db.query(models.Function).filter(models.Function.id.in_(function_ids)):
+            self._events.publish("function", function_event(db_function))
+
+    def _run_batch(self, batch_id):
+        db = self._session_factory()
+        try:
+            db_batch = db.query(models.DeployBatch).filter(models.DeployBatch.id == batch_id).first()
+            # Members that finished before an interruption keep their result
+            db_jobs = (
+                db.query(models.DeployJob)
+                .filter(models.DeployJob.batch_id == batch_id, models.DeployJob.status.in_(ACTIVE_STATUSES))
+                .all()
+            )
+
+            def progress(stage: str):
+                db_batch.stage = stage
+                db.commit()
+                self._events.publish("batch", batch_event(db_batch))
+
+            try:
+                if db_jobs:
+                    self._batch_handler(db, db_batch, db_jobs, progress)
+                db_batch.status = JobStatus.SUCCEEDED
+                db_batch.stage = "done"
+            except HTTPException as e:
+                db.rollback()
+                db_batch.status = JobStatus.FAILED
+                db_batch.error = str(e.detail)
+            except Exception as e:
+                db.rollback()
+                db_batch.status = JobStatus.FAILED
+                db_batch.error = f"An unexpected error occurred: {e}"
+
+            if db_batch.status == JobStatus.FAILED:
+                # Members the batch never got to report on fail with it
+                (
+                    db.query(models.DeployJob)
+                    .filter(models.DeployJob.batch_id == batch_id, models.DeployJob.status.in_(ACTIVE_STATUSES))
+                    .update({"status": JobStatus.FAILED, "error": db_batch.error, "finished_at": _now()}, synchronize_session=False)
+                )
+            db_batch.finished_at = _now()
+            db.commit()
+            print(f"Deploy batch {batch_id} finished: {db_batch.status.value}")
+            self._publish_batch(db, db_batch)
+        except Exception as e:
+            print(f"Deploy batch {batch_id} could not be recorded: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,98 @@
+import os
+import socket
+import threading
+
+from sqlalchemy import text
+
+# Identifies this API process in deploy_jobs.worker; defaults to host and pid
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Postgres advisory lock key held by the leader instance
+LEADER_LOCK_KEY = int(os.getenv("LEADER_LOCK_KEY", "726354019"))
+# How often a follower tries to become leader, and the leader checks it still is
+LEADER_CHECK_SECONDS = float(os.getenv("LEADER_CHECK_SECONDS", "5"))
+
+
+class LeaderElection:
+    """
+    Picks one leader among the API instances sharing a database, for work that
+    must run exactly once (the queue autoscaler, requeueing abandoned jobs).
+
+    The leader is whoever holds a session-level Postgres advisory lock on
+    LEADER_LOCK_KEY. It keeps a dedicated connection open for as long as it
+    leads; if that connection (or the process) dies, Postgres releases the
+    lock and another instance takes over within LEADER_CHECK_SECONDS.
+
+    `on_elected` and `on_demoted` are called from the election thread.
+    """
+
+    def __init__(self, engine, on_elected, on_demoted, key: int = LEADER_LOCK_KEY,
+                 interval: float = LEADER_CHECK_SECONDS):
+        self._engine = engine
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._key = key
+        self._interval = interval
+        self._connection = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self._interval + 5)
+        if self.is_leader:
+            self._resign()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader:
+                    self._connection.execute(text("SELECT 1"))
+                else:
+                    self._try_acquire()
+            except Exception as e:
+                print(f"Leader election check failed: {e}")
+                if self.is_leader:
+                    self._demote(invalidate=True)
+            self._stop.wait(self._interval)
+
+    def _try_acquire(self):
+        connection = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return
+        self._connection = connection
+        print(f"{INSTANCE_ID} is now the leader")
+        self._on_elected()
+
+    def _resign(self):
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._key})
+        except Exception:
+            pass
+        self._demote()
+
+    def _demote(self, invalidate: bool = False):
+        connection, self._connection = self._connection, None
+        try:
+            self._on_demoted()
+        finally:
+            # A broken connection mustn't go back to the pool still holding the lock
+            if invalidate:
+                connection.invalidate()
+            connection.close()
+        print(f"{INSTANCE_ID} is no longer the leader")
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import List, Optional
+
+from cachetools import LRUCache
+from prometheus_client import Counter
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+
+# Distinct listing pages (cursor, limit, filters) kept serialized
+LISTING_CACHE_ENTRIES = int(os.getenv("LISTING_CACHE_ENTRIES", "256"))
+# Other API instances announce their changes (see notifications.py); pages older than this are
+# rebuilt anyway, for changes made any other way (other processes, bulk updates)
+LISTING_CACHE_MAX_AGE_SECONDS = float(os.getenv("LISTING_CACHE_MAX_AGE_SECONDS", "5"))
+
+LISTING_CACHE_REQUESTS = Counter(
+    "listing_cache_requests_total",
+    "/functions/ requests by result (hit, miss, not_modified).",
+    ["result"],
+)
+
+# Validates ORM rows and writes JSON in one pass in pydantic-core, instead of
+# FastAPI's response_model validation plus jsonable_encoder
+FUNCTION_LIST = TypeAdapter(List[schemas.Function])
+
+ListingPage = namedtuple("ListingPage", ["version", "built_at", "body", "etag", "next_cursor"])
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison, '*' matches anything)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ListingCache:
+    """
+    Serialized pages of the function listing, with their ETags.
+
+    `version` goes up after every commit that created, changed or deleted a
+    Function row (see watch()), which covers uploads, updates, scaling and
+    invocation changes, deploys, rollbacks and undeploys alike. A page built
+    at an older version is rebuilt on its next request; so is one older than
+    LISTING_CACHE_MAX_AGE_SECONDS, for changes made by other processes.
+
+    The ETag is a hash of the body, so a rebuilt but unchanged page keeps its
+    ETag and clients still get a 304.
+    """
+
+    def __init__(self, maxsize: int = LISTING_CACHE_ENTRIES, max_age: float = LISTING_CACHE_MAX_AGE_SECONDS):
+        self.version = 0
+        self.max_age = max_age
+        self._pages = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def watch(self, session_class=Session):
+        """Bumps the version after commits of sessions (sync and async) that flushed Function rows."""
+        event.listen(session_class, "after_flush", self._after_flush)
+        event.listen(session_class, "after_commit", self._after_commit)
+        event.listen(session_class, "after_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        if any(isinstance(obj, models.Function) for obj in (*session.new, *session.dirty, *session.deleted)):
+            session.info["functions_changed"] = True
+
+    def _after_commit(self, session):
+        # Only after the commit: a page built from the old rows must not get the new version
+        if session.info.pop("functions_changed", False):
+            self.bump()
+
+    def _after_rollback(self, session):
+        session.info.pop("functions_changed", None)
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+
+    def get(self, key) -> Optional[ListingPage]:
+        """The cached page for key, if it is still current."""
+        with self._lock:
+            page = self._pages.get(key)
+        if page is None or page.version != self.version or time.monotonic() - page.built_at > self.max_age:
+            return None
+        return page
+
+    def put(self, key, version: int, functions, next_cursor: Optional[str]) -> ListingPage:
+        """
+        Serializes a page of Function rows and caches it. `version` must be
+        read before the rows were queried.
+        """
+        body = FUNCTION_LIST.dump_json(FUNCTION_LIST.validate_python(functions, from_attributes=True))
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        page = ListingPage(version, time.monotonic(), body, etag, next_cursor)
+        with self._lock:
+            self._pages[key] = page
+        return page
@@ -0,0 +1,365 @@
+import asyncio
+import heapq
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Optional
+
+from kubernetes import client
+
+from status_cache import FUNCTION_LABEL, FUNCTION_NAMESPACE
+
+# Recent lines kept per watched function, to serve `tail` and `since` to new viewers
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "1000"))
+# Lines queued for one viewer; a viewer that falls further behind loses lines instead of growing memory
+LOG_SUBSCRIBER_BUFFER = int(os.getenv("LOG_SUBSCRIBER_BUFFER", "500"))
+# Lines from different pods are held this long so they can be sent in timestamp order
+LOG_MERGE_WINDOW_SECONDS = float(os.getenv("LOG_MERGE_WINDOW_SECONDS", "0.5"))
+# How often a watch looks for new (scaled up or restarted) pods
+LOG_POD_RESYNC_SECONDS = float(os.getenv("LOG_POD_RESYNC_SECONDS", "10"))
+
+
+def _parse_timestamp(stamp: str) -> Optional[float]:
+    """Epoch seconds of an RFC3339 timestamp as Kubernetes writes it (UTC, up to nanoseconds)."""
+    try:
+        seconds = datetime.strptime(stamp[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+    fraction = stamp[19:].rstrip("Z")
+    if fraction.startswith("."):
+        seconds += float("0" + fraction)
+    return seconds
+
+
+class LogLine:
+    """One line of a pod's output, as returned with timestamps=true."""
+
+    __slots__ = ("timestamp", "time", "pod", "message")
+
+    def __init__(self, pod: str, raw):
+        text = raw.decode(errors="replace") if isinstance(raw, bytes) else raw
+        text = text.rstrip("\r\n")
+        stamp, _, message = text.partition(" ")
+        timestamp = _parse_timestamp(stamp)
+        if timestamp is None:
+            # Not timestamped (shouldn't happen); keep the whole line
+            timestamp, stamp, message = time.time(), "", text
+        self.timestamp = timestamp
+        self.time = stamp
+        self.pod = pod
+        self.message = message
+
+    def __lt__(self, other):
+        return self.timestamp < other.timestamp
+
+    def to_json(self) -> str:
+        return json.dumps({"time": self.time, "pod": self.pod, "message": self.message})
+
+
+def list_pods(api, name: str, namespace: str = FUNCTION_NAMESPACE):
+    """Names of the running pods of a function deployment."""
+    pods = api.list_namespaced_pod(namespace=namespace, label_selector=f"{FUNCTION_LABEL}={name}")
+    return sorted(pod.metadata.name for pod in pods.items if pod.status is None or pod.status.phase in (None, "Running"))
+
+
+def _read_pod(api, pod: str, namespace: str, **kwargs):
+    """Yields LogLines of one pod; kwargs go to read_namespaced_pod_log."""
+    response = api.read_namespaced_pod_log(pod, namespace, timestamps=True, _preload_content=False, **kwargs)
+    try:
+        for raw in response:
+            yield LogLine(pod, raw)
+    finally:
+        response.release_conn()
+
+
+def read_logs(api, name: str, tail: Optional[int] = None, since: Optional[int] = None,
+              namespace: str = FUNCTION_NAMESPACE):
+    """One-off read of every pod of a function, merged by timestamp."""
+    lines = []
+    for pod in list_pods(api, name, namespace):
+        try:
+            lines.extend(_read_pod(api, pod, namespace, tail_lines=tail, since_seconds=since))
+        except client.ApiException as e:
+            # The pod went away between the list and the read
+            if e.status != 404:
+                raise
+    lines.sort()
+    if tail is not None:
+        return lines[-tail:] if tail > 0 else []
+    return lines
+
+
+class LogSubscription:
+    """
+    One viewer of a FunctionLogWatch. Lines are handed over through an asyncio
+    queue holding at most `limit` lines; while it is full new lines are
+    dropped, and the number dropped is queued in their place once there is room.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, backlog, limit: int = LOG_SUBSCRIBER_BUFFER):
+        self.loop = loop
+        self.limit = max(limit, len(backlog))
+        self.queue = asyncio.Queue()
+        self.dropped = 0
+        for line in backlog:
+            self.queue.put_nowait(line)
+
+    def offer(self, line: Optional[LogLine]):
+        """Called on the event loop; None means the watch ended."""
+        if line is not None and self.queue.qsize() >= self.limit:
+            self.dropped += 1
+            return
+        if self.dropped:
+            self.queue.put_nowait(self.dropped)
+            self.dropped = 0
+        self.queue.put_nowait(line)
+
+    async def lines(self):
+        """Yields LogLines, or an int where that many lines were dropped."""
+        while True:
+            line = await self.queue.get()
+            if line is None:
+                return
+            yield line
+
+
+class FunctionLogWatch:
+    """
+    Follows the logs of every pod of one function and fans them out to any
+    number of viewers.
+
+    One reader thread per pod follows its log; a dispatcher thread merges the
+    pods' lines by timestamp (holding them for LOG_MERGE_WINDOW_SECONDS),
+    keeps the last LOG_BUFFER_LINES for new viewers and hands each line to
+    every subscription. Pods that appear later are picked up every
+    LOG_POD_RESYNC_SECONDS; a reader that reconnects skips what it already sent.
+    """
+
+    def __init__(self, api, name: str, namespace: str = FUNCTION_NAMESPACE):
+        self.api = api
+        self.name = name
+        self.namespace = namespace
+        self._history = deque(maxlen=LOG_BUFFER_LINES)
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._incoming = queue.Queue()
+        self._readers = {}
+        self._streams = {}
+        self._last_seen = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Loads recent history from every pod (blocking), then follows them."""
+        backfill = []
+        try:
+            for pod in list_pods(self.api, self.name, self.namespace):
+                try:
+                    lines = list(_read_pod(self.api, pod, self.namespace, tail_lines=LOG_BUFFER_LINES))
+                except client.ApiException as e:
+                    if e.status != 404:
+                        raise
+                    continue
+                if lines:
+                    self._last_seen[pod] = lines[-1].timestamp
+                backfill.extend(lines)
+                self._start_reader(pod)
+        except BaseException:
+            # Don't leave the readers of the pods before the failing one running
+            self.stop()
+            raise
+        backfill.sort()
+        self._history.extend(backfill)
+        self._thread = threading.Thread(target=self._dispatch, name=f"logs-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for response in list(self._streams.values()):
+            try:
+                response.close()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock:
+            for subscription in self._subscriptions:
+                subscription.loop.call_soon_threadsafe(subscription.offer, None)
+            self._subscriptions = []
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, tail: Optional[int] = None,
+                  since: Optional[int] = None) -> LogSubscription:
+        """A new viewer, starting with the buffered lines selected by tail/since."""
+        with self._lock:
+            backlog = list(self._history)
+            if since is not None:
+                cutoff = time.time() - since
+                backlog = [line for line in backlog if line.timestamp >= cutoff]
+            if tail is not None:
+                backlog = backlog[-tail:] if tail > 0 else []
+            subscription = LogSubscription(loop, backlog)
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription) -> int:
+        """Removes a viewer; returns how many are left."""
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            return len(self._subscriptions)
+
+    def _start_reader(self, pod: str):
+        thread = threading.Thread(target=self._follow_pod, args=(pod,), name=f"logs-{pod}", daemon=True)
+        self._readers[pod] = thread
+        thread.start()
+
+    def _follow_pod(self, pod: str):
+        last_seen = self._last_seen.get(pod)
+        kwargs = {"follow": True}
+        if last_seen is not None:
+            # Resume a little before the last line sent; anything already sent is skipped below
+            kwargs["since_seconds"] = max(1, math.ceil(time.time() - last_seen) + 1)
+        try:
+            response = self.api.read_namespaced_pod_log(
+                pod, self.namespace, timestamps=True, _preload_content=False, **kwargs
+            )
+            self._streams[pod] = response
+            if self._stop.is_set():
+                # stop() ran before the stream was registered, so it couldn't close it
+                response.close()
+            try:
+                for raw in response:
+                    if self._stop.is_set():
+                        break
+                    line = LogLine(pod, raw)
+                    if last_seen is not None and line.timestamp <= last_seen:
+                        continue
+                    last_seen = self._last_seen[pod] = line.timestamp
+                    self._incoming.put(line)
+            finally:
+                self._streams.pop(pod, None)
+                response.release_conn()
+        except Exception as e:
+            if not self._stop.is_set():
+                print(f"Log stream of {pod} ended: {e}")
+
+    def _dispatch(self):
+        pending = []
+        next_resync = time.monotonic() + LOG_POD_RESYNC_SECONDS
+        while not self._stop.is_set():
+            try:
+                line = self._incoming.get(timeout=LOG_MERGE_WINDOW_SECONDS / 2)
+                heapq.heappush(pending, (line.timestamp, id(line), line))
+            except queue.Empty:
+                pass
+
+            cutoff = time.time() - LOG_MERGE_WINDOW_SECONDS
+            ready = []
+            while pending and (pending[0][0] <= cutoff or len(pending) > LOG_BUFFER_LINES):
+                ready.append(heapq.heappop(pending)[2])
+            if ready:
+                self._publish(ready)
+
+            if time.monotonic() >= next_resync:
+                next_resync = time.monotonic() + LOG_POD_RESYNC_SECONDS
+                self._resync()
+
+    def _publish(self, lines):
+        with self._lock:
+            self._history.extend(lines)
+            for subscription in self._subscriptions:
+                for line in lines:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, line)
+
+    def _resync(self):
+        try:
+            pods = list_pods(self.api, self.name, self.namespace)
+        except Exception as e:
+            print(f"Listing pods of {self.name} failed: {e}")
+            return
+        for pod in pods:
+            reader = self._readers.get(pod)
+            if reader is None or not reader.is_alive():
+                self._start_reader(pod)
+
+
+class LogHub:
+    """
+    Shares one FunctionLogWatch per function between all of its viewers. The
+    watch starts with the first viewer and stops when the last one leaves.
+    `api_factory` can return a fake CoreV1Api (see backends.LocalBackend).
+    """
+
+    def __init__(self, api_factory, namespace: str = FUNCTION_NAMESPACE):
+        self._api_factory = api_factory
+        self._api = None
+        self.namespace = namespace
+        self._watches = {}
+        self._starting = {}
+        self._lock = threading.Lock()
+
+    @property
+    def api(self):
+        """Shared CoreV1Api client, created on first use."""
+        if self._api is None:
+            self._api = self._api_factory()
+        return self._api
+
+    def subscribe(self, name: str, loop: asyncio.AbstractEventLoop, tail: Optional[int] = None,
+                  since: Optional[int] = None):
+        """
+        Returns (watch, subscription); blocks while a new watch loads its
+        history. The first viewer of a function starts its watch outside the
+        hub's lock (other functions' viewers aren't held up); viewers of the
+        same function arriving meanwhile wait for that start to finish.
+        """
+        while True:
+            with self._lock:
+                log_watch = self._watches.get(name)
+                if log_watch is not None:
+                    return log_watch, log_watch.subscribe(loop, tail, since)
+                starting = self._starting.get(name)
+                first = starting is None
+                if first:
+                    starting = self._starting[name] = Future()
+            if not first:
+                # Raises what the first viewer's start() raised; otherwise subscribe to the new watch
+                starting.result()
+                continue
+
+            log_watch = FunctionLogWatch(self.api, name, self.namespace)
+            try:
+                log_watch.start()
+            except BaseException as e:
+                with self._lock:
+                    del self._starting[name]
+                starting.set_exception(e)
+                raise
+            with self._lock:
+                del self._starting[name]
+                self._watches[name] = log_watch
+                subscription = log_watch.subscribe(loop, tail, since)
+            starting.set_result(log_watch)
+            return log_watch, subscription
+
+    def unsubscribe(self, log_watch: FunctionLogWatch, subscription: LogSubscription):
+        """A watch that lost its last viewer is stopped in the background."""
+        with self._lock:
+            if log_watch.unsubscribe(subscription) == 0 and self._watches.get(log_watch.name) is log_watch:
+                del self._watches[log_watch.name]
+                threading.Thread(target=log_watch.stop, name=f"logs-{log_watch.name}-stop", daemon=True).start()
+
+    def watching(self) -> int:
+        return len(self._watches)
+
+    def stop(self):
+        with self._lock:
+            watches, self._watches = list(self._watches.values()), {}
+        for log_watch in watches:
+            log_watch.stop()
@@ -1,27 +1,170 @@
+import asyncio
 import os
 import shutil
+import time
 import uuid
+from collections import namedtuple
+from contextlib import asynccontextmanager
 from typing import Optional, List
-
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from uuid import UUID
+
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import httpx
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm.exc import StaleDataError
+from pydantic import ValidationError
 import models
 import schemas
-from database import engine, get_db
+from database import engine, async_engine, get_db, get_async_db, SessionLocal, AsyncSessionLocal
 import git
-import subprocess
-from kubernetes import client, config
+from kubernetes import client
 from fastapi.middleware.cors import CORSMiddleware
 
-from models import FunctionType, SourceType, EventType, StatusType
+from models import FunctionType, SourceType, EventType, StatusType, JobKind, ChangeType
+from deployer import (
+    FUNCTIONS_PATH, IMAGES_PATH, SRC_STORE_PATH_NAME, CONFIG_STORE_PATH_NAME,
+    update_source_file, run_deploy_job, render_stack_yaml, function_config_path, fetch_github_handler,
+    record_deployment_events, scaling_labels, write_stack_labels,
+    stage_source_upload, apply_staged_source, detect_change, lock_function,
+)
+import build_cache
+from backends import get_backend
+from jobs import ACTIVE_STATUSES, FINISHED_STATUSES, JobQueue
+from batches import BATCH_PARALLELISM, BATCH_SHARD_SIZE, MAX_BATCH_SIZE, run_deploy_batch
+from metrics import HTTP_REQUEST_SECONDS, StageTimer
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pagination import MAX_PAGE_SIZE, apply_function_filters, paginate_functions, split_page
+from autoscaler import AUTOSCALER_ENABLED, QueueAutoscaler
+from events import function_event, get_event_bus
+from gateway import forwardable_headers, get_gateway
+from leader import LeaderElection
+from listing_cache import LISTING_CACHE_REQUESTS, ListingCache, etag_matches
+from log_stream import LOG_BUFFER_LINES, LogHub, read_logs
+from notifications import FunctionChangeFeed
+from response_cache import CACHEABLE_METHODS, RESPONSE_CACHE_REQUESTS, CachedResponse, ResponseCache, bypasses_cache
+from storage import get_artifact_store
+from timeseries import TIMESERIES_ENABLED, TimeSeriesStore
+from status_cache import DeploymentStatusCache, FUNCTION_NAMESPACE, deployment_status, list_deployment_statuses
 
 # models.Base.metadata.create_all(bind=engine)
 
+response_cache = ResponseCache()
+listing_cache = ListingCache()
+listing_cache.watch()
+
+
+def _function_changed_elsewhere(function_id: Optional[str]):
+    """Another instance committed a change to a function (None: any function may have changed)."""
+    invoke_targets.clear()
+    listing_cache.bump()
+    if function_id is None:
+        response_cache.invalidate_all()
+    else:
+        response_cache.invalidate(function_id)
+
+
+function_changes = FunctionChangeFeed(engine, on_change=_function_changed_elsewhere)
+function_changes.watch()
+
+
+def _deploy_and_invalidate(db, job, db_function, progress):
+    """Runs a deploy job; cached responses from the previous deployment are dropped afterwards."""
+    try:
+        run_deploy_job(db, job, db_function, progress)
+    finally:
+        response_cache.invalidate(job.function_id)
+
+
+def _deploy_batch_and_invalidate(db, batch, jobs, progress):
+    try:
+        run_deploy_batch(db, batch, jobs, progress)
+    finally:
+        for job in jobs:
+            response_cache.invalidate(job.function_id)
+
+
+job_queue = JobQueue(SessionLocal, _deploy_and_invalidate, _deploy_batch_and_invalidate)
+backend = get_backend()
+event_bus = get_event_bus()
+
+
+def _publish_replicas(name: str, status: Optional[dict]):
+    """Status cache listener: publishes replica changes of func-<id> deployments."""
+    if name.startswith("func-"):
+        event_bus.publish("replicas", {"id": name[len("func-"):], "deployed": status is not None, **(status or {})})
+
+
+status_cache = DeploymentStatusCache(
+    api_factory=backend.apps_api, watch_factory=backend.watch_factory, on_change=_publish_replicas
+)
+autoscaler = QueueAutoscaler(SessionLocal, backend)
+
+
+def _on_elected():
+    """Starts the work only one instance may do: autoscaling and requeueing abandoned jobs."""
+    job_queue.start_reaper()
+    if AUTOSCALER_ENABLED:
+        autoscaler.start()
+
+
+def _on_demoted():
+    autoscaler.stop()
+    job_queue.stop_reaper()
+
+
+leader = LeaderElection(engine, on_elected=_on_elected, on_demoted=_on_demoted)
+
+
+def _replica_snapshot():
+    """{function id: (available, desired)} for every func-<id> deployment, for the time series sampler."""
+    return {
+        name[len("func-"):]: (status["availableReplicas"], status["replicas"])
+        for name, status in status_cache.snapshot().items()
+        if name.startswith("func-")
+    }
+
+
+timeseries = TimeSeriesStore(_replica_snapshot)
+log_hub = LogHub(api_factory=backend.core_api)
+gateway = get_gateway()
+# What /invoke needs to know about a function, by id or name; kept briefly so invocations skip the database
+InvokeTarget = namedtuple("InvokeTarget", ["function_id", "timeout", "cache_ttl", "vary_headers"])
+invoke_targets = TTLCache(maxsize=10000, ttl=5)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_bus.bind(asyncio.get_running_loop())
+    backend.start()
+    job_queue.start()
+    status_cache.start()
+    leader.start()
+    function_changes.start(asyncio.get_running_loop())
+    if TIMESERIES_ENABLED:
+        timeseries.start()
+    yield
+    timeseries.stop()
+    function_changes.stop()
+    leader.stop()
+    log_hub.stop()
+    status_cache.stop()
+    job_queue.stop()
+    backend.stop()
+    await gateway.aclose()
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title="S3 For Code",
     description="API for Scaling Functions.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 origins = [
     "http://localhost",
@@ -34,22 +177,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-FILE_STORE_PATH = "file_store"
-SRC_STORE_PATH_NAME = "src"
-CONFIG_STORE_PATH_NAME = "config"
-FUNCTIONS_PATH = os.path.join(FILE_STORE_PATH, "functions")
-IMAGES_PATH = os.path.join(FILE_STORE_PATH, "images")
-TEMP_PATH = os.path.join(FILE_STORE_PATH, "temp")
-os.makedirs(FUNCTIONS_PATH, exist_ok=True)
-os.makedirs(IMAGES_PATH, exist_ok=True)
-os.makedirs(TEMP_PATH, exist_ok=True)
+
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    """Records request latency labelled by route template (not the raw path, which holds ids)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        template = route.path if route else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, template, str(status)).observe(time.perf_counter() - started)
+
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    """A function row changed (e.g. on another instance) between reading and writing it."""
+    return JSONResponse(status_code=409, content={"detail": "The function was changed concurrently; retry"})
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: deploy stage timings, failures and request latencies."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Create a new function entry
 @app.post("/upload_function/", response_model=schemas.Function, status_code=201)
-def create_function(
-    db: Session = Depends(get_db),
+async def create_function(
+    db: AsyncSession = Depends(get_async_db),
     name: str = Form(...),
     type: FunctionType = Form(...),
     source: SourceType = Form(...),
@@ -58,13 +219,76 @@ def create_function(
     redis_queue_name: Optional[str] = Form(None),
     github_url: Optional[str] = Form(None),
     image_name: Optional[str] = Form(None),
+    scale_min: Optional[int] = Form(None),
+    scale_max: Optional[int] = Form(None),
+    scale_factor: Optional[int] = Form(None),
+    scale_to_zero: Optional[bool] = Form(None),
+    target_concurrency: Optional[int] = Form(None),
+    invoke_timeout_seconds: Optional[float] = Form(None, gt=0, le=3600),
     file: Optional[UploadFile] = File(None)
 ):
     """
     Create a new function entry.
+    - The scale_* fields and target_concurrency set its autoscaling policy;
+      anything left out keeps the default (1 to 5 replicas, factor 100).
     """
-    final_location_url = ""
+    scaling = _scaling_policy({
+        "scale_min": scale_min,
+        "scale_max": scale_max,
+        "scale_factor": scale_factor,
+        "scale_to_zero": scale_to_zero,
+        "target_concurrency": target_concurrency,
+    })
     generated_uuid = str(uuid.uuid4())
+    final_location_url, handler_path = await run_in_threadpool(
+        _store_function_source, generated_uuid, type, source, github_url, image_name, file, scaling_labels(scaling)
+    )
+
+    function_create_data = schemas.FunctionCreate(
+        id= generated_uuid,
+        name=name,
+        type=type,
+        source=source,
+        event_type=event_type,
+        redis_host=redis_host,
+        redis_queue_name=redis_queue_name,
+        github_url=github_url 
+    )
+
+    function_data_for_db = function_create_data.model_dump(exclude_none=True)
+    function_data_for_db.update(scaling.model_dump())
+    function_data_for_db['invoke_timeout_seconds'] = invoke_timeout_seconds
+    function_data_for_db['location_url'] = final_location_url
+    if source == SourceType.GITHUB:
+        function_data_for_db['handler_path'] = handler_path
+    
+    function_data_for_db.pop('github_url', None)
+
+    db_function = models.Function(**function_data_for_db)
+
+    db.add(db_function)
+    await db.commit()
+    await db.refresh(db_function)
+    event_bus.publish("function", function_event(db_function))
+
+    return db_function
+
+
+def _store_function_source(
+    generated_uuid: str,
+    type: FunctionType,
+    source: SourceType,
+    github_url: Optional[str],
+    image_name: Optional[str],
+    file: Optional[UploadFile],
+    labels: dict
+):
+    """
+    Writes the function's source and stack.yml to the file store (blocking I/O).
+    Returns the location_url and, for GitHub sources, the handler path in the repo.
+    """
+    final_location_url = ""
+    handler_path = None
     if source == SourceType.STORAGE:
         final_location_url = None
 
@@ -83,24 +307,11 @@ def create_function(
                 os.makedirs(src_dir, exist_ok=True)
                 os.makedirs(config_dir, exist_ok=True)
 
-                final_file_path = os.path.join(src_dir, file.filename)
-                with open(final_file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-
-                yaml_template = f"""version: 1.0
-    provider:
-        name: openfaas
-        gateway: http://127.0.0.1:31112
-    functions:
-        func-{function_uuid}:
-            lang: golang-http
-            handler: ../{SRC_STORE_PATH_NAME}
-            image: rash27/func-{function_uuid}:latest
-            labels: 
-            com.openfaas.scale.min: "1"
-            com.openfaas.scale.max: "5"
-            com.openfaas.scale.factor: "100"
-        """
+                # The source is stored once per distinct content; the function links to it
+                store = get_artifact_store()
+                store.link(store.put(file.file), os.path.join(src_dir, os.path.basename(file.filename)))
+
+                yaml_template = render_stack_yaml(function_uuid, labels)
                 yaml_file_path = os.path.join(config_dir, "stack.yml")
                 with open(yaml_file_path, "w") as yaml_file:
                     yaml_file.write(yaml_template)
@@ -115,25 +326,15 @@ def create_function(
                 deployment_dir = os.path.join(IMAGES_PATH, deployment_uuid)
                 os.makedirs(deployment_dir, exist_ok=True)
 
-                yaml_template = f"""version: 1.0
-    provider:
-        name: openfaas
-        gateway: http://127.0.0.1:31112
-    functions:
-        func-{deployment_uuid}:
-            image: {image_name}
-            skip_build: true
-            labels: 
-            com.openfaas.scale.min: "1"
-            com.openfaas.scale.max: "5"
-            com.openfaas.scale.factor: "100"
-        """
+                yaml_template = render_stack_yaml(deployment_uuid, labels, image_name=image_name)
                 yaml_file_path = os.path.join(deployment_dir, "stack.yml")
                 with open(yaml_file_path, "w") as yaml_file:
                     yaml_file.write(yaml_template)
                     
                 final_location_url = deployment_dir
 
+        except HTTPException:
+            raise
         except Exception as e:
             # A general exception handler can be useful
             raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
@@ -149,47 +350,21 @@ def create_function(
             raise HTTPException(status_code=400, detail="The 'github_url' field is required for GITHUB source type.")
 
         function_uuid = generated_uuid
-        
-        temp_clone_dir = os.path.join(TEMP_PATH, function_uuid)
-        os.makedirs(temp_clone_dir, exist_ok=True)
+
         final_function_dir = os.path.join(FUNCTIONS_PATH, function_uuid)
-        os.makedirs(final_function_dir, exist_ok=True)
         final_function_src_dir = os.path.join(final_function_dir, SRC_STORE_PATH_NAME)
-        os.makedirs(final_function_src_dir, exist_ok=True)
         final_function_config_dir = os.path.join(final_function_dir, CONFIG_STORE_PATH_NAME)
-        os.makedirs(final_function_config_dir, exist_ok=True)
-        
-        try:
-            print(f"Cloning {github_url} to {temp_clone_dir}...")
-            git.Repo.clone_from(github_url, temp_clone_dir)
-
-            handler_path = None
-            for root, dirs, files in os.walk(temp_clone_dir):
-                if "handler.go" in files:
-                    handler_path = os.path.join(root, "handler.go")
-                    break
 
-            if not handler_path:
-                raise HTTPException(status_code=404, detail="'handler.go' not found in the provided repository.")
+        try:
+            handler_source, handler_path, _ = fetch_github_handler(github_url)
 
             os.makedirs(final_function_src_dir, exist_ok=True)
+            os.makedirs(final_function_config_dir, exist_ok=True)
 
-            shutil.copy(handler_path, os.path.join(final_function_src_dir, "handler.go"))
-
-            yaml_template = f"""version: 1.0
-provider:
-    name: openfaas
-    gateway: http://127.0.0.1:31112
-functions:
-    func-{function_uuid}:
-        lang: golang-http
-        handler: ../{SRC_STORE_PATH_NAME}
-        image: rash27/func-{function_uuid}:latest
-        labels: 
-        com.openfaas.scale.min: "1"
-        com.openfaas.scale.max: "5"
-        com.openfaas.scale.factor: "100"
-    """
+            store = get_artifact_store()
+            store.link(store.put_bytes(handler_source), os.path.join(final_function_src_dir, "handler.go"))
+
+            yaml_template = render_stack_yaml(function_uuid, labels)
             yaml_file_path = os.path.join(final_function_config_dir, "stack.yml")
             with open(yaml_file_path, "w") as yaml_file:
                 yaml_file.write(yaml_template)
@@ -199,39 +374,15 @@ functions:
         except git.GitCommandError as e:
             # Handle errors like repository not found, access denied, etc.
             raise HTTPException(status_code=400, detail=f"Failed to clone repository: {e}")
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
-        finally:
-            # 7. IMPORTANT: Clean up the temporary clone directory regardless of success or failure
-            if os.path.exists(temp_clone_dir):
-                shutil.rmtree(temp_clone_dir)
 
     else:
         raise HTTPException(status_code=400, detail="Invalid source type specified.")
 
-    function_create_data = schemas.FunctionCreate(
-        id= generated_uuid,
-        name=name,
-        type=type,
-        source=source,
-        event_type=event_type,
-        redis_host=redis_host,
-        redis_queue_name=redis_queue_name,
-        github_url=github_url 
-    )
-
-    function_data_for_db = function_create_data.model_dump(exclude_none=True)
-    function_data_for_db['location_url'] = final_location_url
-    
-    function_data_for_db.pop('github_url', None)
-
-    db_function = models.Function(**function_data_for_db)
-
-    db.add(db_function)
-    db.commit()
-    db.refresh(db_function)
-
-    return db_function
+    return final_location_url, handler_path
 
 
 # Update function entry
@@ -249,7 +400,7 @@ def update_function(
     """
 
     # 1. Fetch the function and perform initial checks
-    db_function = db.query(models.Function).filter(models.Function.id == function_id).first()
+    db_function = db.query(models.Function).filter(models.Function.id == function_id).with_for_update().first()
     if not db_function:
         raise HTTPException(status_code=404, detail="Function not found")
 
@@ -275,35 +426,177 @@ def update_function(
     if not file or not file.filename:
         raise HTTPException(status_code=400, detail="A file upload is required.")
 
-    _update_source_file(db_function, file)
+    update_source_file(db_function, file)
     # 6. Return a success response
     #    Instead of just 'true', a JSON object provides more context.
     #    An exception is raised on failure, so a successful return always means it was updated.
     return {"updated": True, "function_id": function_id, "new_status": "updated"}
 
 
+# Update the autoscaling policy
+@app.patch("/functions/{function_id}/scaling", response_model=schemas.Function)
+def update_scaling(function_id: str, update: schemas.ScalingUpdate, db: Session = Depends(get_db)):
+    """
+    Changes a function's autoscaling policy (only the fields sent are changed).
+    - The new labels are written to its stack.yml, so later deploys keep them.
+    - A deployed function has its live deployment patched in place: no rebuild
+      and no redeploy. Replicas outside the new min/max are brought within them.
+    """
+    db_function = db.query(models.Function).filter(models.Function.id == function_id).with_for_update().first()
+    if not db_function:
+        raise HTTPException(status_code=404, detail="Function not found")
+
+    current = schemas.ScalingPolicy.model_validate(db_function).model_dump()
+    scaling = _scaling_policy({**current, **update.model_dump(exclude_unset=True)}, keep_none=True)
+    for field, value in scaling.model_dump().items():
+        setattr(db_function, field, value)
+    write_stack_labels(db_function)
+    db.commit()
+    db.refresh(db_function)
+
+    if db_function.status == StatusType.DEPLOYED:
+        timer = StageTimer("scale")
+        try:
+            with timer:
+                with timer.stage("patch"):
+                    backend.patch_scaling(
+                        f"func-{db_function.id}", scaling_labels(scaling), scaling.scale_min, scaling.scale_max
+                    )
+        except HTTPException as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"Scaling policy saved, but the live deployment could not be patched: {e.detail}"
+            )
+        finally:
+            record_deployment_events(db, timer, db_function.id)
+        # The live deployment has the new labels, so an update needn't redeploy for them
+        db_function.deployed_config_hash = build_cache.compute_config_hash(
+            os.path.join(function_config_path(db_function), "stack.yml")
+        )
+        db.commit()
+
+    return db_function
+
+
+def _scaling_policy(fields: dict, keep_none: bool = False) -> schemas.ScalingPolicy:
+    """Validates a scaling policy; unset fields take the defaults unless keep_none is set."""
+    if not keep_none:
+        fields = {key: value for key, value in fields.items() if value is not None}
+    try:
+        return schemas.ScalingPolicy(**fields)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+
 # Get all functions
 @app.get("/functions/", response_model=List[schemas.Function])
-def read_functions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_functions(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    filters: schemas.FunctionFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Retrieve all functions with pagination.
+    Retrieve functions with keyset pagination, ordered by id.
+    - Optional filters on status, type, source, event_type and name prefix.
+    - When more results exist, the `X-Next-Cursor` response header holds the
+      cursor to pass for the next page.
+    - Pages are served from a serialized snapshot until a function changes
+      (see ListingCache). Each has an `ETag`; a request whose `If-None-Match`
+      matches gets an empty 304.
     """
-    functions = db.query(models.Function).offset(skip).limit(limit).all()
-    return functions
+    key = (cursor, limit, tuple(sorted(filters.model_dump().items())))
+    page = listing_cache.get(key)
+    if page is None:
+        version = listing_cache.version
+        query = apply_function_filters(select(models.Function), filters)
+        result = await db.execute(paginate_functions(query, cursor, limit))
+        functions, next_cursor = split_page(result.scalars().all(), limit)
+        page = listing_cache.put(key, version, functions, next_cursor)
+        cache_result = "miss"
+    else:
+        cache_result = "hit"
+
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        LISTING_CACHE_REQUESTS.labels("not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    LISTING_CACHE_REQUESTS.labels(cache_result).inc()
+    return Response(page.body, media_type="application/json", headers=headers)
+
+
+# Bulk status
+@app.get("/functions/status", response_model=schemas.BulkStatusResponse)
+async def read_functions_status(
+    response: Response,
+    ids: Optional[List[UUID]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    filters: schemas.FunctionFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns the database status and live replica counts for many functions at once.
+    - With `ids`, reports on those functions; otherwise on the same page as /functions/.
+    - Replica counts come from the status cache, or from a single labelled
+      list_namespaced_deployment call when the cache is stale.
+    """
+    query = apply_function_filters(select(models.Function), filters)
+    if ids:
+        result = await db.execute(query.filter(models.Function.id.in_(ids)))
+        functions = result.scalars().all()
+    else:
+        result = await db.execute(paginate_functions(query, cursor, limit))
+        functions, next_cursor = split_page(result.scalars().all(), limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+
+    names = ['func-' + str(db_function.id) for db_function in functions]
+    stale = status_cache.is_stale()
+    age = status_cache.age()
+    if stale:
+        try:
+            deployments = await run_in_threadpool(list_deployment_statuses, status_cache.api, names)
+            stale, age = False, 0.0
+        except Exception as e:
+            # Fall back to whatever the cache last saw
+            print(f"Bulk status list failed: {e}")
+            deployments = status_cache.get_many(names)
+    else:
+        deployments = status_cache.get_many(names)
+
+    return {
+        "stale": stale,
+        "age": age,
+        "functions": [
+            {
+                "id": db_function.id,
+                "name": db_function.name,
+                "status": db_function.status,
+                "deployment": deployments.get('func-' + str(db_function.id)),
+            }
+            for db_function in functions
+        ],
+    }
 
 
 # start deployment
-@app.post("/deploy_function/{function_id}", response_model=schemas.Function)
+@app.post("/deploy_function/{function_id}", response_model=schemas.DeployJob, status_code=202)
 def deploy_function(function_id: str, db: Session = Depends(get_db)):
     """
-    Deploys a function by its ID.
-    - For GitHub-sourced functions, it re-fetches the latest code.
-    - For all buildable functions, it formats the code before deploying.
-    - Updates the function's status to 'deployed' upon success.
+    Queues a deployment of a function by its ID and returns the job right away.
+    - For GitHub-sourced functions, the worker re-fetches the latest code.
+    - For all buildable functions, the worker formats the code before deploying.
+    - The function's status becomes 'deployed' once the job succeeds.
+    Poll /jobs/{job_id} or stream /jobs/{job_id}/events for progress.
     """
 
-    # 1. Fetch the function from the database
-    db_function = db.query(models.Function).filter(models.Function.id == function_id).first()
+    # 1. Fetch the function from the database, locked until the job is queued
+    #    so concurrent requests (on any instance) see each other's job
+    db_function = db.query(models.Function).filter(models.Function.id == function_id).with_for_update().first()
     if not db_function:
         raise HTTPException(status_code=404, detail="Function not found")
 
@@ -311,196 +604,277 @@ def deploy_function(function_id: str, db: Session = Depends(get_db)):
     if db_function.status == StatusType.DEPLOYED:
         raise HTTPException(status_code=400, detail="Function is already deployed.")
 
-    # For Images the config file will not be changed
-
-    # 3. Handle the special case for GITHUB source: re-fetch the code
-    if db_function.source == SourceType.GITHUB:
-        _refetch_from_github(db_function)
-    
-    if db_function.type == FunctionType.FUNCTION:
-        # 4. Format the code if it's a buildable function
-        _format_go_code(db_function)
-
-    # 5. Execute the deployment using 'faas-cli up'
-    #    This works for both FUNCTION and IMAGE types, as it just uses the stack.yml
-    _deploy_with_faas_cli(db_function)
-    
-    # 6. Update the function status in the database if deployment was successful
-    db_function.status = StatusType.DEPLOYED
-    db.commit()
-    db.refresh(db_function)
-
-    return db_function
+    # 3. Hand the fetch/format/'faas-cli up' pipeline to the build workers
+    return job_queue.submit(db, db_function.id, JobKind.DEPLOY)
 
 
 # Update deployment
-@app.post("/update_deployment/{function_id}", response_model=schemas.Function)
+@app.post("/update_deployment/{function_id}", response_model=schemas.UpdateResult, status_code=202)
 def update_deployment(
     function_id: str,
+    response: Response,
     db: Session = Depends(get_db),
     file: Optional[UploadFile] = File(None)
 ):
     """
-    Updates and redeploys a function. The behavior depends on the function's source and type.
+    Queues an update and redeploy of a function and returns the job right away.
+    The behavior depends on the function's source and type.
 
     1.  **GITHUB Source**: Re-fetches the latest code from the repo, formats it, and redeploys.
     2.  **STORAGE Source (FUNCTION Type)**: If a file is provided, it replaces the handler.
         Then, it formats the code and redeploys.
     3.  **STORAGE Source (IMAGE Type)**: Re-triggers the deployment to pull the latest image from the registry.
+
+    What is new is compared with what is live first (`change` in the response):
+    - NONE: the same commit or source and stack.yml are deployed; nothing is
+      queued and the cluster isn't touched (200, no job).
+    - CONFIG: only the stack.yml differs; the job redeploys without fetching,
+      formatting or building.
+    - SOURCE: the full pipeline.
     """
 
-    # 1. Fetch the function and validate its state
+    # 1. Fetch the function and validate its state. Not locked yet: detecting
+    #    the change can mean a git fetch, and staging runs gofmt
     db_function = db.query(models.Function).filter(models.Function.id == function_id).first()
     if not db_function:
         raise HTTPException(status_code=404, detail="Function not found")
 
     if db_function.status == StatusType.PENDING:
         raise HTTPException(status_code=409, detail="Function is not deployed.")
+    version_id = db_function.version_id
+
+    # 2. The uploaded file only lives for the duration of the request, so stage it now
+    staged_dir = None
+    if db_function.source == SourceType.STORAGE and db_function.type == FunctionType.FUNCTION:
+        if file and file.filename:
+            staged_dir = stage_source_upload(file)
 
-    db_function.status = StatusType.PENDING
-    db.commit()
     try:
-        # Scenario 1: Source is GITHUB
-        if db_function.source == SourceType.GITHUB:
-            _refetch_from_github(db_function)
+        # 3. Work out what changed; nothing to do when it's all live already
+        change = detect_change(db_function, staged_dir)
+        if change == ChangeType.NONE:
+            response.status_code = 200
+            return {"change": change, "job": None}
+
+        # 4. Lock the row; what was compared above must still be what is live
+        lock_function(db, db_function)
+        if db_function.version_id != version_id:
+            raise HTTPException(status_code=409, detail="The function was changed concurrently; retry")
+
+        # 5. Queue the redeploy; the function stays 'pending' until the job succeeds.
+        #    The upload replaces the source only once the job is known to be the
+        #    function's only one (a rollback or batch job may be running on it)
+        db_function.status = StatusType.PENDING
+        kind = JobKind.RECONFIGURE if change == ChangeType.CONFIG else JobKind.UPDATE
+        db_job = job_queue.submit(
+            db, db_function.id, kind,
+            before_commit=(lambda: apply_staged_source(db_function, staged_dir)) if staged_dir else None,
+        )
+    finally:
+        if staged_dir:
+            shutil.rmtree(staged_dir, ignore_errors=True)
+    event_bus.publish("function", function_event(db_function))
+    return {"change": change, "job": db_job}
+
+
+# History
+@app.get("/functions/{function_id}/history", response_model=schemas.FunctionHistory)
+async def read_function_history(
+    function_id: UUID,
+    window: int = Query(3600, ge=1),
+    step: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns how a function's replicas and traffic evolved over the last
+    `window` seconds: one point per `step` seconds with the average available
+    replicas, the desired replicas and the invocations made through /invoke.
+    Without `step` the finest resolution that still covers the window is used
+    (see TIMESERIES_RESOLUTIONS). Buckets with no samples are left out.
+    """
+    if not await db.get(models.Function, function_id):
+        raise HTTPException(status_code=404, detail="Function not found")
+    try:
+        step, points = timeseries.history(function_id, window, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"function_id": function_id, "window": window, "step": step, "points": points}
 
-        # Scenario 2: Source is STORAGE and Type is FUNCTION
-        elif db_function.source == SourceType.STORAGE and db_function.type == FunctionType.FUNCTION:
-            if file and file.filename:
-                _update_source_file(db_function, file)
 
-        # Scenario 3: Source is STORAGE and Type is IMAGE
-        # No file operations are needed here; we proceed directly to deployment.
+# Revisions
+@app.get("/functions/{function_id}/revisions", response_model=List[schemas.Revision])
+async def read_revisions(function_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """
+    Lists every revision a function has been deployed as, newest first.
+    The function's `deployed_revision` is the number of the live one.
+    """
+    if not await db.get(models.Function, function_id):
+        raise HTTPException(status_code=404, detail="Function not found")
+    result = await db.execute(
+        select(models.FunctionRevision)
+        .filter(models.FunctionRevision.function_id == function_id)
+        .order_by(models.FunctionRevision.number.desc())
+    )
+    return result.scalars().all()
 
-        # Format code if it's a buildable function
-        if db_function.type == FunctionType.FUNCTION:
-            _format_go_code(db_function)
 
-        # Trigger the deployment for all scenarios
-        _deploy_with_faas_cli(db_function)
+@app.post("/functions/{function_id}/rollback", response_model=schemas.DeployJob, status_code=202)
+def rollback_function(function_id: UUID, request: schemas.RollbackRequest, db: Session = Depends(get_db)):
+    """
+    Queues a redeploy of an earlier revision and returns the job right away.
+    - Its image is deployed as it was pushed (by digest), with the stack.yml it
+      ran with and the current scaling policy: nothing is fetched or built.
+    - The function keeps serving while the job runs.
+    """
+    db_function = db.query(models.Function).filter(models.Function.id == function_id).with_for_update().first()
+    if not db_function:
+        raise HTTPException(status_code=404, detail="Function not found")
 
-        # If all steps succeed, update the status to 'deployed'
-        db_function.status = StatusType.DEPLOYED
-        db.commit()
-        db.refresh(db_function)
-        return db_function
+    revision = (
+        db.query(models.FunctionRevision)
+        .filter(models.FunctionRevision.function_id == function_id, models.FunctionRevision.number == request.revision)
+        .first()
+    )
+    if not revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    if db_function.status == StatusType.DEPLOYED and db_function.deployed_revision == revision.number:
+        raise HTTPException(status_code=409, detail=f"Revision {revision.number} is already deployed.")
 
-    except HTTPException as e:
-        # If a known error occurs, update status and re-raise
-        db_function.status = StatusType.PENDING
-        db.commit()
-        raise e
-    except Exception as e:
-        # For unexpected errors
-        db_function.status = StatusType.UPDATE_FAILED
-        db.commit()
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    return job_queue.submit(db, db_function.id, JobKind.ROLLBACK, revision_id=revision.id)
 
 
+# Batch deploy
+@app.post("/deploy_batch", response_model=schemas.BatchDeployResponse, status_code=202)
+def deploy_batch(request: schemas.BatchDeployRequest, db: Session = Depends(get_db)):
+    """
+    Queues a deploy (or redeploy, for functions already deployed) of many functions at once.
+    - Pick the functions with `function_ids` or with the same `filters` as /functions/.
+    - They are built and deployed from shared multi-function stack files of
+      `shard_size` functions, with at most `parallelism` builds at a time.
+    - Functions that don't exist or already have a job in progress are
+      returned under `skipped`.
+    Poll /batches/{batch_id} for per-function results.
+    """
+    if (request.function_ids is None) == (request.filters is None):
+        raise HTTPException(status_code=400, detail="Provide either function_ids or filters.")
+
+    query = db.query(models.Function)
+    skipped = []
+    if request.function_ids is not None:
+        requested = list(dict.fromkeys(request.function_ids))
+        if len(requested) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"A batch can hold at most {MAX_BATCH_SIZE} functions.")
+        db_functions = query.filter(models.Function.id.in_(requested)).all()
+        found = {db_function.id for db_function in db_functions}
+        skipped = [(function_id, "Function not found") for function_id in requested if function_id not in found]
+    else:
+        db_functions = apply_function_filters(query, request.filters).order_by(models.Function.id).limit(MAX_BATCH_SIZE + 1).all()
+        if len(db_functions) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"The filters match more than {MAX_BATCH_SIZE} functions.")
 
-def _refetch_from_github(db_function: models.Function):
-    """Cleans old source and re-clones the repo."""
-    print(f"Re-fetching source for GitHub function: {db_function.id}")
-    function_dir = os.path.join(FUNCTIONS_PATH, str(db_function.id))
-    
-    if os.path.exists(function_dir):
-        shutil.rmtree(function_dir)
-    
-    temp_clone_dir = os.path.join(TEMP_PATH, str(db_function.id))
-    
-    try:
-        git.Repo.clone_from(db_function.location_url, temp_clone_dir)
-        
-        handler_path = next((os.path.join(root, "handler.go") for root, _, files in os.walk(temp_clone_dir) if "handler.go" in files), None)
-        if not handler_path:
-            raise HTTPException(status_code=404, detail="'handler.go' not found in the repository.")
-        
-        src_dir = os.path.join(function_dir, SRC_STORE_PATH_NAME)
-        config_dir = os.path.join(function_dir, CONFIG_STORE_PATH_NAME)
-        os.makedirs(src_dir, exist_ok=True)
-        os.makedirs(config_dir, exist_ok=True)
-
-        shutil.copy(handler_path, os.path.join(src_dir, "handler.go"))
-        
-        yaml_template = f"""version: 1.0
-provider:
-  name: openfaas
-  gateway: http://127.0.0.1:31112
-functions:
-  func-{str(db_function.id)}:
-    lang: golang-http
-    handler: ../{SRC_STORE_PATH_NAME}
-    image: rash27/func-{str(db_function.id)}:latest
-    labels: 
-      com.openfaas.scale.min: "1"
-      com.openfaas.scale.max: "5"
-      com.openfaas.scale.factor: "100"
-"""
-        with open(os.path.join(config_dir, "stack.yml"), "w") as f:
-            f.write(yaml_template)
-    finally:
-        if os.path.exists(temp_clone_dir):
-            shutil.rmtree(temp_clone_dir)
+    if not db_functions:
+        raise HTTPException(status_code=404, detail="No functions to deploy.")
 
-def _update_source_file(db_function: models.Function, file: UploadFile):
-    """Replaces the handler.go file with the uploaded one."""
-    print(f"Updating source file for function: {db_function.id}")
-    src_dir = os.path.join(db_function.location_url, SRC_STORE_PATH_NAME)
-    if db_function.source == SourceType.GITHUB:
-        src_dir = os.path.join(FUNCTIONS_PATH, str(db_function.id), SRC_STORE_PATH_NAME)
-    
-    if db_function.type != FunctionType.FUNCTION and db_function.source != SourceType.GITHUB:
-        return  # No file update needed for non-buildable functions
+    db_batch, busy = job_queue.submit_batch(
+        db, db_functions,
+        parallelism=request.parallelism or BATCH_PARALLELISM,
+        shard_size=request.shard_size or BATCH_SHARD_SIZE,
+    )
+    return {
+        "batch": _batch_response(db_batch, db.query(models.DeployJob).filter(models.DeployJob.batch_id == db_batch.id).all()),
+        "skipped": [{"function_id": function_id, "reason": reason} for function_id, reason in skipped + busy],
+    }
 
-    if not os.path.isdir(src_dir):
-        raise HTTPException(status_code=404, detail=f"Source directory not found at: {src_dir}")
-    
-    # Remove old .go file(s)
-    for filename in os.listdir(src_dir):
-        if filename.endswith(".go"):
-            os.remove(os.path.join(src_dir, filename))
-    
-    try:
-        with open(os.path.join(src_dir, "handler.go"), "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    finally:
-        file.file.close()
 
-def _format_go_code(db_function: models.Function):
-    """Runs gofmt on the function's source directory."""
-    src_path = os.path.join(db_function.location_url, SRC_STORE_PATH_NAME)
-    if db_function.source == SourceType.GITHUB:
-        src_path = os.path.join(FUNCTIONS_PATH, str(db_function.id), SRC_STORE_PATH_NAME)
-    if db_function.type != FunctionType.FUNCTION and db_function.source != SourceType.GITHUB:
-        return  # No formatting needed for non-buildable functions
-    print(f"Formatting Go code in: {src_path}")
-    try:
-        subprocess.run(
-            ["gofmt", "-s", "-w", "."],
-            cwd=src_path, check=True, capture_output=True, text=True
-        )
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to format Go code: {e.stderr}")
+@app.get("/batches/{batch_id}", response_model=schemas.DeployBatch)
+async def read_batch(batch_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """
+    Returns the state of a batch deploy and the job (status, stage, error) of every function in it.
+    """
+    db_batch = await db.get(models.DeployBatch, batch_id)
+    if not db_batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    result = await db.execute(
+        select(models.DeployJob).filter(models.DeployJob.batch_id == batch_id).order_by(models.DeployJob.function_id)
+    )
+    return _batch_response(db_batch, result.scalars().all())
 
-def _deploy_with_faas_cli(db_function: models.Function):
-    """Runs 'faas-cli up' using the function's stack.yml."""
-    config_path = db_function.location_url
-    if db_function.source == SourceType.GITHUB:
-        config_path = os.path.join(FUNCTIONS_PATH, str(db_function.id), CONFIG_STORE_PATH_NAME)
-    else: 
-        if db_function.type == FunctionType.FUNCTION:
-            config_path = os.path.join(db_function.location_url, CONFIG_STORE_PATH_NAME)        
-    
-    print(f"Deploying function from: {config_path}")
+
+def _batch_response(db_batch: models.DeployBatch, db_jobs) -> schemas.DeployBatch:
+    batch = schemas.DeployBatch.model_validate(db_batch)
+    batch.jobs = [schemas.DeployJob.model_validate(db_job) for db_job in db_jobs]
+    return batch
+
+
+# Deployment jobs
+@app.get("/jobs/{job_id}", response_model=schemas.DeployJob)
+async def read_job(job_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """
+    Returns the current state of a deployment job.
+    """
+    db_job = await db.get(models.DeployJob, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: UUID):
+    """
+    Streams job progress as Server-Sent Events until the job finishes.
+    An event is sent whenever the job's status or stage changes.
+    """
+
+    async def _load_job():
+        async with AsyncSessionLocal() as db:
+            db_job = await db.get(models.DeployJob, job_id)
+            return schemas.DeployJob.model_validate(db_job) if db_job else None
+
+    job = await _load_job()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream(job):
+        last_state = None
+        while True:
+            state = (job.status, job.stage)
+            if state != last_state:
+                last_state = state
+                yield f"data: {job.model_dump_json()}\n\n"
+            if job.status in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(1)
+            job = await _load_job()
+
+    return StreamingResponse(event_stream(job), media_type="text/event-stream")
+
+
+# Live events
+@app.get("/events")
+async def stream_events(request: Request):
+    """
+    One Server-Sent Events stream of changes to every function, so dashboards
+    don't have to poll /functions/ and /logs/{id}. Only deltas are sent:
+    - `function`: `{id, name, status, deployed_revision}` when a function is
+      created or its status changes (e.g. PENDING -> DEPLOYED).
+    - `job` / `batch`: deploy job and batch progress (status, stage, error).
+    - `replicas`: `{id, deployed, status, replicas, availableReplicas}` when a
+      deployment's replica counts change.
+    - `resync`: the client missed events (it was away too long, or the
+      server restarted) and should reload /functions/ before applying more.
+    Each event has an id; browsers reconnect with Last-Event-ID and continue
+    where they left off.
+    """
+    last_event_id = request.headers.get("last-event-id")
     try:
-        subprocess.run(["faas-cli", "template", "store", "pull", "golang-http"], cwd=config_path, check=True, capture_output=True, text=True)
-        subprocess.run(
-            ["faas-cli", "up", "-f", "stack.yml"],
-            cwd=config_path, check=True, text=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Deployment failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Deployment failed: {e.stderr}")
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+    return StreamingResponse(
+        event_bus.stream(last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # Undeploy
@@ -513,7 +887,7 @@ def undeploy_function(function_id: str, db: Session = Depends(get_db)):
     """
 
     # 1. Fetch the function from the database
-    db_function = db.query(models.Function).filter(models.Function.id == function_id).first()
+    db_function = db.query(models.Function).filter(models.Function.id == function_id).with_for_update().first()
     if not db_function:
         raise HTTPException(status_code=404, detail="Function not found")
 
@@ -523,84 +897,273 @@ def undeploy_function(function_id: str, db: Session = Depends(get_db)):
             status_code=400,
             detail=f"Function is not deployed. Current status: '{db_function.status}'"
         )
+    active_job = (
+        db.query(models.DeployJob)
+        .filter(models.DeployJob.function_id == db_function.id, models.DeployJob.status.in_(ACTIVE_STATUSES))
+        .first()
+    )
+    if active_job:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A deployment job is in progress for this function: {active_job.id}"
+        )
 
     # 3. Determine the path to the configuration file
-    config_path  = db_function.location_url
     # For buildable functions, the stack.yml is in the 'config' subdirectory
-    if db_function.source == SourceType.GITHUB:
-        folder_path = os.path.join(FUNCTIONS_PATH, str(db_function.id))
-        config_path = os.path.join(folder_path, CONFIG_STORE_PATH_NAME)
-    else:
-        if db_function.type == FunctionType.FUNCTION:
-            config_path = os.path.join(db_function.location_url, CONFIG_STORE_PATH_NAME)
+    config_path = function_config_path(db_function)
 
     stack_file = os.path.join(config_path, "stack.yml")
     if not os.path.exists(stack_file):
         raise HTTPException(status_code=404, detail=f"stack.yml not found in {config_path}")
 
-    # 4. Execute the undeployment using 'faas-cli remove'
+    # 4. Remove the function from the cluster through the deployment backend
     print(f"Undeploying function from: {config_path}")
+    timer = StageTimer("undeploy")
     try:
-        # Run 'faas-cli remove -f stack.yml' from the directory containing the file
-        undeploy_process = subprocess.run(
-            ["faas-cli", "remove", "-f", "stack.yml"],
-            cwd=config_path,
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        print("Undeployment successful:", undeploy_process.stdout)
+        with timer:
+            backend.remove(config_path, timer)
 
-    except subprocess.CalledProcessError as e:
-        # Raise an exception with the actual error from the faas-cli
-        raise HTTPException(status_code=500, detail=f"Undeployment failed: {e.stderr}")
-
-    # 5. Update the function status in the database
-    db_function.status = StatusType.PENDING
-    db.commit()
+            # 5. Update the function status in the database
+            db_function.status = StatusType.PENDING
+            db.commit()
+    finally:
+        record_deployment_events(db, timer, db_function.id)
+    invoke_targets.clear()
+    response_cache.invalidate(db_function.id)
     db.refresh(db_function)
+    event_bus.publish("function", function_event(db_function))
 
     # 6. Return a success response
     return {"undeployed": True, "function_id": function_id, "new_status": "pending"}
 
+# Invoke a function through the backend
+INVOKE_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+
+
+@app.api_route("/invoke/{function_ref}", methods=INVOKE_METHODS)
+@app.api_route("/invoke/{function_ref}/{path:path}", methods=INVOKE_METHODS)
+async def invoke_function(function_ref: str, request: Request, path: str = ""):
+    """
+    Calls a deployed function by id or name, without the caller knowing the
+    gateway URL or the func-<id> naming.
+    - Method, sub-path, query string, headers and body are passed through,
+      and the body is streamed both ways.
+    - Connections to the gateway come from a shared keep-alive pool.
+    - The function's invoke_timeout_seconds applies (504 when exceeded).
+    - With cache_ttl_seconds set, GET and HEAD responses are cached (see
+      _invoke_cached) and the X-Cache header says whether one was used.
+    """
+    target = await _resolve_invoke_target(function_ref)
+    function_id, timeout = target.function_id, target.timeout
+    timeseries.record_invocation(function_id)
+    if target.cache_ttl and request.method in CACHEABLE_METHODS:
+        if not bypasses_cache(request.headers, target.vary_headers):
+            return await _invoke_cached(target, request, path)
+        RESPONSE_CACHE_REQUESTS.labels(str(function_id), "bypass").inc()
+
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    try:
+        upstream = await gateway.invoke(
+            function_id,
+            method=request.method,
+            path=path,
+            headers=forwardable_headers(request.headers),
+            params=request.query_params,
+            content=request.stream() if has_body else None,
+            timeout=timeout,
+            stream=True,
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="The function did not respond in time.")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Gateway unavailable: {e}")
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=forwardable_headers(upstream.headers),
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
+async def _invoke_cached(target: InvokeTarget, request: Request, path: str):
+    """
+    Serves an idempotent invocation from the response cache. The key is the
+    method, path, query and the function's cache_vary_headers; concurrent
+    misses for one key and the same headers wait on a single upstream call.
+    Only whole 200 responses without cookies, no-store/private or a Vary
+    beyond the key are stored. Requests with Authorization or Cookie (unless
+    part of the key) never get here.
+    """
+    key = response_cache.key(
+        target.function_id, request.method, path, request.query_params, request.headers, target.vary_headers
+    )
+    headers = forwardable_headers(request.headers)
+
+    async def fetch():
+        try:
+            upstream = await gateway.invoke(
+                target.function_id,
+                method=request.method,
+                path=path,
+                headers=headers,
+                params=request.query_params,
+                timeout=target.timeout,
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="The function did not respond in time.")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Gateway unavailable: {e}")
+        # The body is already decoded, so the encoding header no longer applies
+        response_headers = {
+            k: v for k, v in forwardable_headers(upstream.headers).items() if k.lower() != "content-encoding"
+        }
+        return CachedResponse(upstream.status_code, response_headers, upstream.content, target.cache_ttl)
+
+    cached, result = await response_cache.get_or_fetch(key, fetch, headers, target.vary_headers)
+    return Response(cached.body, status_code=cached.status_code, headers={**cached.headers, "X-Cache": result.upper()})
+
+
+async def _resolve_invoke_target(function_ref: str) -> InvokeTarget:
+    """What /invoke needs for a function id or name; 404/409 if unusable."""
+    target = invoke_targets.get(function_ref)
+    if target is not None:
+        return target
+
+    async with AsyncSessionLocal() as db:
+        try:
+            query = select(models.Function).filter(models.Function.id == UUID(function_ref))
+        except ValueError:
+            query = select(models.Function).filter(models.Function.name == function_ref).limit(2)
+        functions = (await db.execute(query)).scalars().all()
+
+    if not functions:
+        raise HTTPException(status_code=404, detail="Function not found")
+    if len(functions) > 1:
+        raise HTTPException(status_code=409, detail=f"More than one function is named '{function_ref}'; invoke it by id.")
+    db_function = functions[0]
+    if db_function.status != StatusType.DEPLOYED:
+        raise HTTPException(status_code=409, detail="Function is not deployed.")
+
+    vary_headers = [name.strip().lower() for name in (db_function.cache_vary_headers or "").split(",") if name.strip()]
+    target = InvokeTarget(db_function.id, db_function.invoke_timeout_seconds, db_function.cache_ttl_seconds, vary_headers)
+    invoke_targets[function_ref] = target
+    return target
+
+
+# Update the invocation settings
+@app.patch("/functions/{function_id}/invocation", response_model=schemas.Function)
+async def update_invocation_settings(
+    function_id: UUID,
+    settings: schemas.InvocationSettings,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Changes how /invoke calls the function (only the fields sent are changed).
+    - `invoke_timeout_seconds: null` goes back to the default timeout.
+    - `cache_ttl_seconds` turns on response caching of GET/HEAD invocations
+      (null turns it off); `cache_vary_headers` is a comma-separated list of
+      request headers that are part of the cache key.
+    Any change drops the function's cached responses.
+    """
+    db_function = await db.get(models.Function, function_id, with_for_update=True)
+    if not db_function:
+        raise HTTPException(status_code=404, detail="Function not found")
+    for field, value in settings.model_dump(exclude_unset=True).items():
+        setattr(db_function, field, value)
+    await db.commit()
+    await db.refresh(db_function)
+    invoke_targets.clear()
+    response_cache.invalidate(db_function.id)
+    return db_function
+
+
 # logs
 @app.get("/logs/{function_id}")
-def get_function_status(function_id: str, response_model=schemas.LogsResponse):
-    # Load Kubernetes configuration (from in-cluster service account or local kubeconfig)
+async def get_function_status(function_id: str, response_model=schemas.LogsResponse):
+    """
+    Returns the replica status of a function's deployment from the in-memory
+    status cache, which a background watch on the function namespace keeps current.
+    `stale` is true (and `age` is how long since the cache last heard from the
+    API server) when the watch is disconnected or lagging.
+    """
+    if not status_cache.synced:
+        # The watch hasn't completed its first list yet (e.g. right after startup)
+        return await run_in_threadpool(_read_function_status, function_id)
+
+    deployment, age = status_cache.get('func-' + function_id)
+    if deployment is None:
+        return {"error": f"Function '{function_id}' not found.", "stale": status_cache.is_stale(), "age": age}
+
+    return {"id": function_id, **deployment, "stale": status_cache.is_stale(), "age": age}
+
+
+@app.get("/functions/{function_id}/logs/stream")
+async def stream_function_logs(
+    function_id: UUID,
+    tail: Optional[int] = Query(100, ge=0, le=LOG_BUFFER_LINES),
+    since: Optional[int] = Query(None, ge=1),
+    follow: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streams the output of every pod of a function as Server-Sent Events, one
+    `{"time", "pod", "message"}` event per line, merged in timestamp order.
+    - `tail`: start with at most this many recent lines.
+    - `since`: only lines from the last `since` seconds.
+    - `follow=false` sends the selected lines and ends the stream.
+    Viewers of the same function share one set of pod log connections. A viewer
+    that reads too slowly misses lines; an `event: dropped` with the count
+    is sent where that happened.
+    """
+    if not await db.get(models.Function, function_id):
+        raise HTTPException(status_code=404, detail="Function not found")
+    name = f"func-{function_id}"
+
     try:
-        config.load_incluster_config()
-    except config.ConfigException:
-        config.load_kube_config()
+        if not follow:
+            lines = await run_in_threadpool(read_logs, log_hub.api, name, tail, since)
+        else:
+            log_watch, subscription = await run_in_threadpool(
+                log_hub.subscribe, name, asyncio.get_running_loop(), tail, since
+            )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Reading logs failed: {e}")
 
-    # Create an API client
-    api = client.AppsV1Api()
+    if not follow:
+        async def snapshot():
+            for line in lines:
+                yield f"data: {line.to_json()}\n\n"
 
+        return StreamingResponse(snapshot(), media_type="text/event-stream")
+
+    async def event_stream():
+        try:
+            async for line in subscription.lines():
+                if isinstance(line, int):
+                    yield f"event: dropped\ndata: {line}\n\n"
+                else:
+                    yield f"data: {line.to_json()}\n\n"
+        finally:
+            # Also runs when the client disconnects (cancelled); shielded so the viewer is still removed
+            await asyncio.shield(run_in_threadpool(log_hub.unsubscribe, log_watch, subscription))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def _read_function_status(function_id: str):
+    """Reads a single deployment straight from the Kubernetes API."""
     try:
-        # Fetch the deployment for the given function ID in the 'openfaas-fn' namespace
-        namespace = "openfaas-fn"
-        print("Function Id", function_id)
-        deployment = api.read_namespaced_deployment(name='func-'+function_id, namespace=namespace)
-
-        # Extract the replica counts from the deployment's status
-        desired_replicas = deployment.spec.replicas
-        available_replicas = deployment.status.available_replicas if deployment.status.available_replicas else 0
-
-        # Determine the status
-        status = "Ready" if available_replicas > 0 and available_replicas >= desired_replicas else "NotReady"
-
-        # Return the data in a JSON-friendly format for your API response
-        return {
-            "id": function_id,
-            "status": status,
-            "replicas": desired_replicas,
-            "availableReplicas": available_replicas,
-        }
+        deployment = status_cache.api.read_namespaced_deployment(name='func-' + function_id, namespace=FUNCTION_NAMESPACE)
+        return {"id": function_id, **deployment_status(deployment), "stale": False, "age": 0.0}
 
     except client.ApiException as e:
         if e.status == 404:
             return {"error": f"Function '{function_id}' not found."}
         else:
             return {"error": f"API error: {e.reason}"}
+    except Exception as e:
+        return {"error": f"Kubernetes API unavailable: {e}"}
 
 
 # You can now use your cluster with:
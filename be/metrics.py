@@ -0,0 +1,102 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+import models
+
+# Deploy stages range from milliseconds (cached rollouts) to many minutes (cold image builds)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+DEPLOY_STAGE_SECONDS = Histogram(
+    "deploy_stage_duration_seconds",
+    "Time spent in each stage of a deploy, update or undeploy.",
+    ["action", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+DEPLOY_DURATION_SECONDS = Histogram(
+    "deploy_duration_seconds",
+    "End-to-end time of a deploy, update or undeploy.",
+    ["action", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+DEPLOY_FAILURES = Counter(
+    "deploy_failures_total",
+    "Deploys, updates and undeploys that failed, by the stage that failed.",
+    ["action", "stage"],
+)
+DEPLOYS_IN_FLIGHT = Gauge(
+    "deploys_in_flight",
+    "Deploys, updates and undeploys currently running.",
+    ["action"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, by route template.",
+    ["method", "route", "status"],
+)
+
+
+class StageTimer:
+    """
+    Times the stages of one deploy, update or undeploy.
+
+    Use the timer as a context manager around the whole operation (tracks the
+    in-flight gauge and total duration) and `stage(name)` around each step.
+    Every stage is observed in Prometheus and kept so it can be persisted
+    as DeploymentEvent rows afterwards.
+    """
+
+    def __init__(self, action: str, progress=None):
+        self.action = action
+        self.stages = []
+        self._progress = progress
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        DEPLOYS_IN_FLIGHT.labels(self.action).inc()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        DEPLOYS_IN_FLIGHT.labels(self.action).dec()
+        outcome = "failure" if exc_type else "success"
+        DEPLOY_DURATION_SECONDS.labels(self.action, outcome).observe(time.perf_counter() - self._started)
+        return False
+
+    @contextmanager
+    def stage(self, name: str):
+        if self._progress:
+            self._progress(name)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(getattr(e, "detail", e))
+            DEPLOY_FAILURES.labels(self.action, name).inc()
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            DEPLOY_STAGE_SECONDS.labels(self.action, name).observe(duration)
+            self.stages.append((name, duration, error))
+            print(f"[{self.action}] {name} took {duration:.2f}s" + (f" (failed: {error})" if error else ""))
+
+    @property
+    def failed(self) -> bool:
+        return any(error for _, _, error in self.stages)
+
+    def persist(self, db, function_id, job_id: Optional = None):
+        """Adds one DeploymentEvent per recorded stage to the session (caller commits)."""
+        for name, duration, error in self.stages:
+            db.add(models.DeploymentEvent(
+                function_id=function_id,
+                job_id=job_id,
+                action=self.action,
+                stage=name,
+                duration_ms=duration * 1000,
+                success=error is None,
+                error=error,
+            ))
+
@@ -1,6 +1,7 @@
 import enum
 import uuid
-from sqlalchemy import Column, String, Enum
+from sqlalchemy import Column, String, Enum, DateTime, ForeignKey, UniqueConstraint, Index, Float, Boolean, Integer, Text
+from sqlalchemy.sql import func, text
 from sqlalchemy.dialects.postgresql import UUID
 from database import Base
 
@@ -20,6 +21,23 @@ class EventType(str, enum.Enum):
     HTTP = "HTTP"
     QUEUE_EVENT = "QUEUE_EVENT"
 
+class JobKind(str, enum.Enum):
+    DEPLOY = "DEPLOY"
+    UPDATE = "UPDATE"
+    RECONFIGURE = "RECONFIGURE"
+    ROLLBACK = "ROLLBACK"
+
+class ChangeType(str, enum.Enum):
+    NONE = "NONE"
+    CONFIG = "CONFIG"
+    SOURCE = "SOURCE"
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
 
 class Function(Base):
     """
@@ -27,6 +45,14 @@ class Function(Base):
     It maps the Python class to the database table.
     """
     __tablename__ = "functions"
+    # Listing filters on one column and pages on id, so each index ends with id
+    __table_args__ = (
+        Index("ix_functions_status_id", "status", "id"),
+        Index("ix_functions_type_id", "type", "id"),
+        Index("ix_functions_source_id", "source", "id"),
+        Index("ix_functions_event_type_id", "event_type", "id"),
+        Index("ix_functions_name_prefix", "name", postgresql_ops={"name": "varchar_pattern_ops"}),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     type = Column(Enum(FunctionType), nullable=False)
@@ -37,3 +63,139 @@ class Function(Base):
     redis_host = Column(String, nullable=True)
     redis_queue_name = Column(String, nullable=True)
     name = Column(String, nullable=True)
+    # Path of handler.go inside a GitHub repository, remembered to skip the tree search
+    handler_path = Column(String, nullable=True)
+    # Autoscaling policy, rendered as com.openfaas.scale.* labels
+    scale_min = Column(Integer, nullable=False, default=1, server_default="1")
+    scale_max = Column(Integer, nullable=False, default=5, server_default="5")
+    scale_factor = Column(Integer, nullable=False, default=100, server_default="100")
+    scale_to_zero = Column(Boolean, nullable=False, default=False, server_default="false")
+    target_concurrency = Column(Integer, nullable=True)
+    # Read timeout for invocations through the /invoke proxy and the queue worker (default when null)
+    invoke_timeout_seconds = Column(Float, nullable=True)
+    # Responses to GET/HEAD invocations are cached this long (no caching when null)
+    cache_ttl_seconds = Column(Float, nullable=True)
+    # Comma-separated request headers that are part of the cache key
+    cache_vary_headers = Column(String, nullable=True)
+    # What is live, recorded by every successful deploy so updates can tell what changed
+    deployed_commit_sha = Column(String, nullable=True)
+    deployed_source_hash = Column(String, nullable=True)
+    deployed_config_hash = Column(String, nullable=True)
+    # FunctionRevision.number of what is live
+    deployed_revision = Column(Integer, nullable=True)
+    # Bumped by every UPDATE, which only applies if nobody else changed the row since it was read
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version_id}
+
+
+class DeployJob(Base):
+    """
+    A deployment request waiting for, or executed by, a build worker.
+    Rows are the persisted queue: workers claim the oldest QUEUED job.
+    """
+    __tablename__ = "deploy_jobs"
+    # At most one active job per function, whichever API instance queues it
+    __table_args__ = (
+        Index(
+            "uq_deploy_jobs_active_function", "function_id", unique=True,
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"),
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    function_id = Column(UUID(as_uuid=True), ForeignKey("functions.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(Enum(JobKind), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED, index=True)
+    stage = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Set for jobs deployed as part of a batch; those are run by the batch, not claimed on their own
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("deploy_batches.id", ondelete="CASCADE"), nullable=True, index=True)
+    # The revision a ROLLBACK job redeploys
+    revision_id = Column(UUID(as_uuid=True), ForeignKey("function_revisions.id", ondelete="SET NULL"), nullable=True)
+    # The API instance running the job, and when it last said it still is
+    worker = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class DeployBatch(Base):
+    """
+    A rollout of many functions at once. Each function gets a DeployJob (with
+    batch_id set) holding its own result; the batch builds them together in
+    multi-function stack files, `shard_size` functions per file, with at most
+    `parallelism` builds and pushes running at the same time.
+    """
+    __tablename__ = "deploy_batches"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED, index=True)
+    stage = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    parallelism = Column(Integer, nullable=False)
+    shard_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    worker = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BuildCacheEntry(Base):
+    """
+    An image that was built and pushed for a given function source.
+    `content_hash` covers the handler files and stack.yml, so a matching row
+    means the image can be deployed again without rebuilding.
+    """
+    __tablename__ = "build_cache"
+    __table_args__ = (UniqueConstraint("function_id", "content_hash"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    function_id = Column(UUID(as_uuid=True), ForeignKey("functions.id", ondelete="CASCADE"), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    image = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class FunctionRevision(Base):
+    """
+    One deployed version of a function: the image that ran (by content-hash
+    tag and, when the registry told us, by digest) and the stack.yml it ran
+    with. Rows are never changed, so any of them can be redeployed as is.
+    `number` counts up per function.
+    """
+    __tablename__ = "function_revisions"
+    __table_args__ = (UniqueConstraint("function_id", "number"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    function_id = Column(UUID(as_uuid=True), ForeignKey("functions.id", ondelete="CASCADE"), nullable=False, index=True)
+    number = Column(Integer, nullable=False)
+    image = Column(String, nullable=False)
+    image_digest = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    source_hash = Column(String, nullable=True)
+    commit_sha = Column(String, nullable=True)
+    config_hash = Column(String, nullable=False)
+    stack_config = Column(Text, nullable=False)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("deploy_jobs.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class DeploymentEvent(Base):
+    """
+    How long one stage (fetch, format, template, build, push, deploy, remove, ...)
+    of a deploy, update or undeploy took, and whether it failed.
+    """
+    __tablename__ = "deployment_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    function_id = Column(UUID(as_uuid=True), ForeignKey("functions.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("deploy_jobs.id", ondelete="SET NULL"), nullable=True)
+    action = Column(String, nullable=False)
+    stage = Column(String, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    success = Column(Boolean, nullable=False)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
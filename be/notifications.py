@@ -0,0 +1,96 @@
+import os
+import select
+import threading
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import models
+from leader import INSTANCE_ID
+
+# Postgres NOTIFY channel carrying "<instance id> <function id>" for every committed function change
+FUNCTION_CHANGES_CHANNEL = os.getenv("FUNCTION_CHANGES_CHANNEL", "function_changes")
+# How long the listener waits between polls, and before reconnecting after an error
+FUNCTION_CHANGES_POLL_SECONDS = float(os.getenv("FUNCTION_CHANGES_POLL_SECONDS", "5"))
+
+
+class FunctionChangeFeed:
+    """
+    Tells the other API instances sharing the database which functions changed,
+    so they drop what they cached about them (invoke targets, cached responses,
+    listing pages).
+
+    Every flush that creates, changes or deletes Function rows also sends a
+    pg_notify per row (see watch()); Postgres delivers it only if and when the
+    transaction commits. A listener thread holds one LISTENing connection and
+    calls `on_change(function_id)` for changes made by other instances, or
+    `on_change(None)` after reconnecting, when notifications may have been missed.
+    `on_change` runs on the event loop passed to start(), like the caches it clears.
+    """
+
+    def __init__(self, engine, on_change, channel: str = FUNCTION_CHANGES_CHANNEL,
+                 interval: float = FUNCTION_CHANGES_POLL_SECONDS):
+        self._engine = engine
+        self._on_change = on_change
+        self._channel = channel
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+
+    def watch(self, session_class=Session):
+        """Notifies the changed Function rows of every flush of sessions (sync and async)."""
+        event.listen(session_class, "after_flush", self._after_flush)
+
+    def _after_flush(self, session, flush_context):
+        changed = {str(obj.id) for obj in (*session.new, *session.dirty, *session.deleted)
+                   if isinstance(obj, models.Function) and obj.id is not None}
+        for function_id in changed:
+            session.connection().execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self._channel, "payload": f"{INSTANCE_ID} {function_id}"},
+            )
+
+    def start(self, loop):
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="function-changes", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self._interval + 5)
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            try:
+                self._listen(missed=not first)
+            except Exception as e:
+                print(f"Listening for function changes failed: {e}")
+            first = False
+            self._stop.wait(self._interval)
+
+    def _listen(self, missed: bool):
+        connection = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            connection.execute(text(f'LISTEN "{self._channel}"'))
+            if missed:
+                # Changes made while we weren't listening are unknown
+                self._loop.call_soon_threadsafe(self._on_change, None)
+            dbapi_connection = connection.connection.dbapi_connection
+            while not self._stop.is_set():
+                if select.select([dbapi_connection], [], [], self._interval) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self._dispatch(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _dispatch(self, payload: str):
+        instance, _, function_id = payload.partition(" ")
+        if instance != INSTANCE_ID:
+            self._loop.call_soon_threadsafe(self._on_change, function_id or None)
+
@@ -0,0 +1,58 @@
+import base64
+import binascii
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException
+
+import models
+import schemas
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(function_id) -> str:
+    """Opaque cursor pointing just after the given function in listing order."""
+    return base64.urlsafe_b64encode(str(function_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return uuid.UUID(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def apply_function_filters(query, filters: schemas.FunctionFilters):
+    """Adds the listing filters to a Query or select() over models.Function."""
+    if filters.status:
+        query = query.filter(models.Function.status == filters.status)
+    if filters.type:
+        query = query.filter(models.Function.type == filters.type)
+    if filters.source:
+        query = query.filter(models.Function.source == filters.source)
+    if filters.event_type:
+        query = query.filter(models.Function.event_type == filters.event_type)
+    if filters.name_prefix:
+        query = query.filter(models.Function.name.startswith(filters.name_prefix, autoescape=True))
+    return query
+
+
+def paginate_functions(query, cursor: Optional[str], limit: int):
+    """
+    Keyset pagination ordered on the primary key: the page starts after the
+    cursor's id, so the cost doesn't grow with depth and rows never shift
+    between pages. One extra row is fetched to tell whether a next page exists.
+    """
+    if cursor:
+        query = query.filter(models.Function.id > decode_cursor(cursor))
+    return query.order_by(models.Function.id).limit(limit + 1)
+
+
+def split_page(rows, limit: int):
+    """Returns (page rows, next cursor or None) from a paginate_functions() result."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Optional
+
+import httpx
+import redis.asyncio as redis
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import select
+
+import models
+from database import AsyncSessionLocal
+from gateway import GatewayClient, get_gateway
+from models import EventType, StatusType
+
+# Messages pulled per read; a batch is fanned out under the function's concurrency limit
+QUEUE_BATCH_SIZE = int(os.getenv("QUEUE_BATCH_SIZE", "50"))
+QUEUE_BLOCK_SECONDS = float(os.getenv("QUEUE_BLOCK_SECONDS", "1"))
+# Invocations in flight per function, across all of its messages
+QUEUE_FUNCTION_CONCURRENCY = int(os.getenv("QUEUE_FUNCTION_CONCURRENCY", "8"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))
+QUEUE_RETRY_BASE_SECONDS = float(os.getenv("QUEUE_RETRY_BASE_SECONDS", "0.5"))
+QUEUE_RETRY_MAX_SECONDS = float(os.getenv("QUEUE_RETRY_MAX_SECONDS", "30"))
+# How often the set of QUEUE_EVENT functions is re-read from the database
+QUEUE_REFRESH_SECONDS = float(os.getenv("QUEUE_REFRESH_SECONDS", "10"))
+# Stream consumer group, and this process's name within it (also names its list processing queues)
+QUEUE_CONSUMER_GROUP = os.getenv("QUEUE_CONSUMER_GROUP", "s3-for-code")
+QUEUE_CONSUMER_NAME = os.getenv("QUEUE_CONSUMER_NAME", socket.gethostname())
+DEAD_LETTER_SUFFIX = ":dead"
+PROCESSING_SUFFIX = ":processing:"
+
+QUEUE_MESSAGES = Counter(
+    "queue_messages_total",
+    "Queue messages handled, by outcome (succeeded, retried, dead_lettered).",
+    ["queue", "outcome"],
+)
+QUEUE_INVOKE_SECONDS = Histogram(
+    "queue_invoke_duration_seconds",
+    "Time for one function invocation made for a queue message.",
+    ["queue"],
+)
+QUEUE_LAG = Gauge(
+    "queue_lag_messages",
+    "Messages waiting in the queue (list length, or consumer group lag for streams).",
+    ["queue"],
+)
+QUEUE_PENDING = Gauge(
+    "queue_pending_messages",
+    "Messages taken from the queue but not yet acknowledged.",
+    ["queue"],
+)
+
+
+class QueueBinding:
+    """A QUEUE_EVENT function and the Redis list or stream that triggers it."""
+
+    def __init__(self, function_id, redis_host: str, queue_name: str, timeout: Optional[float] = None):
+        self.function_id = str(function_id)
+        self.redis_host = redis_host
+        self.queue_name = queue_name
+        self.timeout = timeout
+
+    @property
+    def key(self):
+        return (self.function_id, self.redis_host, self.queue_name)
+
+    @property
+    def label(self) -> str:
+        return f"{self.redis_host}/{self.queue_name}"
+
+
+class InvocationError(Exception):
+    """The invocation failed in a way worth retrying (5xx, 429)."""
+
+
+class PermanentFailure(Exception):
+    """The function rejected the message (4xx); retrying won't help."""
+
+
+def redis_client(redis_host: str):
+    """Client for a function's redis_host, given as host[:port] or a redis:// URL."""
+    url = redis_host if "://" in redis_host else f"redis://{redis_host}"
+    return redis.from_url(url)
+
+
+async def load_bindings():
+    """Deployed QUEUE_EVENT functions that have a queue configured."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.Function).filter(
+                models.Function.event_type == EventType.QUEUE_EVENT,
+                models.Function.status == StatusType.DEPLOYED,
+                models.Function.redis_host.isnot(None),
+                models.Function.redis_queue_name.isnot(None),
+            )
+        )
+        return [
+            QueueBinding(f.id, f.redis_host, f.redis_queue_name, f.invoke_timeout_seconds)
+            for f in result.scalars().all()
+        ]
+
+
+def retry_delay(attempt: int) -> float:
+    return min(QUEUE_RETRY_BASE_SECONDS * (2 ** (attempt - 1)), QUEUE_RETRY_MAX_SECONDS)
+
+
+class QueueConsumer:
+    """
+    Feeds one function from its queue. Lists and streams are both supported;
+    the key's Redis type decides which (a missing key is treated as a list).
+
+    - Lists: messages are moved atomically to a per-consumer processing list
+      and removed from it once handled, so a crash never loses a message;
+      on start, whatever this consumer left in processing is put back.
+    - Streams: messages are read through a consumer group and XACKed once
+      handled; on start, this consumer's pending entries are read again.
+
+    A message is handled when the function returns 2xx, or when it has been
+    moved to the `<queue>:dead` dead-letter list/stream after a 4xx or after
+    QUEUE_MAX_ATTEMPTS failed attempts with exponential backoff.
+    """
+
+    def __init__(self, binding: QueueBinding, client, gateway: GatewayClient, semaphore: asyncio.Semaphore):
+        self.binding = binding
+        self.client = client
+        self.gateway = gateway
+        self.semaphore = semaphore
+        self.queue = binding.queue_name
+        self.dead_letter = binding.queue_name + DEAD_LETTER_SUFFIX
+        self.processing = binding.queue_name + PROCESSING_SUFFIX + QUEUE_CONSUMER_NAME
+        self._stream = None
+        self._pending_id = None
+        self._in_flight = set()
+
+    async def run(self, stop: asyncio.Event):
+        try:
+            while not stop.is_set():
+                try:
+                    if self._stream is None:
+                        await self._setup()
+                    # Keep reading while earlier messages are still being retried, up to two batches in flight
+                    while len(self._in_flight) >= QUEUE_BATCH_SIZE:
+                        await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    batch = await (self._read_stream() if self._stream else self._read_list())
+                    for message_id, body in batch:
+                        task = asyncio.create_task(self._handle(message_id, body))
+                        self._in_flight.add(task)
+                        task.add_done_callback(self._in_flight.discard)
+                    await self.report_lag()
+                except RedisError as e:
+                    print(f"Queue {self.binding.label} read failed: {e}")
+                    # Re-detect the key type too: a WRONGTYPE error means it changed
+                    self._stream = None
+                    await asyncio.sleep(QUEUE_RETRY_MAX_SECONDS / 10)
+        finally:
+            for task in list(self._in_flight):
+                task.cancel()
+
+    async def _setup(self):
+        key_type = (await self.client.type(self.queue)).decode()
+        self._stream = key_type == "stream"
+        if self._stream:
+            try:
+                await self.client.xgroup_create(self.queue, QUEUE_CONSUMER_GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self._pending_id = "0"
+        else:
+            # Messages this consumer took before it last stopped go back to the head of the queue
+            restored = 0
+            while await self.client.lmove(self.processing, self.queue, "LEFT", "RIGHT") is not None:
+                restored += 1
+            if restored:
+                print(f"Re-queued {restored} unacknowledged message(s) on {self.binding.label}")
+
+    async def _read_list(self):
+        first = await self.client.blmove(self.queue, self.processing, QUEUE_BLOCK_SECONDS, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for _ in range(QUEUE_BATCH_SIZE - 1):
+            pipe.lmove(self.queue, self.processing, "RIGHT", "LEFT")
+        rest = [body for body in await pipe.execute() if body is not None]
+        return [(body, body) for body in [first, *rest]]
+
+    async def _read_stream(self):
+        # Our own pending entries first (left from a previous run), then new ones
+        if self._pending_id is not None:
+            response = await self.client.xreadgroup(
+                QUEUE_CONSUMER_GROUP, QUEUE_CONSUMER_NAME, {self.queue: self._pending_id}, count=QUEUE_BATCH_SIZE
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                self._pending_id = None
+                return []
+            self._pending_id = entries[-1][0]
+        else:
+            response = await self.client.xreadgroup(
+                QUEUE_CONSUMER_GROUP, QUEUE_CONSUMER_NAME, {self.queue: ">"},
+                count=QUEUE_BATCH_SIZE, block=int(QUEUE_BLOCK_SECONDS * 1000)
+            )
+            entries = response[0][1] if response else []
+        return [(message_id, self._stream_body(fields)) for message_id, fields in entries]
+
+    @staticmethod
+    def _stream_body(fields: dict) -> bytes:
+        # A single 'body'/'data' field is sent as is; anything else as a JSON object
+        for name in (b"body", b"data"):
+            if len(fields) == 1 and name in fields:
+                return fields[name]
+        return json.dumps({k.decode(): v.decode(errors="replace") for k, v in fields.items()}).encode()
+
+    async def _handle(self, message_id, body: bytes):
+        error = None
+        for attempt in range(1, QUEUE_MAX_ATTEMPTS + 1):
+            try:
+                async with self.semaphore:
+                    await self._invoke(body)
+                await self._ack(message_id)
+                QUEUE_MESSAGES.labels(self.binding.label, "succeeded").inc()
+                return
+            except PermanentFailure as e:
+                error = str(e)
+                break
+            except (httpx.HTTPError, InvocationError, RedisError) as e:
+                error = str(e) or type(e).__name__
+                if attempt < QUEUE_MAX_ATTEMPTS:
+                    QUEUE_MESSAGES.labels(self.binding.label, "retried").inc()
+                    await asyncio.sleep(retry_delay(attempt))
+        await self._dead_letter(message_id, body, error)
+        QUEUE_MESSAGES.labels(self.binding.label, "dead_lettered").inc()
+
+    async def _invoke(self, body: bytes):
+        started = time.perf_counter()
+        try:
+            response = await self.gateway.invoke(self.binding.function_id, "POST", content=body, timeout=self.binding.timeout)
+        finally:
+            QUEUE_INVOKE_SECONDS.labels(self.binding.label).observe(time.perf_counter() - started)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise InvocationError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise PermanentFailure(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    async def _ack(self, message_id):
+        if self._stream:
+            await self.client.xack(self.queue, QUEUE_CONSUMER_GROUP, message_id)
+        else:
+            await self.client.lrem(self.processing, 1, message_id)
+
+    async def _dead_letter(self, message_id, body: bytes, error: Optional[str]):
+        print(f"Dead-lettering a message from {self.binding.label}: {error}")
+        if self._stream:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.xadd(self.dead_letter, {"body": body, "error": error or "", "source_id": message_id})
+            pipe.xack(self.queue, QUEUE_CONSUMER_GROUP, message_id)
+        else:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.lpush(self.dead_letter, body)
+            pipe.lrem(self.processing, 1, message_id)
+        await pipe.execute()
+
+    async def report_lag(self):
+        if self._stream:
+            groups = await self.client.xinfo_groups(self.queue)
+            group = next((g for g in groups if g["name"] in (QUEUE_CONSUMER_GROUP, QUEUE_CONSUMER_GROUP.encode())), None)
+            lag = group.get("lag") if group else None
+            QUEUE_LAG.labels(self.binding.label).set(lag if lag is not None else await self.client.xlen(self.queue))
+            QUEUE_PENDING.labels(self.binding.label).set(group["pending"] if group else 0)
+        else:
+            QUEUE_LAG.labels(self.binding.label).set(await self.client.llen(self.queue))
+            QUEUE_PENDING.labels(self.binding.label).set(await self.client.llen(self.processing))
+
+
+class QueueWorker:
+    """
+    Runs a QueueConsumer for every deployed QUEUE_EVENT function, re-reading
+    the list of functions every QUEUE_REFRESH_SECONDS. All consumers share
+    the pooled gateway client and one Redis client per host.
+
+    `binding_source`, `redis_factory` and `gateway` can be replaced with fakes
+    (e.g. fakeredis and a GatewayClient over an httpx.MockTransport) to run
+    it without a cluster.
+    """
+
+    def __init__(self, binding_source=load_bindings, redis_factory=redis_client, gateway: Optional[GatewayClient] = None):
+        self._binding_source = binding_source
+        self._redis_factory = redis_factory
+        self._gateway = gateway or get_gateway()
+        self._clients = {}
+        self._semaphores = {}
+        self._consumers = {}
+        self._stop = asyncio.Event()
+
+    async def run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    await self._sync(await self._binding_source())
+                except Exception as e:
+                    print(f"Failed to refresh queue bindings: {e}")
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=QUEUE_REFRESH_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    async def _sync(self, bindings):
+        wanted = {binding.key: binding for binding in bindings}
+        for key in set(self._consumers) - set(wanted):
+            task, _ = self._consumers.pop(key)
+            task.cancel()
+            print(f"Stopped consuming {key[2]} for func-{key[0]}")
+        for key, binding in wanted.items():
+            if key in self._consumers:
+                self._consumers[key][1].binding.timeout = binding.timeout
+                continue
+            if binding.redis_host not in self._clients:
+                self._clients[binding.redis_host] = self._redis_factory(binding.redis_host)
+            semaphore = self._semaphores.setdefault(binding.function_id, asyncio.Semaphore(QUEUE_FUNCTION_CONCURRENCY))
+            consumer = QueueConsumer(binding, self._clients[binding.redis_host], self._gateway, semaphore)
+            self._consumers[key] = (asyncio.create_task(consumer.run(self._stop)), consumer)
+            print(f"Consuming {binding.label} for func-{binding.function_id}")
+
+    async def _shutdown(self):
+        tasks = [task for task, _ in self._consumers.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._consumers = {}
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+        await self._gateway.aclose()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Invoke QUEUE_EVENT functions for the messages on their Redis lists or streams."
+    )
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("QUEUE_METRICS_PORT", "9102")),
+                        help="Port serving Prometheus metrics (0 to disable)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    try:
+        asyncio.run(QueueWorker().run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+
+from cachetools import TLRUCache
+from prometheus_client import Counter, Gauge
+
+# Memory bound for all cached bodies together; least recently used entries go first
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Larger responses are passed through but never stored
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+CACHEABLE_METHODS = ("GET", "HEAD")
+# Requests carrying these are per user: never cached or shared unless they are part of the key
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Invocations of cache-enabled functions, by result (hit, miss, coalesced, bypass).",
+    ["function", "result"],
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "response_cache_bytes",
+    "Bytes of response bodies held in the invocation response cache.",
+)
+
+
+class CachedResponse:
+    """A fully read upstream response: what is stored and replayed."""
+
+    def __init__(self, status_code: int, headers: dict, body: bytes, ttl: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.ttl = ttl
+
+    def cacheable(self, vary_headers=()) -> bool:
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        cache_control = headers.get("cache-control", "").lower()
+        # The upstream may vary on headers the key doesn't include; then one entry can't serve everyone
+        vary = {name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()}
+        return (
+            self.status_code == 200
+            and len(self.body) <= RESPONSE_CACHE_MAX_ENTRY_BYTES
+            and "set-cookie" not in headers
+            and "no-store" not in cache_control
+            and "private" not in cache_control
+            and vary <= set(vary_headers)
+        )
+
+
+def bypasses_cache(headers, vary_headers) -> bool:
+    """Whether a request carries credentials that the function's cache key doesn't cover."""
+    return any(name in headers and name not in vary_headers for name in CREDENTIAL_HEADERS)
+
+
+class ResponseCache:
+    """
+    Per-function response cache for idempotent invocations.
+
+    Entries are keyed on function, method, path, query and the function's
+    chosen request headers, expire after the function's TTL and are evicted
+    least recently used first once RESPONSE_CACHE_MAX_BYTES is reached.
+    Concurrent misses for the same key share one upstream call, but only
+    when they would forward the same request headers.
+
+    invalidate() bumps the function's generation (invalidate_all() an epoch
+    shared by all functions), which is part of every key, so old entries are
+    never served again and simply age out.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self._entries = TLRUCache(
+            maxsize=max_bytes,
+            ttu=lambda key, value, now: now + value.ttl,
+            timer=time.monotonic,
+            getsizeof=lambda value: max(len(value.body), 1),
+        )
+        self._generations = {}
+        self._epoch = 0
+        self._in_flight = {}
+
+    def key(self, function_id, method: str, path: str, query_params, headers, vary_headers):
+        generation = (self._epoch, self._generations.get(str(function_id), 0))
+        return (
+            str(function_id),
+            generation,
+            method,
+            path,
+            tuple(sorted(query_params.multi_items())),
+            tuple(headers.get(name, "") for name in vary_headers),
+        )
+
+    async def get_or_fetch(self, key, fetch, forwarded_headers: dict, vary_headers=()):
+        """
+        Returns (response, result) where result is 'hit', 'miss' or 'coalesced'.
+        `fetch` is an async callable returning a CachedResponse for a request
+        with `forwarded_headers`; it runs at most once at a time per key and
+        headers, and its response is stored if cacheable.
+        """
+        function_id = key[0]
+        cached = self._entries.get(key)
+        if cached is not None:
+            RESPONSE_CACHE_REQUESTS.labels(function_id, "hit").inc()
+            return cached, "hit"
+
+        # Waiters get whatever the upstream answered (errors included), so they must have sent the same request
+        flight = (key, tuple(sorted((k.lower(), v) for k, v in forwarded_headers.items())))
+        pending = self._in_flight.get(flight)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if pending.cancelled():
+                # The request doing the fetch went away; try again ourselves
+                return await self.get_or_fetch(key, fetch, forwarded_headers, vary_headers)
+            RESPONSE_CACHE_REQUESTS.labels(function_id, "coalesced").inc()
+            return pending.result(), "coalesced"
+
+        RESPONSE_CACHE_REQUESTS.labels(function_id, "miss").inc()
+        pending = asyncio.get_running_loop().create_future()
+        self._in_flight[flight] = pending
+        try:
+            response = await fetch()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Nobody may be waiting; don't warn about an unretrieved exception
+            pending.exception()
+            raise
+        finally:
+            self._in_flight.pop(flight, None)
+
+        pending.set_result(response)
+        # Only store what was fetched for the current generation
+        if response.cacheable(vary_headers) and key[1] == (self._epoch, self._generations.get(function_id, 0)):
+            self._entries[key] = response
+            RESPONSE_CACHE_BYTES.set(self._entries.currsize)
+        return response, "miss"
+
+    def invalidate(self, function_id):
+        """Drops every cached response of a function (safe to call from any thread)."""
+        function_id = str(function_id)
+        self._generations[function_id] = self._generations.get(function_id, 0) + 1
+
+    def invalidate_all(self):
+        """Drops every cached response, e.g. when changes may have been missed (safe to call from any thread)."""
+        self._epoch += 1
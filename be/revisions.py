@@ -0,0 +1,57 @@
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+import build_cache
+from backends import get_backend, image_repository
+
+
+def record(db: Session, db_function: models.Function, stack_file: str, image: str,
+           content_hash: Optional[str] = None, job_id=None) -> models.FunctionRevision:
+    """
+    Stores what was just deployed as the function's next revision and marks it
+    as deployed. Deploying an image and stack.yml that an earlier revision
+    already has reuses that revision. The caller commits.
+    """
+    config_hash = build_cache.compute_config_hash(stack_file)
+    revision = (
+        db.query(models.FunctionRevision)
+        .filter(
+            models.FunctionRevision.function_id == db_function.id,
+            models.FunctionRevision.image == image,
+            models.FunctionRevision.config_hash == config_hash,
+        )
+        .first()
+    )
+    if revision is None:
+        with open(stack_file) as f:
+            stack_config = f.read()
+        last_number = (
+            db.query(func.max(models.FunctionRevision.number))
+            .filter(models.FunctionRevision.function_id == db_function.id)
+            .scalar()
+        )
+        revision = models.FunctionRevision(
+            function_id=db_function.id,
+            number=(last_number or 0) + 1,
+            image=image,
+            image_digest=get_backend().image_digest(image),
+            content_hash=content_hash,
+            source_hash=db_function.deployed_source_hash,
+            commit_sha=db_function.deployed_commit_sha,
+            config_hash=config_hash,
+            stack_config=stack_config,
+            job_id=job_id,
+        )
+        db.add(revision)
+    db_function.deployed_revision = revision.number
+    return revision
+
+
+def pinned_image(revision: models.FunctionRevision) -> str:
+    """The revision's image by digest when it is known, so a moved tag can't change what runs."""
+    if revision.image_digest:
+        return f"{image_repository(revision.image)}@{revision.image_digest}"
+    return revision.image
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from datetime import datetime
+from typing import List, Optional
 from uuid import UUID
-from models import FunctionType, SourceType, StatusType, EventType
+from models import FunctionType, SourceType, StatusType, EventType, JobKind, JobStatus, ChangeType
 
 class FunctionBase(BaseModel):
     type: FunctionType
@@ -16,13 +17,149 @@ class FunctionCreate(FunctionBase):
     id: Optional[UUID] = None
     github_url: Optional[str] = None
 
+class ScalingPolicy(BaseModel):
+    scale_min: int = Field(1, ge=1)
+    scale_max: int = Field(5, ge=1)
+    scale_factor: int = Field(100, ge=0, le=100)
+    scale_to_zero: bool = False
+    target_concurrency: Optional[int] = Field(None, ge=1)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode="after")
+    def check_bounds(self):
+        if self.scale_min > self.scale_max:
+            raise ValueError("scale_min must not be greater than scale_max")
+        return self
+
+class ScalingUpdate(BaseModel):
+    scale_min: Optional[int] = None
+    scale_max: Optional[int] = None
+    scale_factor: Optional[int] = None
+    scale_to_zero: Optional[bool] = None
+    target_concurrency: Optional[int] = None
+
+class InvocationSettings(BaseModel):
+    invoke_timeout_seconds: Optional[float] = Field(None, gt=0, le=3600)
+    cache_ttl_seconds: Optional[float] = Field(None, gt=0, le=86400)
+    cache_vary_headers: Optional[str] = Field(None, max_length=1024)
+
 class Function(FunctionBase):
     id: UUID
     location_url: str
     status: StatusType
+    scale_min: int
+    scale_max: int
+    scale_factor: int
+    scale_to_zero: bool
+    target_concurrency: Optional[int] = None
+    invoke_timeout_seconds: Optional[float] = None
+    cache_ttl_seconds: Optional[float] = None
+    cache_vary_headers: Optional[str] = None
+    deployed_revision: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+class FunctionFilters(BaseModel):
+    status: Optional[StatusType] = None
+    type: Optional[FunctionType] = None
+    source: Optional[SourceType] = None
+    event_type: Optional[EventType] = None
+    name_prefix: Optional[str] = None
+
+class DeployJob(BaseModel):
+    id: UUID
+    function_id: UUID
+    kind: JobKind
+    status: JobStatus
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    batch_id: Optional[UUID] = None
+    revision_id: Optional[UUID] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class Revision(BaseModel):
+    id: UUID
+    number: int
+    image: str
+    image_digest: Optional[str] = None
+    content_hash: Optional[str] = None
+    source_hash: Optional[str] = None
+    commit_sha: Optional[str] = None
+    stack_config: str
+    job_id: Optional[UUID] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class HistoryPoint(BaseModel):
+    time: datetime
+    available_replicas: float
+    desired_replicas: int
+    invocations: int
+    invocation_rate: float
+
+class FunctionHistory(BaseModel):
+    function_id: UUID
+    window: int
+    step: int
+    points: List[HistoryPoint]
+
+class RollbackRequest(BaseModel):
+    revision: int = Field(..., ge=1)
+
+class UpdateResult(BaseModel):
+    change: ChangeType
+    job: Optional[DeployJob] = None
+
+class BatchDeployRequest(BaseModel):
+    function_ids: Optional[List[UUID]] = None
+    filters: Optional[FunctionFilters] = None
+    parallelism: Optional[int] = Field(None, ge=1, le=64)
+    shard_size: Optional[int] = Field(None, ge=1, le=500)
+
+class DeployBatch(BaseModel):
+    id: UUID
+    status: JobStatus
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    parallelism: int
+    shard_size: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    jobs: List[DeployJob] = []
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SkippedFunction(BaseModel):
+    function_id: UUID
+    reason: str
+
+class BatchDeployResponse(BaseModel):
+    batch: DeployBatch
+    skipped: List[SkippedFunction]
+
+class DeploymentStatus(BaseModel):
+    status: str
+    replicas: int
+    availableReplicas: int
+
+class FunctionStatus(BaseModel):
+    id: UUID
+    name: Optional[str] = None
+    status: StatusType
+    deployment: Optional[DeploymentStatus] = None
+
+class BulkStatusResponse(BaseModel):
+    stale: bool
+    age: Optional[float] = None
+    functions: List[FunctionStatus]
+
 class LogsResponse():
     id: str
     status: str
@@ -1,29 +1,220 @@
-import requests
+import argparse
+import asyncio
+import json
+import math
 import sys
+import time
+from collections import defaultdict
 
-def make_single_api_call(url):
+import httpx
+
+# Latencies are bucketed on a log scale with this relative precision, so the
+# histogram stays small no matter how many requests are recorded.
+HISTOGRAM_PRECISION = 0.01
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (values in seconds) with ~1% error on percentiles."""
+
+    def __init__(self, precision: float = HISTOGRAM_PRECISION):
+        self._log_base = math.log1p(precision)
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        micros = max(seconds * 1e6, 1.0)
+        self.buckets[int(math.log(micros) / self._log_base)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Upper edge of the bucket, capped at the largest value seen
+                return min(math.exp((bucket + 1) * self._log_base) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        result = {
+            "count": self.count,
+            "mean_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "min_ms": (self.min * 1000) if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+        for p in PERCENTILES:
+            result[f"p{str(p).replace('.', '')}_ms"] = self.percentile(p) * 1000
+        return result
+
+
+class LoadStats:
+    """Everything recorded after warm-up: latencies, errors and per-second throughput."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(int)
+        self.timeline = defaultdict(lambda: {"requests": 0, "errors": 0})
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, elapsed: float, outcome: str, ok: bool):
+        second = int(time.monotonic() - self.started_at)
+        self.timeline[second]["requests"] += 1
+        self.latency.record(elapsed)
+        if ok:
+            self.status_codes[outcome] += 1
+        else:
+            self.errors[outcome] += 1
+            self.timeline[second]["errors"] += 1
+
+    def report(self, config: dict) -> dict:
+        duration = (self.finished_at or time.monotonic()) - self.started_at
+        total = self.latency.count
+        error_count = sum(self.errors.values())
+        return {
+            "config": config,
+            "duration_s": duration,
+            "requests": total,
+            "throughput_rps": total / duration if duration > 0 else 0.0,
+            "error_rate": error_count / total if total else 0.0,
+            "errors": dict(self.errors),
+            "status_codes": dict(self.status_codes),
+            "latency": self.latency.summary(),
+            "timeline": [
+                {"second": second, **self.timeline[second]} for second in sorted(self.timeline)
+            ],
+        }
+
+
+class Pacer:
     """
-    Sends Load to GET request to the specified URL and prints the response.
+    Hands out send times for an open-loop target rate shared by all workers,
+    so a slow response doesn't lower the offered load. rps=0 means closed loop.
     """
-    try:
-        while True:
-            response = requests.get(url, timeout=1)
 
-            print(f"Status Code: {response.status_code}")
+    def __init__(self, rps: float):
+        self.rps = rps
+        self._start = time.monotonic()
+        self._issued = 0
 
-            print("\nResponse Content (first 300 chars):")
-            print(response.text[:300])
+    async def wait(self):
+        if not self.rps:
+            return
+        send_at = self._start + self._issued / self.rps
+        self._issued += 1
+        delay = send_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _worker(client, args, targets, pacer, stats, warmup_ends, deadline, worker_id):
+    request_number = worker_id
+    while True:
+        await pacer.wait()
+        now = time.monotonic()
+        if now >= deadline:
+            return
+
+        url = targets[request_number % len(targets)]
+        request_number += args.concurrency
+        start = time.monotonic()
+        try:
+            response = await client.request(args.method, url, content=args.data)
+            await response.aread()
+            ok = response.status_code < 400
+            outcome = str(response.status_code) if ok else f"http_{response.status_code}"
+        except httpx.TimeoutException:
+            ok, outcome = False, "timeout"
+        except httpx.HTTPError as e:
+            ok, outcome = False, type(e).__name__
+        elapsed = time.monotonic() - start
+
+        if start >= warmup_ends:
+            stats.record(elapsed, outcome, ok)
+
+
+async def run_load(args) -> dict:
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    stats = LoadStats()
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout, headers=headers) as client:
+        start = time.monotonic()
+        warmup_ends = start + args.warmup
+        deadline = warmup_ends + args.duration
+        stats.started_at = warmup_ends
+        pacer = Pacer(args.rps)
+        await asyncio.gather(*(
+            _worker(client, args, args.urls, pacer, stats, warmup_ends, deadline, i)
+            for i in range(args.concurrency)
+        ))
+        stats.finished_at = time.monotonic()
+
+    config = {
+        "urls": args.urls,
+        "method": args.method,
+        "concurrency": args.concurrency,
+        "target_rps": args.rps,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+    }
+    return stats.report(config)
+
+
+def print_report(report: dict):
+    latency = report["latency"]
+    print(f"Requests:    {report['requests']} in {report['duration_s']:.1f}s")
+    print(f"Throughput:  {report['throughput_rps']:.1f} req/s")
+    print(f"Error rate:  {report['error_rate'] * 100:.2f}%")
+    for outcome, count in sorted(report["errors"].items()):
+        print(f"  {outcome}: {count}")
+    print("Latency (ms):")
+    print(f"  mean {latency['mean_ms']:.2f}  min {latency['min_ms']:.2f}  max {latency['max_ms']:.2f}")
+    print(f"  p50 {latency['p50_ms']:.2f}  p90 {latency['p90_ms']:.2f}  p99 {latency['p99_ms']:.2f}  p999 {latency['p999_ms']:.2f}")
+    print("Throughput over time (req/s, errors):")
+    for point in report["timeline"]:
+        print(f"  {point['second']:>4}s  {point['requests']:>7}  {point['errors']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate HTTP load against deployed functions or backend API routes and report latency."
+    )
+    parser.add_argument("urls", nargs="+", help="Target URL(s); requests are spread round-robin across them")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="Concurrent connections/workers")
+    parser.add_argument("-r", "--rps", type=float, default=0, help="Target requests per second (0 = as fast as possible)")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="Measured duration in seconds")
+    parser.add_argument("-w", "--warmup", type=float, default=5, help="Warm-up seconds excluded from the results")
+    parser.add_argument("-X", "--method", default="GET", help="HTTP method")
+    parser.add_argument("-H", "--header", action="append", default=[], help="Extra header, e.g. 'Accept: application/json'")
+    parser.add_argument("--data", default=None, help="Request body")
+    parser.add_argument("--timeout", type=float, default=5, help="Per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the full report as JSON to this file ('-' for stdout)")
+    return parser.parse_args(argv)
 
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    # Check if a URL was provided as a command-line argument.
-    if len(sys.argv) < 2:
-        print("Usage: python your_script_name.py <URL>")
-        # Exit the script if no URL is provided.
-        sys.exit(1)
-
-    target_url = sys.argv[1]
-    print(f"Making a single request to: {target_url}\n")
-    make_single_api_call(target_url)
\ No newline at end of file
+    args = parse_args()
+    print(f"Sending load to {', '.join(args.urls)} for {args.duration}s (+{args.warmup}s warm-up)\n", file=sys.stderr)
+    report = asyncio.run(run_load(args))
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
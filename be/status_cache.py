@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from kubernetes import client, config, watch
+
+FUNCTION_NAMESPACE = "openfaas-fn"
+# Each watch request is closed by the server after this long and re-opened from the last resourceVersion
+WATCH_TIMEOUT_SECONDS = int(os.getenv("STATUS_WATCH_TIMEOUT_SECONDS", "300"))
+# The cache is reported stale if it hasn't heard from the API server for this long
+STALE_AFTER_SECONDS = float(os.getenv("STATUS_STALE_AFTER_SECONDS", "30"))
+RETRY_BACKOFF_SECONDS = 5
+# OpenFaaS labels every function deployment with faas_function=<function name>
+FUNCTION_LABEL = "faas_function"
+# Above this many names a set-based selector gets unwieldy; list every function instead
+MAX_SELECTOR_NAMES = 100
+
+
+def _load_config():
+    """Loads the Kubernetes configuration (in-cluster service account or local kubeconfig)."""
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        config.load_kube_config()
+
+
+def load_apps_api() -> client.AppsV1Api:
+    _load_config()
+    return client.AppsV1Api()
+
+
+def load_core_api() -> client.CoreV1Api:
+    _load_config()
+    return client.CoreV1Api()
+
+
+def deployment_status(deployment) -> dict:
+    """Extracts the replica counts we report from a V1Deployment."""
+    desired_replicas = deployment.spec.replicas or 0
+    available_replicas = deployment.status.available_replicas if deployment.status and deployment.status.available_replicas else 0
+    return {
+        "status": "Ready" if available_replicas > 0 and available_replicas >= desired_replicas else "NotReady",
+        "replicas": desired_replicas,
+        "availableReplicas": available_replicas,
+    }
+
+
+def list_deployment_statuses(api, names=None, namespace: str = FUNCTION_NAMESPACE) -> dict:
+    """
+    Fetches the status of many function deployments with a single list call.
+    Returns {deployment name: status} for the deployments that exist.
+    """
+    if names is not None and len(names) <= MAX_SELECTOR_NAMES:
+        if not names:
+            return {}
+        label_selector = f"{FUNCTION_LABEL} in ({','.join(sorted(names))})"
+    else:
+        label_selector = FUNCTION_LABEL
+
+    deployments = api.list_namespaced_deployment(namespace=namespace, label_selector=label_selector)
+    statuses = {d.metadata.name: deployment_status(d) for d in deployments.items}
+    if names is not None:
+        statuses = {name: statuses[name] for name in names if name in statuses}
+    return statuses
+
+
+class DeploymentStatusCache:
+    """
+    In-memory view of the deployments in the function namespace.
+
+    A background thread lists the namespace once and then follows a watch from
+    the returned resourceVersion, re-listing when the server says it is too old
+    (410 Gone). Readers never touch the API server.
+
+    `api_factory` and `watch_factory` can return a fake AppsV1Api / Watch pair
+    (see backends.LocalBackend). `on_change(name, status)` is called from the
+    watch thread whenever a deployment's status changes (status None: deleted).
+    """
+
+    def __init__(self, api_factory=load_apps_api, watch_factory=watch.Watch, namespace: str = FUNCTION_NAMESPACE,
+                 on_change=None):
+        self.namespace = namespace
+        self._api_factory = api_factory
+        self._api = None
+        self._watch_factory = watch_factory
+        self._on_change = on_change
+        self._deployments = {}
+        self._lock = threading.Lock()
+        self._synced = False
+        self._last_contact = None
+        self._stop = threading.Event()
+        self._watch = None
+        self._thread = None
+
+    @property
+    def api(self):
+        """Shared AppsV1Api client, created on first use."""
+        if self._api is None:
+            self._api = self._api_factory()
+        return self._api
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="deployment-status-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watch:
+            self._watch.stop()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get(self, name: str):
+        """
+        Returns (status, age_seconds) for a deployment. `status` is None when the
+        deployment doesn't exist; `age_seconds` is None until the first list completes.
+        """
+        with self._lock:
+            return self._deployments.get(name), self.age()
+
+    def snapshot(self) -> dict:
+        """Returns {name: status} for every deployment."""
+        with self._lock:
+            return dict(self._deployments)
+
+    def get_many(self, names):
+        """Returns {name: status} for the given deployment names that exist."""
+        with self._lock:
+            return {name: self._deployments[name] for name in names if name in self._deployments}
+
+    def age(self) -> Optional[float]:
+        """Seconds since the cache last heard from the API server."""
+        if self._last_contact is None:
+            return None
+        return time.monotonic() - self._last_contact
+
+    def is_stale(self) -> bool:
+        age = self.age()
+        return not self._synced or age is None or age > STALE_AFTER_SECONDS
+
+    @property
+    def synced(self) -> bool:
+        return self._synced
+
+    def _run(self):
+        resource_version = None
+        while not self._stop.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._relist()
+                resource_version = self._follow(resource_version)
+            except client.ApiException as e:
+                if e.status == 410:
+                    # Our resourceVersion was compacted away; start over from a fresh list
+                    resource_version = None
+                    continue
+                print(f"Deployment watch failed: {e.reason}")
+                self._fail()
+                resource_version = None
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+            except Exception as e:
+                print(f"Deployment watch failed: {e}")
+                self._fail()
+                resource_version = None
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+
+    def _relist(self) -> str:
+        deployments = self.api.list_namespaced_deployment(namespace=self.namespace)
+        snapshot = {d.metadata.name: deployment_status(d) for d in deployments.items}
+        with self._lock:
+            previous, self._deployments = self._deployments, snapshot
+            self._synced = True
+            self._last_contact = time.monotonic()
+        for name in previous.keys() | snapshot.keys():
+            self._changed(name, previous.get(name), snapshot.get(name))
+        return deployments.metadata.resource_version
+
+    def _follow(self, resource_version: str) -> str:
+        self._watch = self._watch_factory()
+        for event in self._watch.stream(
+            self.api.list_namespaced_deployment,
+            namespace=self.namespace,
+            resource_version=resource_version,
+            timeout_seconds=WATCH_TIMEOUT_SECONDS,
+            allow_watch_bookmarks=True,
+        ):
+            if self._stop.is_set():
+                break
+            event_type = event["type"]
+            deployment = event["object"]
+            if event_type == "BOOKMARK":
+                # Bookmarks only carry a newer resourceVersion (as a raw dict)
+                resource_version = deployment["metadata"]["resourceVersion"]
+                self._last_contact = time.monotonic()
+                continue
+
+            resource_version = deployment.metadata.resource_version
+            name = deployment.metadata.name
+            status = None if event_type == "DELETED" else deployment_status(deployment)
+            with self._lock:
+                if status is None:
+                    previous = self._deployments.pop(name, None)
+                else:
+                    previous, self._deployments[name] = self._deployments.get(name), status
+                self._last_contact = time.monotonic()
+            self._changed(name, previous, status)
+
+        # The server closed the watch after its timeout: the view is still current
+        self._last_contact = time.monotonic()
+        return resource_version
+
+    def _changed(self, name: str, previous, status):
+        if self._on_change is not None and previous != status:
+            try:
+                self._on_change(name, status)
+            except Exception as e:
+                print(f"Deployment status listener failed: {e}")
+
+    def _fail(self):
+        with self._lock:
+            self._synced = False
@@ -0,0 +1,189 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException
+
+# Root of everything the backend keeps on disk (function directories, blobs, mirrors, templates)
+FILE_STORE_PATH = os.getenv("FILE_STORE_PATH", "file_store")
+BLOBS_PATH = os.path.join(FILE_STORE_PATH, "blobs")
+# 'local' keeps blobs under BLOBS_PATH only; 's3' also keeps them in an S3-compatible bucket
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "local")
+ARTIFACT_S3_BUCKET = os.getenv("ARTIFACT_S3_BUCKET", "s3-for-code-artifacts")
+ARTIFACT_S3_PREFIX = os.getenv("ARTIFACT_S3_PREFIX", "blobs/")
+# e.g. http://127.0.0.1:9000 for MinIO; unset for AWS
+ARTIFACT_S3_ENDPOINT_URL = os.getenv("ARTIFACT_S3_ENDPOINT_URL") or None
+# Uploads larger than this are rejected with a 413
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+CHUNK_SIZE = 65536
+
+# The S3 backend needs the optional 'boto3' package (pip install boto3)
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    S3_AVAILABLE = True
+except ImportError:
+    S3_AVAILABLE = False
+
+
+class LocalArtifactStore:
+    """
+    Content-addressed blob store on local disk.
+
+    A blob lives at `root/<first two hex digits>/<sha256>` and is written once:
+    storing the same bytes again returns the existing blob. Blobs are made
+    read-only, and function directories reference them with symlinks (see
+    link) instead of holding their own copies.
+    """
+
+    def __init__(self, root: str = BLOBS_PATH, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, fileobj: BinaryIO) -> str:
+        """
+        Streams fileobj into the store, hashing it on the way, and returns its
+        sha256. More than max_bytes raises a 413 and stores nothing.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise HTTPException(status_code=413, detail=f"Upload is larger than {self.max_bytes} bytes.")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            hex_digest = digest.hexdigest()
+            self._store(hex_digest, tmp_path)
+            return hex_digest
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_bytes(self, data: bytes) -> str:
+        return self.put(io.BytesIO(data))
+
+    def _store(self, digest: str, tmp_path: str):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def local_path(self, digest: str) -> str:
+        """A path on this node holding the blob's bytes."""
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail=f"Blob {digest} not found")
+        return path
+
+    def link(self, digest: str, dest_path: str):
+        """Points dest_path (e.g. a function's src/handler.go) at the blob with a relative symlink."""
+        target = os.path.relpath(os.path.abspath(self.local_path(digest)), os.path.dirname(os.path.abspath(dest_path)))
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        os.symlink(target, dest_path)
+
+    def ensure_local(self, directory: str):
+        """Makes every blob linked from directory readable on this node (a no-op for the local store)."""
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if os.path.islink(path) and not os.path.exists(path):
+                    self.local_path(os.path.basename(os.readlink(path)))
+
+    def digest_of(self, path: str) -> Optional[str]:
+        """The blob a path links to, or None for an ordinary file."""
+        if not os.path.islink(path):
+            return None
+        digest = os.path.basename(os.readlink(path))
+        return digest if self.exists(digest) else None
+
+
+class S3ArtifactStore(LocalArtifactStore):
+    """
+    Keeps blobs in an S3-compatible bucket (AWS, MinIO, ...) so every API node
+    sees the same uploads. The local store doubles as a read-through cache:
+    builds need the bytes on disk, and a blob fetched once is never fetched again.
+    """
+
+    def __init__(self, bucket: str = ARTIFACT_S3_BUCKET, prefix: str = ARTIFACT_S3_PREFIX,
+                 endpoint_url: Optional[str] = ARTIFACT_S3_ENDPOINT_URL, client=None, **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            if not S3_AVAILABLE:
+                raise RuntimeError("ARTIFACT_STORE=s3 needs the 'boto3' package")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self._download_lock = threading.Lock()
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest}"
+
+    def _remote_exists(self, digest: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _store(self, digest: str, tmp_path: str):
+        if not self._remote_exists(digest):
+            self.client.upload_file(tmp_path, self.bucket, self._key(digest))
+        super()._store(digest, tmp_path)
+
+    def exists(self, digest: str) -> bool:
+        return super().exists(digest) or self._remote_exists(digest)
+
+    def local_path(self, digest: str) -> str:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return path
+        with self._download_lock:
+            if not os.path.exists(path):
+                fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".download-")
+                os.close(fd)
+                try:
+                    self.client.download_file(self.bucket, self._key(digest), tmp_path)
+                    super()._store(digest, tmp_path)
+                except ClientError as e:
+                    raise HTTPException(status_code=404, detail=f"Blob {digest} not found: {e}")
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+        return path
+
+
+_store = None
+
+
+def get_artifact_store() -> LocalArtifactStore:
+    """The process-wide artifact store, chosen by ARTIFACT_STORE ('local' or 's3')."""
+    global _store
+    if _store is None:
+        if ARTIFACT_STORE == "local":
+            _store = LocalArtifactStore()
+        elif ARTIFACT_STORE == "s3":
+            _store = S3ArtifactStore()
+        else:
+            raise ValueError(f"Unknown ARTIFACT_STORE: {ARTIFACT_STORE}")
+    return _store
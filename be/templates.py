@@ -0,0 +1,189 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException
+
+from storage import FILE_STORE_PATH
+
+# The language every buildable function's stack.yml uses
+TEMPLATE_LANG = "golang-http"
+# Pin the template to a tag or commit so builds don't change under us when upstream moves.
+# Left empty, the repository's default branch is resolved to a commit on the first pull
+# and that commit is recorded in TEMPLATES_PATH/pinned_ref and used from then on.
+TEMPLATE_REPO = os.getenv("OPENFAAS_TEMPLATE_REPO", "https://github.com/openfaas/golang-http-template")
+TEMPLATE_REF = os.getenv("OPENFAAS_TEMPLATE_REF", "")
+# How often the pinned ref is pulled again, to repair the checkout (0 = only once per process)
+TEMPLATE_REFRESH_SECONDS = float(os.getenv("OPENFAAS_TEMPLATE_REFRESH_SECONDS", "86400"))
+TEMPLATES_PATH = os.getenv("OPENFAAS_TEMPLATES_PATH", os.path.join(FILE_STORE_PATH, "templates"))
+
+
+class TemplateStore:
+    """
+    One OpenFaaS template checkout shared by every function build.
+
+    The pinned template is pulled once into `root/versions/<n>` and published
+    through the `root/current` symlink. Function config directories get a
+    `template` symlink to the version `current` points at when their build
+    starts, instead of pulling their own copy, so a deploy no longer fetches
+    anything. A background thread re-pulls on a schedule and swaps `current`
+    atomically; builds already running keep reading the version they linked.
+
+    Several processes may share the store (e.g. on a shared FILE_STORE_PATH):
+    versions are only pruned once they are older than the previous one.
+    """
+
+    def __init__(self, root: str = TEMPLATES_PATH, repo: str = TEMPLATE_REPO, ref: str = TEMPLATE_REF,
+                 refresh_seconds: float = TEMPLATE_REFRESH_SECONDS):
+        self.root = os.path.abspath(root)
+        self.repo = repo
+        self.ref = ref or None
+        self.refresh_seconds = refresh_seconds
+        self._versions = os.path.join(self.root, "versions")
+        self._current = os.path.join(self.root, "current")
+        self._pinned_ref = os.path.join(self.root, "pinned_ref")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(self._versions, exist_ok=True)
+
+    @property
+    def template_path(self) -> str:
+        """The template directory of the current version (what new function links point at)."""
+        return os.path.join(os.path.realpath(self._current), "template")
+
+    def start(self):
+        """Pulls the template in the background if needed and keeps it refreshed."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="template-store", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def ensure(self):
+        """Makes sure a template is available, pulling it now if this is the first use."""
+        if self._is_ready():
+            return
+        with self._lock:
+            if not self._is_ready():
+                self._pull()
+
+    def refresh(self):
+        """Pulls the pinned ref into a new version and switches `current` to it."""
+        with self._lock:
+            self._pull()
+
+    def link(self, config_path: str):
+        """Points config_path/template at the current version of the template, pulling it first if needed."""
+        self.ensure()
+        template_path = self.template_path
+        link_path = os.path.join(config_path, "template")
+        if os.path.islink(link_path):
+            if os.readlink(link_path) == template_path:
+                return
+            os.unlink(link_path)
+        elif os.path.isdir(link_path):
+            # A per-function copy left by an older 'faas-cli template store pull'
+            shutil.rmtree(link_path)
+        tmp_link = f"{link_path}.{uuid.uuid4().hex}.tmp"
+        os.symlink(template_path, tmp_link)
+        os.replace(tmp_link, link_path)
+
+    def _is_ready(self) -> bool:
+        return os.path.isdir(os.path.join(self.template_path, TEMPLATE_LANG))
+
+    def _resolve_ref(self) -> str:
+        """The configured ref, or else the commit recorded (or now resolved and recorded) in pinned_ref."""
+        if self.ref:
+            return self.ref
+        try:
+            with open(self._pinned_ref) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            pass
+        try:
+            ls_remote = subprocess.run(
+                ["git", "ls-remote", self.repo, "HEAD"], check=True, capture_output=True, text=True
+            )
+        except subprocess.CalledProcessError as e:
+            raise HTTPException(status_code=500, detail=f"Resolving {self.repo} failed: {e.stderr}")
+        commit = ls_remote.stdout.split()[0] if ls_remote.stdout.strip() else None
+        if not commit:
+            raise HTTPException(status_code=500, detail=f"No default branch found in {self.repo}")
+        tmp_file = f"{self._pinned_ref}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(commit + "\n")
+        try:
+            # Another process may have pinned first; its commit wins
+            os.link(tmp_file, self._pinned_ref)
+        except FileExistsError:
+            with open(self._pinned_ref) as f:
+                commit = f.read().strip()
+        finally:
+            os.unlink(tmp_file)
+        print(f"Pinned OpenFaaS template {self.repo} to {commit}")
+        return commit
+
+    def _pull(self):
+        ref = self._resolve_ref()
+        version = os.path.join(self._versions, str(time.time_ns()))
+        os.makedirs(version)
+        print(f"Pulling OpenFaaS template {self.repo}#{ref}")
+        try:
+            subprocess.run(
+                ["faas-cli", "template", "pull", f"{self.repo}#{ref}"],
+                cwd=version, check=True, capture_output=True, text=True
+            )
+            if not os.path.isdir(os.path.join(version, "template", TEMPLATE_LANG)):
+                raise HTTPException(status_code=500, detail=f"Template {TEMPLATE_LANG} not found in {self.repo}#{ref}")
+        except subprocess.CalledProcessError as e:
+            shutil.rmtree(version, ignore_errors=True)
+            raise HTTPException(status_code=500, detail=f"Template pull failed: {e.stderr}")
+        except HTTPException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+
+        previous = os.path.realpath(self._current) if os.path.islink(self._current) else None
+        # Unique per process: others sharing the store may be swapping `current` too
+        tmp_link = f"{self._current}.{uuid.uuid4().hex}.tmp"
+        os.symlink(version, tmp_link)
+        os.replace(tmp_link, self._current)
+        if previous:
+            self._prune(older_than=os.path.basename(previous))
+
+    def _prune(self, older_than: str):
+        # The previous version stays around for builds that linked it before the swap, and
+        # newer ones may have been pulled meanwhile by another process
+        for name in os.listdir(self._versions):
+            if name.isdigit() and int(name) < int(older_than):
+                shutil.rmtree(os.path.join(self._versions, name), ignore_errors=True)
+
+    def _run(self):
+        try:
+            self.ensure()
+        except HTTPException as e:
+            print(f"Template pull failed: {e.detail}")
+        while self.refresh_seconds > 0 and not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except HTTPException as e:
+                # Keep building with the version we already have
+                print(f"Template refresh failed: {e.detail}")
+
+
+_template_store: Optional[TemplateStore] = None
+
+
+def get_template_store() -> TemplateStore:
+    """The process-wide template store."""
+    global _template_store
+    if _template_store is None:
+        _template_store = TemplateStore()
+    return _template_store
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The backend modules are imported flat (e.g. `import log_stream`), as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing main must not touch a real cluster or the working directory's file store
+os.environ.setdefault("DEPLOYMENT_BACKEND", "local")
+os.environ.setdefault("FILE_STORE_PATH", tempfile.mkdtemp(prefix="file_store-"))
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import backends
+from backends import FaasCliBackend
+
+
+class RecordingAppsApi:
+    def __init__(self, labels):
+        metadata = SimpleNamespace(labels=dict(labels))
+        template = SimpleNamespace(metadata=SimpleNamespace(labels=dict(labels)))
+        self.deployment = SimpleNamespace(metadata=metadata, spec=SimpleNamespace(replicas=2, template=template))
+        self.patches = []
+
+    def read_namespaced_deployment(self, name, namespace):
+        return self.deployment
+
+    def patch_namespaced_deployment(self, name, namespace, body):
+        self.patches.append(body)
+
+
+def test_patch_scaling_deletes_scale_labels_no_longer_set(monkeypatch):
+    api = RecordingAppsApi({
+        "faas_function": "func-a",
+        "com.openfaas.scale.min": "1",
+        "com.openfaas.scale.type": "capacity",
+        "com.openfaas.scale.target": "10",
+    })
+    monkeypatch.setattr(backends, "load_apps_api", lambda: api)
+    monkeypatch.setattr(backends, "get_template_store", lambda: None)
+
+    FaasCliBackend().patch_scaling("func-a", {"com.openfaas.scale.min": "3"}, 3, 5)
+
+    expected = {"com.openfaas.scale.min": "3", "com.openfaas.scale.type": None, "com.openfaas.scale.target": None}
+    [patch] = api.patches
+    assert patch["metadata"]["labels"] == expected
+    assert patch["spec"]["template"]["metadata"]["labels"] == expected
+    assert patch["spec"]["replicas"] == 3
+
+
+def test_kubernetes_clients_are_created_once(monkeypatch):
+    api = RecordingAppsApi({"faas_function": "func-a"})
+    loads = []
+    monkeypatch.setattr(backends, "load_apps_api", lambda: loads.append(1) or api)
+    monkeypatch.setattr(backends, "get_template_store", lambda: None)
+
+    backend = FaasCliBackend()
+    for _ in range(3):
+        assert backend.replicas("func-a") == 2
+    assert backend.apps_api() is api
+    assert len(loads) == 1
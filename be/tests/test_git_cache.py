@@ -0,0 +1,69 @@
+import os
+import subprocess
+
+import pytest
+
+from git_cache import GitMirrorCache
+
+
+def run_git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def commit(repo, path, content):
+    os.makedirs(os.path.dirname(os.path.join(repo, path)), exist_ok=True)
+    with open(os.path.join(repo, path), "w") as f:
+        f.write(content)
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", f"Update {path}")
+    return run_git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    repo = tmp_path / "upstream"
+    repo.mkdir()
+    run_git(repo, "init", "-q", "-b", "main")
+    # Let the blob-less clone be served as it would be by GitHub
+    run_git(repo, "config", "uploadpack.allowFilter", "true")
+    return str(repo)
+
+
+def test_mirror_is_cloned_once_and_fetched_afterwards(tmp_path, upstream):
+    first_sha = commit(upstream, "cmd/handler.go", "package main // v1\n")
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    url = f"file://{upstream}"
+
+    source, handler_path, commit_sha = cache.fetch_handler(url)
+    assert (source, handler_path, commit_sha) == (b"package main // v1\n", "cmd/handler.go", first_sha)
+    mirrors = os.listdir(tmp_path / "mirrors")
+    assert len(mirrors) == 1 and mirrors[0].endswith(".git")
+
+    second_sha = commit(upstream, "cmd/handler.go", "package main // v2\n")
+    assert cache.head_commit(url) == second_sha
+    source, handler_path, commit_sha = cache.fetch_handler(url, handler_path)
+    assert (source, handler_path, commit_sha) == (b"package main // v2\n", "cmd/handler.go", second_sha)
+    # The existing mirror was fetched into, not cloned again
+    assert os.listdir(tmp_path / "mirrors") == mirrors
+
+
+def test_moved_handler_is_searched_again(tmp_path, upstream):
+    commit(upstream, "old/handler.go", "package main // old\n")
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    url = f"file://{upstream}"
+    _, handler_path, _ = cache.fetch_handler(url)
+    assert handler_path == "old/handler.go"
+
+    run_git(upstream, "rm", "-q", "old/handler.go")
+    commit(upstream, "handler.go", "package main // new\n")
+    source, handler_path, _ = cache.fetch_handler(url, handler_path)
+    assert (source, handler_path) == (b"package main // new\n", "handler.go")
+
+
+def test_repository_without_handler(tmp_path, upstream):
+    sha = commit(upstream, "README.md", "No handler here\n")
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    assert cache.fetch_handler(f"file://{upstream}") == (None, None, sha)
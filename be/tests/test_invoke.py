@@ -0,0 +1,53 @@
+import uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from gateway import GatewayClient
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Routes /invoke to a fake gateway; returns the requests it received."""
+    received = []
+
+    def handler(request):
+        received.append(request)
+        # A stream, like a real upstream, so the uncached path can relay it
+        return httpx.Response(200, headers={"content-type": "text/plain"}, stream=httpx.ByteStream(f"call {len(received)}".encode()))
+
+    monkeypatch.setattr(main, "gateway", GatewayClient("http://gateway", transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    return received
+
+
+@pytest.fixture
+def cached_function(monkeypatch):
+    function_id = uuid.uuid4()
+    target = main.InvokeTarget(function_id, None, 30, [])
+    monkeypatch.setitem(main.invoke_targets, str(function_id), target)
+    return function_id
+
+
+def test_cached_invocations_miss_then_hit(upstream, cached_function):
+    client = TestClient(main.app)
+    first = client.get(f"/invoke/{cached_function}/items", params={"q": "1"})
+    second = client.get(f"/invoke/{cached_function}/items", params={"q": "1"})
+
+    assert (first.status_code, first.headers["x-cache"], first.text) == (200, "MISS", "call 1")
+    assert (second.status_code, second.headers["x-cache"], second.text) == (200, "HIT", "call 1")
+    assert len(upstream) == 1
+    assert upstream[0].url.path == f"/function/func-{cached_function}/items"
+
+
+def test_credentialed_invocations_bypass_the_cache(upstream, cached_function):
+    client = TestClient(main.app)
+    client.get(f"/invoke/{cached_function}")
+    private = client.get(f"/invoke/{cached_function}", headers={"Authorization": "Bearer secret"})
+
+    assert private.text == "call 2"
+    assert "x-cache" not in private.headers
+    assert upstream[1].headers["authorization"] == "Bearer secret"
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+from kubernetes import client
+
+import log_stream
+from backends import LocalBackend
+from log_stream import LogHub
+
+
+@pytest.fixture(autouse=True)
+def short_merge_window(monkeypatch):
+    monkeypatch.setattr(log_stream, "LOG_MERGE_WINDOW_SECONDS", 0.05)
+
+
+@pytest.fixture
+def backend():
+    backend = LocalBackend(build_seconds=0, push_seconds=0, deploy_seconds=0, ready_seconds=0)
+    backend.cluster.apply("func-a", "image-a", {"com.openfaas.scale.min": "2"})
+    backend.cluster.apply("func-b", "image-b", {"com.openfaas.scale.min": "1"})
+    return backend
+
+
+def write(backend, name, *messages):
+    for message in messages:
+        for pod in backend.cluster.pods(name):
+            backend.cluster.write_log(pod, message)
+
+
+async def take(subscription, count, timeout=3):
+    """The next `count` items of a subscription (LogLines or dropped counts)."""
+    items = []
+    async with asyncio.timeout(timeout):
+        while len(items) < count:
+            items.append(await subscription.queue.get())
+    return items
+
+
+def messages(items):
+    return [item.message for item in items if not isinstance(item, int)]
+
+
+def test_viewers_share_one_watch(backend):
+    async def run():
+        hub = LogHub(backend.core_api)
+        loop = asyncio.get_running_loop()
+        first_watch, first = await asyncio.to_thread(hub.subscribe, "func-a", loop, 0)
+        second_watch, second = await asyncio.to_thread(hub.subscribe, "func-a", loop, 0)
+        assert first_watch is second_watch
+        assert hub.watching() == 1
+
+        write(backend, "func-a", "hello")
+        # One line per pod, to every viewer
+        assert messages(await take(first, 2)) == ["hello", "hello"]
+        assert messages(await take(second, 2)) == ["hello", "hello"]
+        assert {line.pod for line in first_watch._history} == set(backend.cluster.pods("func-a"))
+
+        hub.unsubscribe(first_watch, first)
+        assert hub.watching() == 1
+        hub.unsubscribe(second_watch, second)
+        assert hub.watching() == 0
+        hub.stop()
+
+    asyncio.run(run())
+
+
+def test_first_viewers_of_a_function_wait_for_one_start(backend, monkeypatch):
+    started = []
+    original_start = log_stream.FunctionLogWatch.start
+
+    def slow_start(self):
+        started.append(self.name)
+        time.sleep(0.2)
+        original_start(self)
+
+    monkeypatch.setattr(log_stream.FunctionLogWatch, "start", slow_start)
+
+    async def run():
+        hub = LogHub(backend.core_api)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(asyncio.to_thread(hub.subscribe, "func-a", loop) for _ in range(3)))
+        assert len({id(log_watch) for log_watch, _ in results}) == 1
+        assert started == ["func-a"]
+        hub.stop()
+
+    asyncio.run(run())
+
+
+def test_tail_and_since_select_the_backlog(backend):
+    write(backend, "func-b", "old")
+    time.sleep(1.2)
+    write(backend, "func-b", "new 1", "new 2", "new 3")
+
+    async def run():
+        hub = LogHub(backend.core_api)
+        loop = asyncio.get_running_loop()
+        _, everything = await asyncio.to_thread(hub.subscribe, "func-b", loop)
+        _, tail = await asyncio.to_thread(hub.subscribe, "func-b", loop, 2)
+        _, since = await asyncio.to_thread(hub.subscribe, "func-b", loop, None, 1)
+        _, none = await asyncio.to_thread(hub.subscribe, "func-b", loop, 0)
+
+        assert messages(await take(everything, 5)) == ["Started image-b", "old", "new 1", "new 2", "new 3"]
+        assert messages(await take(tail, 2)) == ["new 2", "new 3"]
+        assert messages(await take(since, 3)) == ["new 1", "new 2", "new 3"]
+        assert none.queue.empty()
+        hub.stop()
+
+    asyncio.run(run())
+
+
+def test_slow_viewer_loses_lines_without_holding_up_others(backend):
+    async def run():
+        hub = LogHub(backend.core_api)
+        loop = asyncio.get_running_loop()
+        _, fast = await asyncio.to_thread(hub.subscribe, "func-b", loop, 0)
+        _, slow = await asyncio.to_thread(hub.subscribe, "func-b", loop, 0)
+        slow.limit = 2
+
+        write(backend, "func-b", *(f"line {i}" for i in range(6)))
+        assert messages(await take(fast, 6)) == [f"line {i}" for i in range(6)]
+        # The slow viewer kept what fitted, then learns how many it missed before the next line
+        assert messages(await take(slow, 2)) == ["line 0", "line 1"]
+        write(backend, "func-b", "line 6")
+        dropped, line = await take(slow, 2)
+        assert (dropped, line.message) == (4, "line 6")
+        hub.stop()
+
+    asyncio.run(run())
+
+
+def test_failed_start_stops_its_readers(backend, monkeypatch):
+    api = backend.core_api()
+    failing_pod = backend.cluster.pods("func-a")[1]
+
+    class FailingApi:
+        def list_namespaced_pod(self, *args, **kwargs):
+            return api.list_namespaced_pod(*args, **kwargs)
+
+        def read_namespaced_pod_log(self, name, *args, **kwargs):
+            if name == failing_pod and not kwargs.get("follow"):
+                raise client.ApiException(status=500, reason="Internal Server Error")
+            return api.read_namespaced_pod_log(name, *args, **kwargs)
+
+    readers = []
+    original_start_reader = log_stream.FunctionLogWatch._start_reader
+
+    def recording_start_reader(self, pod):
+        original_start_reader(self, pod)
+        readers.append(self._readers[pod])
+
+    monkeypatch.setattr(log_stream.FunctionLogWatch, "_start_reader", recording_start_reader)
+
+    async def run():
+        hub = LogHub(FailingApi)
+        loop = asyncio.get_running_loop()
+        with pytest.raises(client.ApiException):
+            await asyncio.to_thread(hub.subscribe, "func-a", loop)
+        assert hub.watching() == 0
+        assert not hub._starting
+
+    asyncio.run(run())
+    # The reader of the pod before the failing one was started, and stopped again
+    assert len(readers) == 1
+    readers[0].join(timeout=2)
+    assert not readers[0].is_alive()
@@ -0,0 +1,17 @@
+from notifications import FunctionChangeFeed
+from leader import INSTANCE_ID
+
+
+class ImmediateLoop:
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+def test_only_other_instances_changes_are_passed_on():
+    changes = []
+    feed = FunctionChangeFeed(engine=None, on_change=changes.append)
+    feed._loop = ImmediateLoop()
+
+    feed._dispatch(f"{INSTANCE_ID} 11111111-1111-1111-1111-111111111111")
+    feed._dispatch("other-host-42 22222222-2222-2222-2222-222222222222")
+    assert changes == ["22222222-2222-2222-2222-222222222222"]
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+from kubernetes import client
+
+import status_cache
+from backends import LocalBackend, LocalWatch
+from status_cache import DeploymentStatusCache
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class ScriptedWatch(LocalWatch):
+    """
+    A LocalWatch whose first streams are scripted: each script is a list of
+    events to send before the server closes the watch, or an exception to raise.
+    Records the resourceVersion every stream was opened from.
+    """
+
+    def __init__(self, cluster, scripts, opened_from):
+        super().__init__(cluster)
+        self.scripts = scripts
+        self.opened_from = opened_from
+
+    def stream(self, func, namespace=None, resource_version=None, timeout_seconds=None, **kwargs):
+        self.opened_from.append(resource_version)
+        if not self.scripts:
+            yield from super().stream(func, namespace, resource_version, timeout_seconds, **kwargs)
+            return
+        script = self.scripts.pop(0)
+        if callable(script):
+            script = script()
+        if isinstance(script, Exception):
+            raise script
+        yield from script
+
+
+@pytest.fixture
+def backend():
+    backend = LocalBackend(build_seconds=0, push_seconds=0, deploy_seconds=0, ready_seconds=0)
+    backend.cluster.apply("func-a", "image-a", {"com.openfaas.scale.min": "2"})
+    wait_for(lambda: backend.cluster.get("func-a").status.available_replicas == 2)
+    return backend
+
+
+def make_cache(backend, scripts=(), changes=None):
+    opened_from = []
+    scripts = list(scripts)
+    cache = DeploymentStatusCache(
+        api_factory=backend.apps_api,
+        watch_factory=lambda: ScriptedWatch(backend.cluster, scripts, opened_from),
+        on_change=(lambda name, status: changes.append((name, status))) if changes is not None else None,
+    )
+    return cache, opened_from
+
+
+def test_lists_then_follows_the_watch(backend):
+    changes = []
+    cache, opened_from = make_cache(backend, changes=changes)
+    cache.start()
+    try:
+        wait_for(lambda: opened_from)
+        assert cache.get("func-a")[0] == {"status": "Ready", "replicas": 2, "availableReplicas": 2}
+        assert not cache.is_stale()
+        assert changes == [("func-a", cache.get("func-a")[0])]
+        # The watch starts where the list left off
+        assert opened_from == [backend.cluster.list()[1]]
+
+        backend.cluster.apply("func-b", "image-b", {})
+        wait_for(lambda: cache.get("func-b")[0] == {"status": "Ready", "replicas": 1, "availableReplicas": 1})
+        backend.cluster.delete("func-a")
+        wait_for(lambda: cache.get("func-a")[0] is None)
+        assert cache.snapshot().keys() == {"func-b"}
+        assert changes[-1] == ("func-a", None)
+    finally:
+        cache.stop()
+
+
+def test_bookmark_moves_the_resource_version_on(backend):
+    bookmark = {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "42"}}}
+    cache, opened_from = make_cache(backend, scripts=[[bookmark]])
+    cache.start()
+    try:
+        wait_for(lambda: len(opened_from) == 2)
+        # After the server closed the watch, it is re-opened from the bookmark without a new list
+        assert opened_from[1] == "42"
+        assert cache.get("func-a")[0]["status"] == "Ready"
+    finally:
+        cache.stop()
+
+
+def test_gone_resource_version_relists(backend):
+    changes = []
+
+    def changed_while_disconnected():
+        # Missed by the watch; only a fresh list can tell
+        backend.cluster.delete("func-a")
+        backend.cluster.apply("func-b", "image-b", {"com.openfaas.scale.min": "0"})
+        return client.ApiException(status=410, reason="Expired: too old resource version")
+
+    cache, opened_from = make_cache(backend, scripts=[changed_while_disconnected], changes=changes)
+    cache.start()
+    try:
+        wait_for(lambda: len(opened_from) == 2)
+        # Re-opened from the fresh list's resourceVersion, right away
+        assert int(opened_from[1]) > int(opened_from[0])
+        assert cache.snapshot() == {"func-b": {"status": "NotReady", "replicas": 0, "availableReplicas": 0}}
+        assert cache.synced
+        assert {name for name, _ in changes[1:]} == {"func-a", "func-b"}
+    finally:
+        cache.stop()
+
+
+def test_failed_watch_marks_the_cache_unsynced(backend, monkeypatch):
+    monkeypatch.setattr(status_cache, "RETRY_BACKOFF_SECONDS", 60)
+    cache, opened_from = make_cache(backend, scripts=[client.ApiException(status=500, reason="Internal Server Error")])
+    cache.start()
+    try:
+        wait_for(lambda: opened_from and not cache.synced)
+        assert cache.is_stale()
+        # The last known statuses are still served while it backs off
+        assert cache.get("func-a")[0]["status"] == "Ready"
+    finally:
+        cache.stop()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import shutil
+import stat
+
+import pytest
+from fastapi import HTTPException
+
+ClientError = pytest.importorskip("botocore.exceptions").ClientError
+
+from storage import S3ArtifactStore  # noqa: E402
+
+
+class FakeS3:
+    """The calls S3ArtifactStore makes, over an in-memory bucket."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+        self.downloads = []
+
+    @staticmethod
+    def _not_found(operation):
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self._not_found("HeadObject")
+        return {"ContentLength": len(self.objects[Bucket, Key])}
+
+    def upload_file(self, filename, bucket, key):
+        with open(filename, "rb") as f:
+            self.objects[bucket, key] = f.read()
+        self.uploads.append(key)
+
+    def download_file(self, bucket, key, filename):
+        if (bucket, key) not in self.objects:
+            raise self._not_found("HeadObject")
+        with open(filename, "wb") as f:
+            f.write(self.objects[bucket, key])
+        self.downloads.append(key)
+
+
+def make_store(root, s3, **kwargs):
+    return S3ArtifactStore(bucket="artifacts", prefix="blobs/", client=s3, root=str(root), **kwargs)
+
+
+def test_put_uploads_each_blob_once(tmp_path):
+    s3 = FakeS3()
+    store = make_store(tmp_path / "blobs", s3)
+    digest = store.put_bytes(b"package main\n")
+    assert digest == hashlib.sha256(b"package main\n").hexdigest()
+    assert store.put_bytes(b"package main\n") == digest
+    assert s3.uploads == [f"blobs/{digest}"]
+    assert s3.objects["artifacts", f"blobs/{digest}"] == b"package main\n"
+
+    path = store.local_path(digest)
+    assert not os.stat(path).st_mode & stat.S_IWUSR
+
+    # Another node with an empty cache finds it in the bucket and doesn't upload it again
+    other = make_store(tmp_path / "other", s3)
+    assert other.exists(digest)
+    assert other.put_bytes(b"package main\n") == digest
+    assert s3.uploads == [f"blobs/{digest}"]
+
+
+def test_link_fetches_a_missing_blob_once(tmp_path):
+    s3 = FakeS3()
+    digest = make_store(tmp_path / "uploader", s3).put_bytes(b"package main\n")
+
+    store = make_store(tmp_path / "blobs", s3)
+    src_dir = tmp_path / "func" / "src"
+    src_dir.mkdir(parents=True)
+    store.link(digest, str(src_dir / "handler.go"))
+    store.link(digest, str(src_dir / "handler.go"))
+    assert (src_dir / "handler.go").read_bytes() == b"package main\n"
+    assert not os.path.isabs(os.readlink(src_dir / "handler.go"))
+    assert s3.downloads == [f"blobs/{digest}"]
+    assert store.digest_of(str(src_dir / "handler.go")) == digest
+
+
+def test_ensure_local_restores_dangling_links(tmp_path):
+    s3 = FakeS3()
+    root = tmp_path / "blobs"
+    store = make_store(root, s3)
+    src_dir = tmp_path / "func" / "src"
+    src_dir.mkdir(parents=True)
+    digest = store.put_bytes(b"package main\n")
+    store.link(digest, str(src_dir / "handler.go"))
+
+    # A node whose local cache doesn't hold the blob (yet)
+    shutil.rmtree(root)
+    store = make_store(root, s3)
+    assert not os.path.exists(src_dir / "handler.go")
+    store.ensure_local(str(tmp_path / "func"))
+    assert (src_dir / "handler.go").read_bytes() == b"package main\n"
+    assert s3.downloads == [f"blobs/{digest}"]
+
+
+def test_unknown_blob_is_not_found(tmp_path):
+    store = make_store(tmp_path / "blobs", FakeS3())
+    with pytest.raises(HTTPException) as e:
+        store.local_path("0" * 64)
+    assert e.value.status_code == 404
+    assert not [name for name in os.listdir(tmp_path / "blobs") if name.startswith(".download-")]
+
+
+def test_too_large_upload_stores_nothing(tmp_path):
+    s3 = FakeS3()
+    store = make_store(tmp_path / "blobs", s3, max_bytes=4)
+    with pytest.raises(HTTPException) as e:
+        store.put_bytes(b"package main\n")
+    assert e.value.status_code == 413
+    assert s3.objects == {}
+    assert os.listdir(tmp_path / "blobs") == []
@@ -0,0 +1,68 @@
+import os
+import stat
+
+import pytest
+
+from templates import TemplateStore
+
+FAKE_FAAS_CLI = """#!/bin/sh
+# faas-cli template pull <repo>#<ref>
+mkdir -p template/golang-http
+echo "$3" > template/golang-http/ref
+"""
+FAKE_GIT = """#!/bin/sh
+# git ls-remote <repo> HEAD
+echo "$GIT_HEAD	HEAD"
+"""
+
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("faas-cli", FAKE_FAAS_CLI), ("git", FAKE_GIT)):
+        path = bin_dir / name
+        path.write_text(script)
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("GIT_HEAD", "1111111")
+
+
+def pulled_ref(config_path):
+    with open(os.path.join(config_path, "template", "golang-http", "ref")) as f:
+        return f.read().strip()
+
+
+def test_default_branch_is_pinned_once(tmp_path, fake_tools, monkeypatch):
+    root = tmp_path / "templates"
+    store = TemplateStore(root=str(root), repo="https://example.com/t", ref="", refresh_seconds=0)
+    config_path = tmp_path / "func"
+    config_path.mkdir()
+    store.link(str(config_path))
+    assert pulled_ref(config_path) == "https://example.com/t#1111111"
+
+    # Upstream moves on; refreshes and other processes keep the recorded commit
+    monkeypatch.setenv("GIT_HEAD", "2222222")
+    store.refresh()
+    other = TemplateStore(root=str(root), repo="https://example.com/t", ref="", refresh_seconds=0)
+    other.refresh()
+    store.link(str(config_path))
+    assert pulled_ref(config_path) == "https://example.com/t#1111111"
+
+
+def test_running_builds_keep_their_version(tmp_path, fake_tools):
+    store = TemplateStore(root=str(tmp_path / "templates"), repo="r", ref="v1.0.0", refresh_seconds=0)
+    building = tmp_path / "building"
+    building.mkdir()
+    store.link(str(building))
+    linked = os.readlink(building / "template")
+    assert os.path.basename(os.path.dirname(linked)).isdigit()
+
+    store.refresh()
+    # The link still names the version it started with, which survives one refresh
+    assert os.readlink(building / "template") == linked
+    assert os.path.isdir(linked)
+
+    store.refresh()
+    assert not os.path.exists(linked)
+    assert len(os.listdir(tmp_path / "templates" / "versions")) == 2
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from array import array
+from typing import Optional
+
+from prometheus_client import Gauge
+
+TIMESERIES_ENABLED = os.getenv("TIMESERIES_ENABLED", "true").lower() == "true"
+# Resolutions kept per function, as "<step seconds>:<slots>" pairs. The default
+# keeps 10s points for an hour, 1m points for 6 hours and 1h points for a week
+# (888 buckets, about 14 KB per function).
+TIMESERIES_RESOLUTIONS = os.getenv("TIMESERIES_RESOLUTIONS", "10:360,60:360,3600:168")
+# How often replicas and invocation counts are sampled (normally the finest step)
+TIMESERIES_SAMPLE_SECONDS = float(os.getenv("TIMESERIES_SAMPLE_SECONDS", "10"))
+
+TIMESERIES_FUNCTIONS = Gauge(
+    "timeseries_functions",
+    "Functions with recorded replica and invocation history.",
+)
+
+
+def parse_resolutions(spec: str):
+    """'10:360,60:1440' -> [(10, 360), (60, 1440)], finest first."""
+    resolutions = []
+    for part in spec.split(","):
+        step, slots = part.strip().split(":")
+        resolutions.append((int(step), int(slots)))
+    return sorted(resolutions)
+
+
+class Ring:
+    """
+    One resolution of one function's history: `slots` fixed-size buckets of
+    `step` seconds in typed arrays (16 bytes per bucket). Bucket number b
+    (epoch seconds // step) lives in slot b % slots and is overwritten once
+    b + slots comes round, so memory never grows.
+
+    Each bucket holds every sample that fell into it: the sum of available
+    replicas (averaged on read), the last desired replica count and the
+    number of invocations.
+    """
+
+    __slots__ = ("step", "slots", "bucket", "samples", "available", "desired", "invocations")
+
+    def __init__(self, step: int, slots: int):
+        self.step = step
+        self.slots = slots
+        self.bucket = array("I", bytes(4 * slots))
+        self.samples = array("H", bytes(2 * slots))
+        self.available = array("f", bytes(4 * slots))
+        self.desired = array("H", bytes(2 * slots))
+        self.invocations = array("I", bytes(4 * slots))
+
+    def add(self, now: float, available: int, desired: int, invocations: int):
+        bucket = int(now // self.step)
+        i = bucket % self.slots
+        if self.bucket[i] != bucket:
+            self.bucket[i] = bucket
+            self.samples[i] = 0
+            self.available[i] = 0
+            self.invocations[i] = 0
+        self.samples[i] = min(self.samples[i] + 1, 65535)
+        self.available[i] += available
+        self.desired[i] = min(desired, 65535)
+        self.invocations[i] = min(self.invocations[i] + invocations, 4294967295)
+
+    def points(self, start: float, end: float):
+        """Yields (bucket start, average available, desired, invocations) for the recorded buckets in [start, end]."""
+        first = max(int(start // self.step), int(end // self.step) - self.slots + 1)
+        for bucket in range(first, int(end // self.step) + 1):
+            i = bucket % self.slots
+            if self.bucket[i] == bucket and self.samples[i]:
+                yield bucket * self.step, self.available[i] / self.samples[i], self.desired[i], self.invocations[i]
+
+    def newest(self) -> float:
+        """Start of the latest bucket written (0 if none)."""
+        return max(self.bucket) * self.step
+
+
+class TimeSeriesStore:
+    """
+    Fixed-memory history of replicas and invocations per function, at several
+    resolutions (see TIMESERIES_RESOLUTIONS).
+
+    A background thread samples every TIMESERIES_SAMPLE_SECONDS: available
+    and desired replicas from `replicas()` (a {function id: (available,
+    desired)} snapshot, e.g. from the deployment status cache) and the
+    invocations counted with record_invocation() since the previous sample.
+    Every sample is added to each resolution at once, so coarser resolutions
+    are downsampled as they are written. Functions get their rings on their
+    first sample and lose them once nothing was recorded for the longest
+    retention.
+
+    `clock` can be replaced in tests.
+    """
+
+    def __init__(self, replicas, resolutions=None, interval: float = TIMESERIES_SAMPLE_SECONDS, clock=time.time):
+        self._replicas = replicas
+        self.resolutions = resolutions or parse_resolutions(TIMESERIES_RESOLUTIONS)
+        self._interval = interval
+        self._clock = clock
+        self._series = {}
+        self._invocations = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="timeseries-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def record_invocation(self, function_id, count: int = 1):
+        """Counts invocations of a function towards its next sample (cheap; call on every request)."""
+        function_id = str(function_id)
+        with self._lock:
+            self._invocations[function_id] = self._invocations.get(function_id, 0) + count
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Time series sample failed: {e}")
+
+    def sample(self):
+        """Records one sample for every function that is deployed or was invoked."""
+        now = self._clock()
+        replicas = self._replicas()
+        with self._lock:
+            invocations, self._invocations = self._invocations, {}
+            for function_id in replicas.keys() | invocations.keys():
+                series = self._series.get(function_id)
+                if series is None:
+                    series = self._series[function_id] = [Ring(step, slots) for step, slots in self.resolutions]
+                available, desired = replicas.get(function_id, (0, 0))
+                for ring in series:
+                    ring.add(now, available, desired, invocations.get(function_id, 0))
+
+            # Forget functions that have been gone for longer than anything is kept
+            retention = max(step * slots for step, slots in self.resolutions)
+            for function_id in [f for f, series in self._series.items() if series[-1].newest() < now - retention]:
+                del self._series[function_id]
+            TIMESERIES_FUNCTIONS.set(len(self._series))
+
+    def history(self, function_id, window: float, step: Optional[int] = None):
+        """
+        Returns (step, points) for the last `window` seconds of a function, at
+        `step` or else the finest resolution whose retention covers the window.
+        Points are dicts; buckets without samples are left out.
+        """
+        if step is None:
+            step = next(
+                (s for s, slots in self.resolutions if s * slots >= window),
+                self.resolutions[-1][0],
+            )
+        index = next((i for i, (s, _) in enumerate(self.resolutions) if s == step), None)
+        if index is None:
+            raise ValueError(f"Unknown resolution {step}s; kept: {[s for s, _ in self.resolutions]}")
+
+        now = self._clock()
+        with self._lock:
+            series = self._series.get(str(function_id))
+            points = list(series[index].points(now - window, now)) if series else []
+        return step, [
+            {
+                "time": bucket_start,
+                "available_replicas": round(available, 2),
+                "desired_replicas": desired,
+                "invocations": invocations,
+                "invocation_rate": round(invocations / step, 4),
+            }
+            for bucket_start, available, desired, invocations in points
+        ]
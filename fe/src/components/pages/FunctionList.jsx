@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
 import { functionAPI } from '../../services/api';
+import { subscribeToEvents } from '../../services/events';
 import FunctionCard from './FunctionCard'; // Import the new card component
 
 const FunctionList = () => {
@@ -26,6 +27,19 @@ const FunctionList = () => {
     loadFunctions();
   }, [loadFunctions]);
 
+  // Status changes are pushed by the backend instead of polled
+  useEffect(() => subscribeToEvents((type, data) => {
+    if (type === 'resync') {
+      loadFunctions();
+    } else if (type === 'function') {
+      setFunctions((current) => (
+        current.some((fn) => fn.id === data.id)
+          ? current.map((fn) => (fn.id === data.id ? { ...fn, ...data } : fn))
+          : current
+      ));
+    }
+  }), [loadFunctions]);
+
   const handleDelete = async (functionData) => {
     // For OpenFaaS, "delete" means "undeploy".
     if (!window.confirm(`Are you sure you want to undeploy and delete "${functionData.name}"?`)) {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { functionAPI } from '../../services/api';
+import { subscribeToEvents } from '../../services/events';
 
 const FunctionStatus = ({ functionId }) => {
   const [status, setStatus] = useState(null);
@@ -23,10 +24,21 @@ const FunctionStatus = ({ functionId }) => {
     };
 
     fetchStatus(); // Fetch immediately on mount
-    const intervalId = setInterval(fetchStatus, 5000); // Poll every 5 seconds
 
-    // Cleanup interval on component unmount
-    return () => clearInterval(intervalId);
+    // Then follow the replica changes the backend pushes; unsubscribe on unmount
+    return subscribeToEvents((type, data) => {
+      if (type === 'replicas' && data.id === functionId) {
+        if (data.deployed) {
+          setStatus(data);
+          setError('');
+        } else {
+          setStatus(null);
+          setError(`Function '${functionId}' not found.`);
+        }
+      } else if (type === 'resync') {
+        fetchStatus();
+      }
+    });
   }, [functionId]);
 
   if (error) {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { functionAPI } from '../../services/api';
+import { subscribeToEvents } from '../../services/events';
 
 const FunctionStatusPoller = ({ functionData }) => {
   const [liveStatus, setLiveStatus] = useState(null);
@@ -28,11 +29,16 @@ const FunctionStatusPoller = ({ functionData }) => {
       }
     };
 
-    // Don't poll for functions that are not deployed
+    // Don't fetch for functions that are not deployed
     if (functionData.status === 'DEPLOYED') {
-      fetchStatus(); // Fetch immediately
-      const intervalId = setInterval(fetchStatus, 5000); // Poll every 5 seconds
-      return () => clearInterval(intervalId); // Cleanup
+      fetchStatus(); // Fetch once, then follow the pushed replica changes
+      return subscribeToEvents((type, data) => {
+        if (type === 'replicas' && data.id === functionData.id) {
+          setLiveStatus(data.deployed ? data : null);
+        } else if (type === 'resync') {
+          fetchStatus();
+        }
+      });
     }
   }, [functionData.id, functionData.status]);
 
@@ -0,0 +1,27 @@
+import API from './api';
+
+// One EventSource per tab, shared by every component that listens
+const EVENT_TYPES = ['function', 'job', 'batch', 'replicas', 'resync'];
+const listeners = new Set();
+let source = null;
+
+// listener(type, data) is called for every event from /events; returns an unsubscribe function
+export const subscribeToEvents = (listener) => {
+  listeners.add(listener);
+  if (!source) {
+    source = new EventSource(`${API.defaults.baseURL}/events`);
+    EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (event) => {
+        const data = JSON.parse(event.data);
+        listeners.forEach((l) => l(type, data));
+      });
+    });
+  }
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+};